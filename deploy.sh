@@ -106,7 +106,19 @@ EOF
 echo "🗄️  Setting up database..."
 export DJANGO_SETTINGS_MODULE=golfplex.settings_production
 python manage.py migrate
+python manage.py rebuild_url_registry
+python manage.py rerender_guides
+python manage.py rebuild_recommendations
+python manage.py rebuild_search_index
+python manage.py rebuild_work_queue
 python manage.py collectstatic --noinput
+python manage.py generate_sitemap
+python manage.py export_static_site
+
+# Edits re-export their own pages as they happen; the full JSON dumps are
+# refreshed hourly instead
+(crontab -l 2>/dev/null | grep -v 'export_static_site --dumps'
+ echo "0 * * * * cd /home/$(whoami)/TCGolf && DJANGO_SETTINGS_MODULE=golfplex.settings_production .venv/bin/python manage.py export_static_site --dumps") | crontab -
 
 # Create superuser (optional - comment out if not needed)
 echo "👑 Creating Django superuser..."
@@ -143,8 +155,31 @@ server {
         add_header Cache-Control "public";
     }
     
-    # Main application
+    # Sitemaps (python manage.py generate_sitemap), rewritten in place as guides change
+    location = /sitemap.xml {
+        root /home/$(whoami)/TCGolf;
+    }
+    
+    location /sitemaps/ {
+        root /home/$(whoami)/TCGolf;
+        types { application/gzip gz; }
+    }
+    
+    # Pre-rendered pages (python manage.py export_static_site), served with
+    # their .gz siblings; requests with a query string and anything not
+    # exported go to Django. Add "brotli_static on;" if ngx_brotli is installed.
     location / {
+        root /home/$(whoami)/TCGolf/static_site;
+        gzip_static on;
+        error_page 418 = @django;
+        if (\$args) {
+            return 418;
+        }
+        try_files \$uri \$uri/index.html \$uri/index.json @django;
+    }
+    
+    # Main application
+    location @django {
         proxy_pass http://127.0.0.1:8000;
         proxy_set_header Host \$host;
         proxy_set_header X-Real-IP \$remote_addr;
@@ -228,7 +263,14 @@ echo "   cd /home/$(whoami)/TCGolf"
 echo "   git pull origin main"
 echo "   source .venv/bin/activate"
 echo "   python manage.py migrate"
+echo "   python manage.py rebuild_url_registry"
+echo "   python manage.py rerender_guides"
+echo "   python manage.py rebuild_recommendations"
+echo "   python manage.py rebuild_search_index"
+echo "   python manage.py rebuild_work_queue"
 echo "   python manage.py collectstatic --noinput"
+echo "   python manage.py generate_sitemap"
+echo "   python manage.py export_static_site"
 echo "   sudo systemctl restart golfplex"
 echo ""
 echo "💰 Running on a $6/month droplet!"
@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import Destination, DestinationGuide, CityGuide
+from .models import Destination, DestinationGuide, CityGuide, PageRoute
 
 @admin.register(Destination)
 class DestinationAdmin(admin.ModelAdmin):
     list_display = ['name', 'city', 'country', 'created_at']
     list_filter = ['country', 'created_at']
     search_fields = ['name', 'city', 'country']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'timezone']
 
 @admin.register(DestinationGuide)
 class DestinationGuideAdmin(admin.ModelAdmin):
@@ -106,3 +106,11 @@ class CityGuideAdmin(admin.ModelAdmin):
                 form.base_fields[field_name].widget.attrs['cols'] = 80
         
         return form
+
+
+@admin.register(PageRoute)
+class PageRouteAdmin(admin.ModelAdmin):
+    list_display = ['path', 'kind', 'language_code', 'is_canonical', 'updated_at']
+    list_filter = ['kind', 'language_code', 'is_canonical']
+    search_fields = ['path', 'slug']
+    raw_id_fields = ['destination', 'destination_guide', 'city_guide']
@@ -0,0 +1,459 @@
+"""
+Cache backends for multi-process deployments
+
+SQLiteCache is a shared store in a local SQLite file (WAL mode), so every
+worker process on the box sees the same entries with no external service.
+add() and incr() are atomic across processes, which the realtime refresh
+locks and counters rely on.
+
+TwoTierCache puts a small per-process LRU (L1) in front of a shared cache
+alias (L2): SQLiteCache by default, or Redis when configured. Writes go to
+L2 and are announced in an invalidation log kept in L2 itself (a sequence
+counter plus one entry per write). With SQLiteCache the value, the counter
+and the log entry are written in one transaction; each process replays new log entries at
+most every SYNC_INTERVAL seconds and evicts those keys from its L1, so N
+workers behave like one cache with bounded staleness. An L1 copy also never
+outlives L1_TIMEOUT, so a missed log entry can't keep it stale for long. The
+L2 backend must implement incr() atomically (SQLiteCache and RedisCache do).
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.utils.functional import cached_property
+
+_MISSING = object()
+
+
+class SQLiteCache(BaseCache):
+    """Cache entries in a SQLite file shared by every process on the host"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        # Expired/overflow entries are culled every CULL_EVERY writes
+        self._cull_every = options.get('CULL_EVERY', 200)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self._path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)')
+            self._local.db = db
+        return db
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction (taken up front, so read-modify-write is atomic)"""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _after_write(self):
+        with self._writes_lock:
+            self._writes += 1
+            cull = self._writes % self._cull_every == 0
+        if cull:
+            self._cull()
+
+    def _cull(self):
+        db = self._db
+        db.execute('DELETE FROM cache_entries WHERE expires <= ?', (time.time(),))
+        (count,) = db.execute('SELECT COUNT(*) FROM cache_entries').fetchone()
+        if count > self._max_entries:
+            # Drop the entries closest to expiry (never-expiring ones last)
+            excess = count - self._max_entries + self._max_entries // self._cull_frequency
+            db.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?)',
+                (excess,)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db.execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*key_map, time.time())
+        ).fetchall()
+        return {key_map[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout))
+        )
+        self._after_write()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as db:
+            db.executemany('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)', rows)
+        self._after_write()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Atomic across processes: only an absent or expired entry is replaced"""
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db.execute(
+            'INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout), time.time())
+        )
+        self._after_write()
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db.execute(
+            'UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across processes (the row is read and written in one write transaction)"""
+        key = self.make_and_validate_key(key, version=version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache_entries SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db.execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ', '.join('?' * len(keys))
+            self._db.execute(f'DELETE FROM cache_entries WHERE key IN ({placeholders})', keys)
+
+    def logged_write(self, data, deleted, timeout, seq_key, log_key, log_timeout):
+        """
+        Set `data` and delete `deleted`, then bump the counter at seq_key and
+        log every touched key under log_key.format(seq), all in one
+        transaction. Returns (new sequence number, number of entries deleted);
+        see TwoTierCache.
+        """
+        now = time.time()
+        expires = self._expires(timeout)
+        logged = pickle.dumps([*data, *deleted], pickle.HIGHEST_PROTOCOL)
+        rows = [
+            (self.make_and_validate_key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+            for key, value in data.items()
+        ]
+        deleted = [self.make_and_validate_key(key) for key in deleted]
+        seq_key = self.make_and_validate_key(seq_key)
+        with self._transaction() as db:
+            db.executemany('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)', rows)
+            removed = 0
+            if deleted:
+                placeholders = ', '.join('?' * len(deleted))
+                removed = db.execute(f'DELETE FROM cache_entries WHERE key IN ({placeholders})', deleted).rowcount
+            row = db.execute(
+                'SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (seq_key, now)
+            ).fetchone()
+            seq = (pickle.loads(row[0]) if row else 0) + 1
+            db.executemany('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)', [
+                (seq_key, pickle.dumps(seq, pickle.HIGHEST_PROTOCOL), None),
+                (self.make_and_validate_key(log_key.format(seq)), logged, self._expires(log_timeout)),
+            ])
+        self._after_write()
+        return seq, removed
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Connections are per thread and reused across requests
+        pass
+
+
+class TwoTierCache(BaseCache):
+    """Per-process LRU in front of a shared cache alias (LOCATION)"""
+
+    SEQ_KEY = 'l1_invalidation_seq'
+    LOG_KEY = 'l1_invalidation_{}'
+    # Log entries outlive any reasonable gap between two syncs of a live process
+    LOG_TIMEOUT = 300
+    # A process further behind than this just drops its whole L1
+    LOG_WINDOW = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._shared_alias = location
+        options = params.get('OPTIONS', {})
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 500)
+        self._l1_timeout = options.get('L1_TIMEOUT', 30)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1.0)
+        self._l1 = OrderedDict()  # key -> (expires, pickled value)
+        self._lock = threading.Lock()
+        self._seen_seq = None
+        self._own_seqs = set()
+        self._next_sync = 0.0
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'l1_evictions': 0}
+
+    @cached_property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    # L1 ------------------------------------------------------------------
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._l1[key]
+                return _MISSING
+            self._l1.move_to_end(key)
+        return pickle.loads(entry[1])
+
+    def _l1_set(self, key, value, ttl):
+        if ttl <= 0:
+            self._l1_discard([key])
+            return
+        entry = (time.monotonic() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._l1[key] = entry
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _l1_ttl(self, timeout=None):
+        """Seconds an L1 copy may live: L1_TIMEOUT, or less if the L2 entry expires sooner"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self._l1_timeout if timeout is None else min(timeout, self._l1_timeout)
+
+    # Invalidation broadcast ----------------------------------------------
+
+    def _write(self, data=None, deleted=(), timeout=DEFAULT_TIMEOUT):
+        """
+        Set/delete keys in L2 and log them so other processes evict them.
+        Returns (keys that failed to set, whether anything was deleted).
+        """
+        data = data or {}
+        shared = self._shared
+        if hasattr(shared, 'logged_write'):
+            seq, removed = shared.logged_write(
+                data, deleted, timeout, self.SEQ_KEY, self.LOG_KEY, self.LOG_TIMEOUT
+            )
+            with self._lock:
+                self._own_seqs.add(seq)
+            return [], removed > 0
+        failed = shared.set_many(data, timeout) if data else []
+        removed = False
+        if len(deleted) == 1:
+            removed = shared.delete(deleted[0])
+        elif deleted:
+            shared.delete_many(deleted)
+            removed = True
+        self._broadcast([*data, *deleted])
+        return failed, removed
+
+    def _broadcast(self, keys):
+        """Log written/deleted keys in L2 so other processes evict them"""
+        shared = self._shared
+        try:
+            seq = shared.incr(self.SEQ_KEY)
+        except ValueError:
+            shared.add(self.SEQ_KEY, 0, None)
+            seq = shared.incr(self.SEQ_KEY)
+        shared.set(self.LOG_KEY.format(seq), list(keys), self.LOG_TIMEOUT)
+        with self._lock:
+            self._own_seqs.add(seq)
+
+    def _sync(self):
+        """Replay other processes' writes since the last sync (rate limited)"""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self._sync_interval
+
+        seq = self._shared.get(self.SEQ_KEY) or 0
+        seen = self._seen_seq
+        if seen is None or seq == seen:
+            self._seen_seq = seq
+            return
+
+        with self._lock:
+            own = self._own_seqs
+            self._own_seqs = {s for s in own if s > seq}
+        pending = [n for n in range(seen + 1, seq + 1) if n not in own]
+        if seq < seen or len(pending) > self.LOG_WINDOW:
+            # L2 was cleared or we fell too far behind: start over
+            self._clear_l1()
+        elif pending:
+            logs = self._shared.get_many([self.LOG_KEY.format(n) for n in pending])
+            if len(logs) < len(pending):
+                # Entry expired or not yet written by a racing writer: play safe
+                self._clear_l1()
+            else:
+                keys = [key for logged in logs.values() for key in logged]
+                self._l1_discard(keys)
+                self.stats['l1_evictions'] += len(keys)
+        self._seen_seq = seq
+
+    def _clear_l1(self):
+        with self._lock:
+            self.stats['l1_evictions'] += len(self._l1)
+            self._l1.clear()
+
+    # Cache API -------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._sync()
+        value = self._l1_get(full_key)
+        if value is not _MISSING:
+            self.stats['l1_hits'] += 1
+            return value
+        value = self._shared.get(full_key, _MISSING)
+        if value is _MISSING:
+            self.stats['misses'] += 1
+            return default
+        self.stats['l2_hits'] += 1
+        self._l1_set(full_key, value, self._l1_ttl())
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        remote = {}
+        for key in keys:
+            full_key = self.make_and_validate_key(key, version=version)
+            value = self._l1_get(full_key)
+            if value is _MISSING:
+                remote[full_key] = key
+            else:
+                found[key] = value
+        self.stats['l1_hits'] += len(found)
+        if remote:
+            for full_key, value in self._shared.get_many(list(remote)).items():
+                found[remote[full_key]] = value
+                self._l1_set(full_key, value, self._l1_ttl())
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._write({full_key: value}, timeout=timeout)
+        self._l1_set(full_key, value, self._l1_ttl(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        full = {self.make_and_validate_key(key, version=version): value for key, value in data.items()}
+        failed, _ = self._write(full, timeout=timeout)
+        for full_key, value in full.items():
+            self._l1_set(full_key, value, self._l1_ttl(timeout))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        added = self._shared.add(full_key, value, timeout)
+        if added:
+            self._l1_set(full_key, value, self._l1_ttl(timeout))
+            self._broadcast([full_key])
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self._shared.incr(full_key, delta)
+        self._l1_discard([full_key])
+        self._broadcast([full_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        return self._shared.touch(full_key, timeout)
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._sync()
+        return self._l1_get(full_key) is not _MISSING or self._shared.has_key(full_key)
+
+    def delete(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l1_discard([full_key])
+        _, deleted = self._write(deleted=[full_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        full_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if full_keys:
+            self._l1_discard(full_keys)
+            self._write(deleted=full_keys)
+
+    def clear(self):
+        self._clear_l1()
+        self._shared.clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
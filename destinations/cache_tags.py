@@ -0,0 +1,96 @@
+"""
+Tag-based cache invalidation with versioned namespaces
+
+Every cached value is stored under a key that embeds the current version of
+each tag it depends on (a destination, a language, a country, the whole
+catalog). Invalidating a tag just replaces its version token, so every key
+built from the old token becomes unreachable in O(1) without enumerating
+keys; the orphaned entries expire on their own. The save/delete receivers in
+models.py invalidate exactly the tags a change affects, which lets cached
+values live for hours instead of minutes.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.utils.text import slugify
+
+DEFAULT_TIMEOUT = 6 * 3600
+CATALOG = 'catalog'
+
+_VERSION_PREFIX = 'tagver'
+_MISSING = object()
+
+
+def destination_tag(destination_id):
+    return f'destination:{destination_id}'
+
+
+def language_tag(language):
+    return f'language:{language}'
+
+
+def country_tag(country):
+    return f'country:{slugify(country)}'
+
+
+def _version_key(tag):
+    return f'{_VERSION_PREFIX}:{tag}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def tag_versions(tags):
+    """Current version token of each tag; tags seen for the first time get one"""
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            # add() so concurrent first readers agree on one token; a version
+            # lost to eviction is replaced by a fresh one, never reused
+            cache.add(key, _new_version(), None)
+            version = cache.get(key)
+        versions[tag] = version
+    return versions
+
+
+def tagged_key(key, tags):
+    """Physical cache key for `key` under the current versions of `tags`"""
+    versions = tag_versions(sorted(set(tags)))
+    digest = hashlib.md5(
+        '|'.join(f'{tag}={version}' for tag, version in versions.items()).encode()
+    ).hexdigest()
+    return f'tagged:{key}:{digest}'
+
+
+def get_value(key, tags, default=None):
+    return cache.get(tagged_key(key, tags), default)
+
+
+def set_value(key, value, tags, timeout=DEFAULT_TIMEOUT):
+    cache.set(tagged_key(key, tags), value, timeout)
+
+
+def get_or_set(key, tags, compute, timeout=DEFAULT_TIMEOUT):
+    """Cached value for key, calling compute() and storing the result on a miss"""
+    physical_key = tagged_key(key, tags)
+    value = cache.get(physical_key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(physical_key, value, timeout)
+    return value
+
+
+def invalidate(*tags):
+    """Drop everything cached under any of the given tags"""
+    cache.set_many({_version_key(tag): _new_version() for tag in tags}, None)
+
+
+def destination_tags(destination):
+    """Tags a change to one destination invalidates"""
+    return [destination_tag(destination.pk), country_tag(destination.country), CATALOG]
@@ -0,0 +1,149 @@
+"""
+Change feed for the exports: rows created, updated or deleted since a cursor
+
+Exported tables carry an indexed (updated_at, id); deletions leave an
+ExportTombstone written by the post_delete receivers in models.py. A feed
+page merges both in (time, kind, id) order, where kind puts an upsert before
+a deletion stamped with the same instant, and the cursor is the position of
+the last item sent: "<microseconds since epoch>.<kind>.<id>". Reading a page
+costs two index range scans, however large the tables are.
+
+Only changes older than SETTLE_SECONDS are served, so a transaction that
+commits after a consumer has read past its timestamp is not skipped.
+Tombstones are kept for TOMBSTONE_RETENTION_DAYS; older cursors are refused
+and the consumer has to start again from a full export.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from heapq import merge
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExportTombstone
+
+UPSERT, DELETE = 0, 1
+SETTLE_SECONDS = 5
+TOMBSTONE_RETENTION_DAYS = 90
+ROW_CHUNK_SIZE = 500
+
+
+class CursorError(ValueError):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def _model_label(model):
+    return model._meta.label_lower
+
+
+def record_deletion(model, object_id):
+    """Leave a tombstone for a deleted row and drop expired ones"""
+    ExportTombstone.objects.create(model=_model_label(model), object_id=object_id)
+    horizon = timezone.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    ExportTombstone.objects.filter(deleted_at__lt=horizon).delete()
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(moment):
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(micros):
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def format_cursor(position):
+    moment, kind, pk = position
+    return f'{_micros(moment)}.{kind}.{pk}'
+
+
+def parse_cursor(value):
+    """(moment, kind, id) position for a cursor; None for "0" (the beginning)"""
+    if value in ('', '0'):
+        return None
+    try:
+        micros, kind, pk = (int(part) for part in value.split('.'))
+    except ValueError:
+        raise CursorError('since must be 0 or a cursor returned by a previous page')
+    if kind not in (UPSERT, DELETE):
+        raise CursorError('since must be 0 or a cursor returned by a previous page')
+    moment = _from_micros(micros)
+    if moment < timezone.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise CursorExpired('Cursor is older than the deletion history; re-sync from the full export')
+    return moment, kind, pk
+
+
+def _after(position, kind, time_field, id_field):
+    """Q for items of `kind` positioned after a cursor"""
+    if position is None:
+        return Q()
+    moment, cursor_kind, cursor_id = position
+    later = Q(**{f'{time_field}__gt': moment})
+    if kind > cursor_kind:
+        return later | Q(**{time_field: moment})
+    if kind == cursor_kind:
+        return later | Q(**{time_field: moment, f'{id_field}__gt': cursor_id})
+    return later
+
+
+def _page_positions(queryset, position, limit):
+    """Up to limit + 1 (moment, kind, id, object id) positions after the cursor"""
+    settled = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    upserts = (
+        queryset.filter(_after(position, UPSERT, 'updated_at', 'pk'), updated_at__lte=settled)
+        .order_by('updated_at', 'pk')
+        .values_list('updated_at', 'pk')[:limit + 1]
+    )
+    deletes = (
+        ExportTombstone.objects.filter(
+            _after(position, DELETE, 'deleted_at', 'id'),
+            model=_model_label(queryset.model), deleted_at__lte=settled,
+        )
+        .order_by('deleted_at', 'id')
+        .values_list('deleted_at', 'id', 'object_id')[:limit + 1]
+    )
+    positions = merge(
+        ((moment, UPSERT, pk, pk) for moment, pk in upserts),
+        ((moment, DELETE, pk, object_id) for moment, pk, object_id in deletes),
+    )
+    return list(islice(positions, limit + 1))
+
+
+def _items(queryset, columns, page):
+    """Feed entries for a page of positions, loading rows a chunk at a time"""
+    names = columns if 'id' in columns else ['id'] + columns
+    for start in range(0, len(page), ROW_CHUNK_SIZE):
+        chunk = page[start:start + ROW_CHUNK_SIZE]
+        ids = [object_id for _, kind, _, object_id in chunk if kind == UPSERT]
+        rows = {row['id']: row for row in queryset.filter(pk__in=ids).values(*names)} if ids else {}
+        for _, kind, _, object_id in chunk:
+            if kind == DELETE:
+                yield {'op': 'delete', 'id': object_id}
+                continue
+            row = rows.get(object_id)
+            if row is None:
+                continue  # Deleted since; its tombstone comes in a later page
+            if 'id' not in columns:
+                del row['id']
+            yield {'op': 'upsert', 'id': object_id, 'row': row}
+
+
+def changes(queryset, columns, since, limit):
+    """
+    (entries, next cursor, has more) for one feed page. Entries are
+    {'op': 'upsert', 'id', 'row'} or {'op': 'delete', 'id'} dicts, produced
+    lazily; the cursor is `since` itself when nothing has changed.
+    """
+    position = parse_cursor(since)
+    positions = _page_positions(queryset, position, limit)
+    has_more = len(positions) > limit
+    page = positions[:limit]
+    next_cursor = format_cursor(page[-1][:3]) if page else (since or '0')
+    return _items(queryset, columns, page), next_cursor, has_more
@@ -2,20 +2,37 @@
 Content Generation API Views for GolfPlex
 
 Endpoints for distributed content generation:
-1. /api/fetch-work/ - Get next destination to process
-2. /api/submit-work/ - Submit completed content in multiple languages
+1. /api/fetch-work/ - Lease the next (destination, language) to process
+2. /api/work-heartbeat/ - Renew a lease while generating
+3. /api/work-source/<destination_id>/<language>/ - Guide a translation is made from
+4. /api/submit-work/ - Submit completed content in multiple languages
+
+The work endpoints gzip their responses for clients that accept it and
+accept gzip-compressed request bodies (Content-Encoding: gzip).
 """
 
-from django.http import JsonResponse
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.db import models
+from django.db import transaction
 import json
 import logging
+import zlib
 from datetime import datetime, timezone
-from .models import Destination, DestinationGuide
+from .models import Destination, DestinationGuide, CityGuide
+from .typeahead_index import get_index
+from .guide_search import search as search_guides, KIND_GOLF_GUIDE, KIND_CITY_GUIDE
+from .work_queue import (
+    claim_many, renew, holds_lease, complete, record_submission, metrics, heartbeat_seconds, counters, language_counter,
+    COUNTER_DESTINATIONS, COUNTER_WITH_GUIDES, COUNTER_GUIDES, TARGET_LANGUAGES,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -64,106 +81,105 @@ COUNTRY_FLAGS = {
     'Côte d\'Ivoire': '🇨🇮',
 }
 
-# Target languages for content generation
-TARGET_LANGUAGES = {
-    'es': 'Spanish',      # Huge international golf markets
-    'fr': 'French',       # Europe + parts of Africa  
-    'de': 'German',       # Big traveling golfer market
-    'it': 'Italian',      # Domestic golf, inbound travelers
-    'pt': 'Portuguese',   # Portugal, Brazil
-    'nl': 'Dutch',        # Niche but high-value travelers
-    'ja': 'Japanese',     # Premium golf tourists
-    'ko': 'Korean',       # Very active international golfers
-    'zh': 'Chinese',      # Both mainland + Taiwan markets
-    'ar': 'Arabic',       # Middle East golf destinations
-}
+# Most items accepted by one batch submission
+MAX_BATCH_SUBMIT = 100
+WORK_STATUS_CACHE_KEY = 'work_status'
+
+
+def _max_body_size():
+    return getattr(settings, 'WORK_API_MAX_BODY_SIZE', 50 * 1024 * 1024)
+
+
+def work_api(view):
+    """Gzip responses and decompress gzip-encoded request bodies"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+            limit = _max_body_size()
+            decompressor = zlib.decompressobj(wbits=31)
+            try:
+                body = decompressor.decompress(request.body, limit)
+            except zlib.error:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Invalid gzip request body'
+                }, status=400)
+            if decompressor.unconsumed_tail:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': f'Request body is larger than {limit} bytes'
+                }, status=413)
+            if not decompressor.eof:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Truncated gzip request body'
+                }, status=400)
+            request._body = body
+        return view(request, *args, **kwargs)
+    return gzip_page(wrapper)
+
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(work_api, name='dispatch')
 class FetchWorkView(View):
     """
-    Returns a single (destination, language) work unit for content generation
-    Prioritizes destinations without any guides, then those missing language versions
+    Leases (destination, language) work units for content generation from
+    the work queue: English guides first, then translations. A unit is
+    handed out again if it isn't submitted before its lease expires.
+    
+    Without parameters returns a single work unit; ?count=N leases up to N
+    units at once (under one lease token) and returns {status, count, units}.
+    
+    A translation unit references its English source by content hash rather
+    than embedding it; workers fetch it from source.url only when they have
+    no cached copy with that hash. Other guides are listed, not sent.
     """
     
     def get(self, request):
+        count = request.GET.get('count')
         try:
-            # Find the next (destination, language) pair to work on
-            destination = None
-            target_language = None
-            priority = None
-            
-            # Priority 1: Destinations with no guides at all (start with English)
-            destinations_without_guides = Destination.objects.filter(
-                guides__isnull=True
-            ).order_by('?')  # Random order
+            batch_size = int(count) if count is not None else 1
+            if batch_size < 1:
+                raise ValueError
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'count must be a positive integer'
+            }, status=400)
+        
+        try:
+            leases = claim_many(worker=request.GET.get('worker', ''), count=batch_size)
+            if not leases:
+                return JsonResponse({
+                    'status': 'no_work',
+                    'message': 'All destinations have complete content in all languages'
+                })
             
-            if destinations_without_guides.exists():
-                destination = destinations_without_guides.first()
-                target_language = 'en'  # Always start with English
-                priority = 'no_guides'
-            else:
-                # Priority 2: Destinations missing language versions
-                destinations_with_guides = Destination.objects.filter(
-                    guides__isnull=False
-                ).prefetch_related('guides').order_by('?')
-                
-                for dest in destinations_with_guides:
-                    existing_languages = set(dest.guides.values_list('language_code', flat=True))
-                    all_languages = {'en'} | set(TARGET_LANGUAGES.keys())
-                    missing = list(all_languages - existing_languages)
-                    
-                    if missing:
-                        destination = dest
-                        # Prioritize English if missing, otherwise pick first missing language
-                        target_language = 'en' if 'en' in missing else missing[0]
-                        priority = 'missing_languages'
-                        break
-                
-                if not destination:
-                    return JsonResponse({
-                        'status': 'no_work',
-                        'message': 'All destinations have complete content in all languages'
-                    })
+            destination_ids = {lease.destination_id for lease in leases}
+            destinations = Destination.objects.in_bulk(destination_ids)
             
-            # Get existing guides for context (for translation or reference)
+            # Existing guide languages and content hashes, one query for the batch
             existing_guides = {}
-            if destination.guides.exists():
-                for guide in destination.guides.all():
-                    existing_guides[guide.language_code] = {
-                        'content': guide.content,
-                        'created_at': guide.created_at.isoformat(),
-                        'updated_at': guide.updated_at.isoformat()
-                    }
+            for destination_id, language_code, content_hash in DestinationGuide.objects.filter(
+                destination_id__in=destination_ids
+            ).order_by().values_list('destination_id', 'language_code', 'content_hash'):
+                existing_guides.setdefault(destination_id, {})[language_code] = content_hash
             
-            # Prepare the single work unit
-            work_data = {
-                'status': 'work_available',
-                'priority': priority,
-                'destination': {
-                    'id': destination.id,
-                    'name': destination.name,
-                    'city': destination.city,
-                    'region_or_state': destination.region_or_state,
-                    'country': destination.country,
-                    'description': destination.description,
-                    'latitude': float(destination.latitude),
-                    'longitude': float(destination.longitude),
-                    'slug': destination.generate_slug(),
-                },
-                'target_language': target_language,
-                'language_name': TARGET_LANGUAGES.get(target_language, 'English'),
-                'existing_guides': existing_guides,
-                'is_translation': target_language != 'en' and 'en' in existing_guides,
-                'work_requirements': {
-                    'min_words': 2500 if target_language == 'en' else 2000,
-                    'include_local_insights': True,
-                    'include_seasonal_info': True,
-                    'include_course_recommendations': True
-                }
-            }
+            units = [
+                self.work_unit(lease, destinations[lease.destination_id], existing_guides.get(lease.destination_id, {}))
+                for lease in leases if lease.destination_id in destinations
+            ]
+            for unit in units:
+                destination = unit['destination']
+                logger.info(f"Fetched work unit: {destination['city']}, {destination['country']} ({unit['target_language']})")
             
-            logger.info(f"Fetched work unit: {destination.city}, {destination.country} ({target_language})")
-            return JsonResponse(work_data)
+            if count is None:
+                return JsonResponse(units[0])
+            return JsonResponse({
+                'status': 'work_available',
+                'count': len(units),
+                'units': units
+            })
             
         except Exception as e:
             logger.error(f"Error fetching work: {str(e)}")
@@ -172,20 +188,137 @@ class FetchWorkView(View):
                 'message': f'Error fetching work: {str(e)}'
             }, status=500)
     
+    def work_unit(self, lease, destination, existing_guides):
+        """Payload describing one leased unit; existing_guides maps language to content hash"""
+        target_language = lease.language_code
+        is_translation = target_language != 'en' and 'en' in existing_guides
+        source = None
+        if is_translation:
+            source = {
+                'language_code': 'en',
+                'content_hash': existing_guides['en'],
+                'url': reverse('destinations:work_source', args=[destination.id, 'en']),
+            }
+        return {
+            'status': 'work_available',
+            'priority': 'missing_languages' if existing_guides else 'no_guides',
+            'lease': {
+                'unit_id': lease.unit_id,
+                'token': lease.token,
+                'expires_at': lease.expires_at.isoformat(),
+                'heartbeat_seconds': heartbeat_seconds(),
+            },
+            'destination': {
+                'id': destination.id,
+                'name': destination.name,
+                'city': destination.city,
+                'region_or_state': destination.region_or_state,
+                'country': destination.country,
+                'description': destination.description,
+                'latitude': float(destination.latitude),
+                'longitude': float(destination.longitude),
+                'slug': destination.generate_slug(),
+            },
+            'target_language': target_language,
+            'language_name': TARGET_LANGUAGES.get(target_language, 'English'),
+            'existing_languages': sorted(existing_guides),
+            'source': source,
+            'is_translation': is_translation,
+            'work_requirements': {
+                'min_words': 2500 if target_language == 'en' else 2000,
+                'include_local_insights': True,
+                'include_seasonal_info': True,
+                'include_course_recommendations': True
+            }
+        }
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@work_api
+def work_heartbeat(request):
+    """
+    Renews a worker's leases: {unit_id or unit_ids, token}. Units missing
+    from "renewed" were re-leased or finished elsewhere; stop working on
+    them. 409 when none of the leases is still held.
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        unit_ids = [int(unit_id) for unit_id in data.get('unit_ids') or [data.get('unit_id')]]
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'unit_id (or unit_ids) and token are required'
+        }, status=400)
+    
+    expires_at, renewed = renew(unit_ids, data.get('token', ''))
+    if not renewed:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Lease lost'
+        }, status=409)
+    return JsonResponse({
+        'status': 'ok',
+        'expires_at': expires_at.isoformat(),
+        'renewed': renewed,
+        'lost': [unit_id for unit_id in unit_ids if unit_id not in renewed]
+    })
+
+
+@require_http_methods(["GET"])
+@work_api
+def work_source(request, destination_id, language):
+    """
+    Raw content of the guide a translation is made from, with its content
+    hash as the ETag
+    """
+    guide = DestinationGuide.objects.filter(
+        destination_id=destination_id, language_code=language
+    ).values_list('content', 'content_hash').first()
+    if guide is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'No {language} guide for destination {destination_id}'
+        }, status=404)
+    
+    content, content_hash = guide
+    response = HttpResponse(content, content_type='text/markdown; charset=utf-8')
+    if content_hash:
+        response['ETag'] = f'"{content_hash}"'
+    return response
+
 
 @method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(work_api, name='dispatch')
 class SubmitWorkView(View):
     """
-    Accepts completed content generation work in two formats:
+    Accepts completed content generation work in three formats:
     1. Atomic: single (destination, language) pair
-       {destination_id, language_code, content}
+       {destination_id, language_code, content, token}
     2. Legacy: bulk format with multiple guides
-       {destination_id, guides: {lang: {content}}}
+       {destination_id, guides: {lang: {content}}, token}
+    3. Batch: many pairs applied in one transaction, with per-item results
+       {items: [{destination_id, language_code, content, generation_seconds, token}]}
+    
+    token is the lease token fetch-work handed out with the unit (a batch may
+    give one for all its items). Work whose lease was lost is rejected (409
+    for the atomic format) and counted as duplicated; accepted work finishes
+    its unit, whether it created the guide or replaced it.
     """
     
     def post(self, request):
         try:
             data = json.loads(request.body)
+            if not isinstance(data, dict):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Expected a JSON object'
+                }, status=400)
+            
+            if 'items' in data:
+                return self.submit_batch(data)
             
             destination_id = data.get('destination_id')
             if not destination_id:
@@ -193,6 +326,12 @@ class SubmitWorkView(View):
                     'status': 'error',
                     'message': 'destination_id is required'
                 }, status=400)
+            token = data.get('token')
+            if not token:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'token (the lease token from fetch-work) is required'
+                }, status=400)
                 
             # Try atomic format first
             language_code = data.get('language_code')
@@ -222,15 +361,22 @@ class SubmitWorkView(View):
                             results['errors'].append(f'Content too short for {lang}')
                             continue
                             
-                        guide, created = DestinationGuide.objects.update_or_create(
-                            destination_id=destination_id,
-                            language_code=lang,
-                            defaults={
-                                'content': guide_content,
-                                'updated_at': datetime.now(timezone.utc)
-                            }
-                        )
+                        if not holds_lease(destination_id, lang, token):
+                            record_submission(worker_info.get('generation_seconds'), True)
+                            results['errors'].append(f'Lease lost for {lang}')
+                            continue
+                        with transaction.atomic():
+                            guide, created = DestinationGuide.objects.update_or_create(
+                                destination_id=destination_id,
+                                language_code=lang,
+                                defaults={
+                                    'content': guide_content,
+                                    'updated_at': datetime.now(timezone.utc)
+                                }
+                            )
+                            complete(destination_id, lang)
                         
+                        record_submission(worker_info.get('generation_seconds'), False)
                         if created:
                             results['created_guides'].append(lang)
                         else:
@@ -255,18 +401,27 @@ class SubmitWorkView(View):
                 
                 try:
                     destination = Destination.objects.get(id=destination_id)
+                    if not holds_lease(destination.id, language_code, token):
+                        record_submission(worker_info.get('generation_seconds'), True)
+                        return JsonResponse({
+                            'status': 'error',
+                            'message': 'Lease lost: the unit was re-leased or finished elsewhere'
+                        }, status=409)
                     
                     # Create or update guide
-                    guide, created = DestinationGuide.objects.update_or_create(
-                        destination=destination,
-                        language_code=language_code,
-                        defaults={
-                            'content': content,
-                            'updated_at': datetime.now(timezone.utc)
-                        }
-                    )
+                    with transaction.atomic():
+                        guide, created = DestinationGuide.objects.update_or_create(
+                            destination=destination,
+                            language_code=language_code,
+                            defaults={
+                                'content': content,
+                                'updated_at': datetime.now(timezone.utc)
+                            }
+                        )
+                        complete(destination.id, language_code)
                     
                     action = 'created' if created else 'updated'
+                    record_submission(worker_info.get('generation_seconds'), False)
                     language_name = TARGET_LANGUAGES.get(language_code, 'English')
                     
                     response_data = {
@@ -314,49 +469,106 @@ class SubmitWorkView(View):
             }, status=500)
 
 
-@require_http_methods(["GET"])
-def work_status(request):
-    """
-    Returns overall status of content generation work
-    """
-    try:
-        total_destinations = Destination.objects.count()
-        destinations_with_guides = Destination.objects.filter(
-            guides__isnull=False
-        ).distinct().count()
-        destinations_without_guides = total_destinations - destinations_with_guides
+    def submit_batch(self, data):
+        """Apply a batch of (destination, language) submissions in one transaction"""
+        items = data.get('items')
+        worker_info = data.get('worker_info', {})
+        if not isinstance(items, list) or not items:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'items must be a non-empty list'
+            }, status=400)
+        if len(items) > MAX_BATCH_SUBMIT:
+            return JsonResponse({
+                'status': 'error',
+                'message': f'At most {MAX_BATCH_SUBMIT} items per batch'
+            }, status=400)
         
-        # Count guides by language
-        language_stats = {}
-        for lang_code, lang_name in [('en', 'English')] + list(TARGET_LANGUAGES.items()):
-            count = DestinationGuide.objects.filter(language_code=lang_code).count()
-            language_stats[lang_code] = {
-                'name': lang_name,
-                'count': count,
-                'percentage': round((count / total_destinations) * 100, 1) if total_destinations > 0 else 0
-            }
+        destination_ids = set()
+        for item in items:
+            try:
+                destination_ids.add(int(item.get('destination_id')))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        destinations = Destination.objects.in_bulk(destination_ids)
         
-        # Calculate completion percentage
-        total_possible_guides = total_destinations * (len(TARGET_LANGUAGES) + 1)  # +1 for English
-        total_existing_guides = DestinationGuide.objects.count()
-        completion_percentage = round((total_existing_guides / total_possible_guides) * 100, 1) if total_possible_guides > 0 else 0
+        with transaction.atomic():
+            results = [self.apply_item(item, destinations, data.get('token')) for item in items]
         
-        status_data = {
-            'overview': {
-                'total_destinations': total_destinations,
-                'destinations_with_guides': destinations_with_guides,
-                'destinations_without_guides': destinations_without_guides,
-                'total_guides': total_existing_guides,
-                'completion_percentage': completion_percentage
-            },
-            'language_stats': language_stats,
-            'target_languages': TARGET_LANGUAGES,
-            'next_priorities': {
-                'no_guides': destinations_without_guides,
-                'missing_translations': destinations_with_guides  # Simplified
-            }
+        summary = {
+            action: sum(1 for result in results if result['status'] == action)
+            for action in ('created', 'updated', 'lease_lost', 'error')
         }
+        logger.info(f"Submitted batch of {len(items)}: {summary}")
+        return JsonResponse({
+            'status': 'success',
+            'summary': summary,
+            'results': results,
+            'worker_info': worker_info
+        })
+    
+    def apply_item(self, item, destinations, token=None):
+        """Save one batch item (in a savepoint); returns its result"""
+        if not isinstance(item, dict):
+            return {'status': 'error', 'message': 'Each item must be an object'}
+        result = {
+            'destination_id': item.get('destination_id'),
+            'language_code': item.get('language_code'),
+        }
+        content = item.get('content') or ''
+        try:
+            destination = destinations.get(int(item.get('destination_id')))
+        except (TypeError, ValueError):
+            destination = None
+        if destination is None:
+            return dict(result, status='error', message=f"Destination {item.get('destination_id')} not found")
+        if not result['language_code']:
+            return dict(result, status='error', message='language_code is required')
+        if len(content.strip()) < 1000:
+            return dict(result, status='error', message=f'Content is too short (minimum 1000 characters, got {len(content.strip())})')
+        token = item.get('token') or token
+        if not token:
+            return dict(result, status='error', message='token is required')
+        if not holds_lease(destination.id, result['language_code'], token):
+            record_submission(item.get('generation_seconds'), True)
+            return dict(result, status='lease_lost', message='Lease lost: the unit was re-leased or finished elsewhere')
+        
+        try:
+            with transaction.atomic():
+                guide, created = DestinationGuide.objects.update_or_create(
+                    destination=destination,
+                    language_code=result['language_code'],
+                    defaults={
+                        'content': content,
+                        'updated_at': datetime.now(timezone.utc)
+                    }
+                )
+                complete(destination.id, result['language_code'])
+        except Exception as e:
+            logger.error(f"Error submitting {destination.id} ({result['language_code']}): {str(e)}")
+            return dict(result, status='error', message=str(e))
         
+        record_submission(item.get('generation_seconds'), False)
+        return dict(
+            result,
+            status='created' if created else 'updated',
+            content_length=len(content),
+            updated_at=guide.updated_at.isoformat()
+        )
+
+
+@require_http_methods(["GET"])
+@gzip_page
+def work_status(request):
+    """
+    Returns overall status of content generation work, from the maintained
+    counters and cached for WORK_STATUS_CACHE_SECONDS so dashboards can poll it
+    """
+    try:
+        status_data = cache.get(WORK_STATUS_CACHE_KEY)
+        if status_data is None:
+            status_data = build_work_status()
+            cache.set(WORK_STATUS_CACHE_KEY, status_data, getattr(settings, 'WORK_STATUS_CACHE_SECONDS', 5))
         return JsonResponse(status_data)
         
     except Exception as e:
@@ -366,6 +578,46 @@ def work_status(request):
             'message': f'Error getting work status: {str(e)}'
         }, status=500)
 
+
+def build_work_status():
+    counts = counters()
+    total_destinations = counts[COUNTER_DESTINATIONS]
+    destinations_with_guides = counts[COUNTER_WITH_GUIDES]
+    destinations_without_guides = total_destinations - destinations_with_guides
+    
+    # Count guides by language
+    language_stats = {}
+    for lang_code, lang_name in [('en', 'English')] + list(TARGET_LANGUAGES.items()):
+        count = counts.get(language_counter(lang_code), 0)
+        language_stats[lang_code] = {
+            'name': lang_name,
+            'count': count,
+            'percentage': round((count / total_destinations) * 100, 1) if total_destinations > 0 else 0
+        }
+    
+    # Calculate completion percentage
+    total_possible_guides = total_destinations * (len(TARGET_LANGUAGES) + 1)  # +1 for English
+    total_existing_guides = counts[COUNTER_GUIDES]
+    completion_percentage = round((total_existing_guides / total_possible_guides) * 100, 1) if total_possible_guides > 0 else 0
+    
+    return {
+        'overview': {
+            'total_destinations': total_destinations,
+            'destinations_with_guides': destinations_with_guides,
+            'destinations_without_guides': destinations_without_guides,
+            'total_guides': total_existing_guides,
+            'completion_percentage': completion_percentage
+        },
+        'language_stats': language_stats,
+        'target_languages': TARGET_LANGUAGES,
+        'work_queue': metrics(),
+        'next_priorities': {
+            'no_guides': destinations_without_guides,
+            'missing_translations': destinations_with_guides  # Simplified
+        },
+        'generated_at': datetime.now(timezone.utc).isoformat()
+    }
+
 @require_http_methods(["GET"])
 def typeahead_search(request):
     """
@@ -380,13 +632,8 @@ def typeahead_search(request):
             'message': 'Please enter at least 2 characters'
         })
     
-    # Search destinations by name, city, region, or country
-    destinations = Destination.objects.filter(
-        models.Q(name__icontains=query) |
-        models.Q(city__icontains=query) |
-        models.Q(region_or_state__icontains=query) |
-        models.Q(country__icontains=query)
-    ).filter(guides__isnull=False).distinct().order_by('name')[:10]  # Limit to 10 results
+    # Ranked lookup in the in-process index (no database access)
+    destinations = get_index().search(query, limit=10)
     
     results = []
     for dest in destinations:
@@ -402,10 +649,84 @@ def typeahead_search(request):
             'country_flag': flag,
             'display_text': f"{dest.name}, {dest.city}",
             'location_text': f"{dest.city}, {dest.region_or_state}, {dest.country}",
-            'url': dest.get_absolute_url(),
+            'url': dest.url,
         })
     
     return JsonResponse({
         'results': results,
         'count': len(results)
     })
+
+@require_http_methods(["GET"])
+def guide_search(request):
+    """
+    Full-text search over golf guide and city guide content
+    Returns BM25-ranked guides with highlighted snippets
+    """
+    query = request.GET.get('q', '').strip()
+    language = request.GET.get('lang', 'en')
+    kind = request.GET.get('kind') or None
+    
+    if kind not in (None, KIND_GOLF_GUIDE, KIND_CITY_GUIDE):
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Unknown kind: {kind}'
+        }, status=400)
+    
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 50))
+        offset = max(0, int(request.GET.get('offset', 0)))
+    except ValueError:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'limit and offset must be integers'
+        }, status=400)
+    
+    if not query or len(query) < 2:
+        return JsonResponse({
+            'results': [],
+            'message': 'Please enter at least 2 characters'
+        })
+    
+    hits = search_guides(query, language, kind=kind, limit=limit, offset=offset)
+    
+    # One query per kind to build URLs for the page of hits
+    destinations = Destination.objects.in_bulk(
+        {hit.destination_id for hit in hits if hit.kind == KIND_GOLF_GUIDE}
+    )
+    city_guides = CityGuide.objects.select_related('destination').in_bulk(
+        {hit.object_id for hit in hits if hit.kind == KIND_CITY_GUIDE}
+    )
+    
+    results = []
+    for hit in hits:
+        if hit.kind == KIND_GOLF_GUIDE:
+            destination = destinations.get(hit.destination_id)
+            url = destination.get_absolute_url(language) if destination else None
+        else:
+            city_guide = city_guides.get(hit.object_id)
+            destination = city_guide.destination if city_guide else None
+            url = city_guide.get_absolute_url() if city_guide else None
+        if not destination:
+            continue
+        
+        results.append({
+            'kind': hit.kind,
+            'title': hit.title,
+            'url': url,
+            'snippet': hit.snippet,
+            'score': round(-hit.score, 4),
+            'destination': {
+                'id': destination.id,
+                'name': destination.name,
+                'city': destination.city,
+                'country': destination.country,
+                'country_flag': COUNTRY_FLAGS.get(destination.country, '🌍'),
+            },
+        })
+    
+    return JsonResponse({
+        'results': results,
+        'count': len(results),
+        'offset': offset,
+    })
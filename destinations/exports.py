@@ -0,0 +1,174 @@
+"""
+Streaming JSON exports of whole tables
+
+Rows are read with values().iterator(chunk_size=...) and serialized as they
+are sent through a StreamingHttpResponse, so memory use does not depend on
+the size of the table. Query parameters:
+
+  format  json (default, one array) or ndjson (one object per line)
+  fields  comma-separated columns to include (default: all)
+  omit    comma-separated columns to leave out, e.g. omit=content
+  limit   rows per page (at least 1); the response then carries
+          X-Next-Cursor and a Link rel="next" header while more rows remain
+  after   keyset cursor: only rows with a primary key above it
+  since   change feed instead of rows: entries for rows created, updated
+          or deleted after a cursor (0 for everything), at most limit
+          (default FEED_LIMIT) per page; see change_feed.py
+
+Clients that send Accept-Encoding: gzip get the stream gzip-compressed on
+the fly.
+"""
+
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .change_feed import changes, CursorError, CursorExpired
+from .response_store import accepted_encodings
+
+CHUNK_SIZE = 500
+MAX_LIMIT = 10000
+# Default page size of the change feed
+FEED_LIMIT = 1000
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _column_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def _columns(model, params):
+    """Selected column names (attnames, e.g. destination_id), validated"""
+    available = [field.attname for field in model._meta.concrete_fields]
+    fields = _column_list(params.get('fields', '')) or available
+    omit = set(_column_list(params.get('omit', '')))
+    unknown = (set(fields) | omit) - set(available)
+    if unknown:
+        raise ExportError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = [name for name in fields if name not in omit]
+    if not columns:
+        raise ExportError('No fields left to export')
+    return columns
+
+
+def _int_param(params, name, default=None, minimum=0, maximum=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ExportError(f'{name} must be an integer')
+    if number < minimum:
+        raise ExportError(f'{name} must be at least {minimum}' if minimum else f'{name} must not be negative')
+    return min(number, maximum) if maximum else number
+
+
+def _next_cursor(queryset, limit):
+    """Cursor for the page after this one, or None on the last page"""
+    pks = list(queryset.values_list('pk', flat=True)[limit - 1:limit + 1])
+    return pks[0] if len(pks) == 2 else None
+
+
+def _encode(rows, output_format):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    if output_format == 'json':
+        yield '['
+    first = True
+    batch = []
+    for row in rows:
+        line = encoder.encode(row)
+        if output_format == 'json':
+            batch.append(line if first else ',' + line)
+        else:
+            batch.append(line + '\n')
+        first = False
+        if len(batch) >= 100:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+    if output_format == 'json':
+        yield ']'
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _streaming_response(request, chunks, output_format):
+    if 'gzip' in accepted_encodings(request):
+        response = StreamingHttpResponse(_gzipped(chunks), content_type=CONTENT_TYPES[output_format])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse((chunk.encode() for chunk in chunks), content_type=CONTENT_TYPES[output_format])
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _next_link(request, name, value):
+    query = request.GET.copy()
+    query[name] = value
+    return f'<{request.path}?{query.urlencode()}>; rel="next"'
+
+
+def _stream_changes(request, queryset, columns, output_format, limit):
+    try:
+        entries, next_cursor, has_more = changes(queryset, columns, request.GET['since'], limit or FEED_LIMIT)
+    except CursorExpired as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=410)
+    except CursorError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    response = _streaming_response(request, _encode(entries, output_format), output_format)
+    response['X-Next-Cursor'] = next_cursor
+    response['X-Has-More'] = 'true' if has_more else 'false'
+    if has_more:
+        response['Link'] = _next_link(request, 'since', next_cursor)
+    return response
+
+
+def stream_export(request, queryset):
+    """Streaming response exporting a queryset's rows (see module docstring)"""
+    params = request.GET
+    try:
+        output_format = params.get('format', 'json')
+        if output_format not in CONTENT_TYPES:
+            raise ExportError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+        columns = _columns(queryset.model, params)
+        limit = _int_param(params, 'limit', minimum=1, maximum=MAX_LIMIT)
+        after = _int_param(params, 'after')
+    except ExportError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    if 'since' in params:
+        return _stream_changes(request, queryset, columns, output_format, limit)
+
+    queryset = queryset.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    next_cursor = None
+    if limit:
+        next_cursor = _next_cursor(queryset, limit)
+        queryset = queryset[:limit]
+
+    chunks = _encode(queryset.values(*columns).iterator(chunk_size=CHUNK_SIZE), output_format)
+    response = _streaming_response(request, chunks, output_format)
+    if next_cursor is not None:
+        response['X-Next-Cursor'] = str(next_cursor)
+        response['Link'] = _next_link(request, 'after', next_cursor)
+    return response
@@ -0,0 +1,230 @@
+"""
+Full-text search over golf guide and city guide text (SQLite FTS5)
+
+Each guide is one row in an FTS5 table: title, location and body columns
+plus unindexed kind/object/destination/language columns. Rowids derive from
+the guide's primary key (golf guides even, city guides odd), so a guide is
+re-indexed with a delete + insert and no lookup. Japanese and Chinese text
+has no spaces between words, so those languages go to a second table that
+uses the trigram tokenizer; everything else uses unicode61 with diacritics
+folded.
+
+Rows are written by the save/delete receivers in models.py inside the same
+transaction as the guide itself. rebuild_search_index recreates everything.
+"""
+
+import html
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+from .models import DestinationGuide, CityGuide
+
+WORD_TABLE = 'destinations_guide_fts'
+TRIGRAM_TABLE = 'destinations_guide_fts_trigram'
+TRIGRAM_LANGUAGES = {'ja', 'zh'}
+KIND_GOLF_GUIDE = 'golf_guide'
+KIND_CITY_GUIDE = 'city_guide'
+
+# bm25 column weights: title, location, body
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_TOKENS = 16
+# Markers that cannot appear in guide text; swapped for <mark> after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+_MARKDOWN_LINK = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+_MARKDOWN_SYNTAX = re.compile(r'[#*_>`|~]+')
+_QUERY_PART = re.compile(r'"([^"]+)"|(\S+)')
+
+SearchHit = namedtuple('SearchHit', 'kind object_id destination_id score title snippet')
+
+
+def _table(language):
+    return TRIGRAM_TABLE if language in TRIGRAM_LANGUAGES else WORD_TABLE
+
+
+def _rowid(kind, pk):
+    return pk * 2 + (1 if kind == KIND_CITY_GUIDE else 0)
+
+
+def _plain_text(markdown_text):
+    """Drop markdown syntax so it doesn't show up in snippets"""
+    return _MARKDOWN_SYNTAX.sub(' ', _MARKDOWN_LINK.sub(r'\1', markdown_text or ''))
+
+
+def _json_text(data):
+    """Keys and string values of a city guide JSON section, depth first"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield str(key)
+            yield from _json_text(value)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _json_text(item)
+    elif isinstance(data, str):
+        yield data
+
+
+def _location(destination):
+    return ' '.join(filter(None, [
+        destination.name, destination.city, destination.region_or_state, destination.country
+    ]))
+
+
+def _golf_guide_document(guide):
+    destination = guide.destination
+    return (
+        KIND_GOLF_GUIDE, guide.pk, guide.destination_id, guide.language_code,
+        f"{destination.name} Golf Guide", _location(destination), _plain_text(guide.content),
+    )
+
+
+def _city_guide_document(city_guide):
+    sections = [city_guide.overview, city_guide.golf_summary]
+    for field in ('neighborhoods', 'attractions', 'dining', 'nightlife', 'shopping',
+                  'transportation', 'accommodation', 'seasonal_guide', 'practical_info'):
+        sections.extend(_json_text(getattr(city_guide, field)))
+    return (
+        KIND_CITY_GUIDE, city_guide.pk, city_guide.destination_id, city_guide.language_code,
+        city_guide.title or city_guide.destination.city,
+        _location(city_guide.destination), _plain_text('\n'.join(filter(None, sections))),
+    )
+
+
+def _write(cursor, documents):
+    for kind, pk, destination_id, language, title, location, body in documents:
+        cursor.execute(
+            f"INSERT INTO {_table(language)} "
+            f"(rowid, title, location, body, kind, object_id, destination_id, language_code) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            [_rowid(kind, pk), title, location, body, kind, pk, destination_id, language]
+        )
+
+
+def _delete(cursor, kind, pk):
+    # The language may have changed since the row was written, so clear both tables
+    for table in (WORD_TABLE, TRIGRAM_TABLE):
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [_rowid(kind, pk)])
+
+
+def index_golf_guide(guide):
+    with connection.cursor() as cursor:
+        _delete(cursor, KIND_GOLF_GUIDE, guide.pk)
+        _write(cursor, [_golf_guide_document(guide)])
+
+
+def index_city_guide(city_guide):
+    """Index a published city guide; unpublished guides are removed"""
+    with connection.cursor() as cursor:
+        _delete(cursor, KIND_CITY_GUIDE, city_guide.pk)
+        if city_guide.is_published:
+            _write(cursor, [_city_guide_document(city_guide)])
+
+
+def unindex(kind, pk):
+    with connection.cursor() as cursor:
+        _delete(cursor, kind, pk)
+
+
+def index_destination(destination):
+    """Re-index every guide of a destination (its name/location is in each row)"""
+    with transaction.atomic():
+        for guide in destination.guides.all():
+            guide.destination = destination
+            index_golf_guide(guide)
+        for city_guide in destination.city_guides.all():
+            city_guide.destination = destination
+            index_city_guide(city_guide)
+
+
+def rebuild_index(batch_size=200):
+    """Recreate both tables from scratch; returns the number of indexed guides"""
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in (WORD_TABLE, TRIGRAM_TABLE):
+            cursor.execute(f"DELETE FROM {table}")
+
+        sources = [
+            (DestinationGuide.objects.all(), _golf_guide_document),
+            (CityGuide.objects.filter(is_published=True), _city_guide_document),
+        ]
+        for queryset, document in sources:
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(pks), batch_size):
+                chunk = queryset.model.objects.select_related('destination').filter(pk__in=pks[start:start + batch_size])
+                _write(cursor, [document(obj) for obj in chunk])
+                count += len(chunk)
+
+        for table in (WORD_TABLE, TRIGRAM_TABLE):
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    return count
+
+
+def _parse_query(query):
+    """Quoted phrases and bare words from user input, FTS syntax stripped"""
+    terms = []
+    for phrase, word in _QUERY_PART.findall(query):
+        text = ' '.join(re.findall(r'\w+', phrase or word))
+        if text:
+            terms.append(text)
+    return terms
+
+
+def _match_expression(terms, prefix_last):
+    quoted = [f'"{term}"' for term in terms]
+    if prefix_last and quoted and ' ' not in terms[-1]:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _snippet_html(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def search(query, language='en', kind=None, limit=20, offset=0):
+    """Ranked SearchHits (best first) for a query in one language"""
+    terms = _parse_query(query)
+    if not terms:
+        return []
+
+    table = _table(language)
+    conditions = ['language_code = %s']
+    params = [language]
+    if kind:
+        conditions.append('kind = %s')
+        params.append(kind)
+
+    if table == TRIGRAM_TABLE:
+        # Trigrams can't match terms shorter than three characters: use LIKE for those
+        short = [term for term in terms if len(term) < 3]
+        terms = [term for term in terms if len(term) >= 3]
+        for term in short:
+            conditions.append('(title LIKE %s OR body LIKE %s)')
+            params.extend([f'%{term}%'] * 2)
+
+    if terms:
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        sql = (
+            f"SELECT kind, object_id, destination_id, bm25({table}, {weights}) AS score, title, "
+            f"snippet({table}, 2, %s, %s, '…', {SNIPPET_TOKENS}) "
+            f"FROM {table} WHERE {table} MATCH %s AND {' AND '.join(conditions)} "
+            f"ORDER BY score LIMIT %s OFFSET %s"
+        )
+        params = [_MARK_START, _MARK_END, _match_expression(terms, table == WORD_TABLE)] + params
+    else:
+        sql = (
+            f"SELECT kind, object_id, destination_id, 0.0, title, substr(body, 1, 200) "
+            f"FROM {table} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY rowid LIMIT %s OFFSET %s"
+        )
+    params += [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        SearchHit(kind, object_id, destination_id, score, title, _snippet_html(snippet))
+        for kind, object_id, destination_id, score, title, snippet in rows
+    ]
@@ -0,0 +1,218 @@
+"""
+Materialized per-language home page snapshot
+
+Everything views.home needs (destination cards, hero stats, the featured
+set and the map catalog) is built in one query per language and stored in the
+cache. Each process also keeps the last snapshot it used, validated against a
+small version key, so the hot path does not touch the database or
+deserialize the catalog.
+
+The map/typeahead catalog is serialized once per snapshot as a compact
+columnar JSON document and published under its content hash, so the page
+references it by URL instead of inlining it and browsers/CDNs can cache it
+indefinitely.
+
+A snapshot is built in full only when a request finds none. After that,
+guide creates/deletes and destination edits patch the destination's card
+in the cached snapshots of the languages it appears in (or appeared in)
+once the change commits, re-encoding the catalog but not re-reading the
+catalog from the database. Guide content edits don't change the home page
+and are skipped. Only HOME_LANGUAGES get a snapshot, so arbitrary
+/<language>/ URLs can't fill the cache.
+"""
+
+import hashlib
+import json
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Destination, DestinationGuide
+from .work_queue import TARGET_LANGUAGES
+
+# Site languages plus every language guides are generated in
+HOME_LANGUAGES = frozenset(Destination.SUPPORTED_LANGUAGES) | frozenset(TARGET_LANGUAGES)
+
+FEATURED_LIMIT = 6
+# Snapshots are patched on change, so they can live for a long time
+SNAPSHOT_TIMEOUT = 7 * 86400
+# Held while a process patches one language's snapshot
+PATCH_LOCK_TIMEOUT = 30
+
+CARD_FIELDS = ('id', 'name', 'city', 'region_or_state', 'country', 'latitude', 'longitude')
+
+# language -> (version, snapshot) for this process
+_local_snapshots = {}
+
+
+def _snapshot_key(language):
+    return f'home_snapshot_{language}'
+
+
+def _version_key(language):
+    return f'home_snapshot_version_{language}'
+
+
+def build_catalog(cards):
+    """
+    Columnar (parallel array) encoding of the cards used by the map and
+    typeahead; countries are dictionary-encoded. Returns (bytes, content hash).
+    """
+    countries = sorted({card['country'] for card in cards})
+    country_index = {country: i for i, country in enumerate(countries)}
+    catalog = {
+        'id': [card['id'] for card in cards],
+        'name': [card['name'] for card in cards],
+        'city': [card['city'] for card in cards],
+        'region': [card['region_or_state'] for card in cards],
+        'countries': countries,
+        'country': [country_index[card['country']] for card in cards],
+        'lat': [round(card['latitude'], 5) if card['latitude'] is not None else None for card in cards],
+        'lon': [round(card['longitude'], 5) if card['longitude'] is not None else None for card in cards],
+        'url': [card['absolute_url'] for card in cards],
+    }
+    payload = json.dumps(catalog, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return payload, hashlib.sha256(payload).hexdigest()[:20]
+
+
+def _listed(language):
+    """Destinations a language's home page lists"""
+    destinations = Destination.objects.order_by('name', 'id')
+    if language != 'en':
+        return destinations.filter(guides__language_code=language)
+    # For English, show all destinations with any guides
+    return destinations.filter(guides__isnull=False)
+
+
+def _card(row, language):
+    # Model instance (not saved) only to reuse slug/URL generation
+    destination = Destination(**row)
+    card = dict(row)
+    card['slug'] = destination.generate_slug(language)
+    card['latitude'] = float(row['latitude']) if row['latitude'] else None
+    card['longitude'] = float(row['longitude']) if row['longitude'] else None
+    card['absolute_url'] = destination.get_absolute_url(language)
+    return card
+
+
+def _available_languages():
+    return sorted(DestinationGuide.objects.order_by().values_list('language_code', flat=True).distinct())
+
+
+def _summarize(snapshot):
+    """Fill in everything derived from the cards (cards are in (name, id) order)"""
+    cards = snapshot['cards']
+    catalog, catalog_hash = build_catalog(cards)
+    snapshot.update(
+        featured=cards[:FEATURED_LIMIT],
+        total_destinations=len(cards),
+        total_countries=len({card['country'] for card in cards}),
+        catalog=catalog,
+        catalog_hash=catalog_hash,
+        built_at=time.time(),
+    )
+    return snapshot
+
+
+def build_home_snapshot(language):
+    """Build the home page data for one language in a single pass"""
+    cards = [_card(row, language) for row in _listed(language).values(*CARD_FIELDS).distinct()]
+    return _summarize({
+        'language': language,
+        'cards': cards,
+        'available_languages': _available_languages(),
+    })
+
+
+def _publish(language, snapshot):
+    """Store a snapshot and bump its version so processes drop their copy"""
+    version = snapshot['built_at']
+    snapshot['version'] = version
+    cache.set(_snapshot_key(language), snapshot, SNAPSHOT_TIMEOUT)
+    cache.set(_version_key(language), version, SNAPSHOT_TIMEOUT)
+    _local_snapshots[language] = (version, snapshot)
+    return snapshot
+
+
+def rebuild_home_snapshot(language):
+    """Build and publish a snapshot"""
+    return _publish(language, build_home_snapshot(language))
+
+
+def get_home_snapshot(language):
+    """Current snapshot for a language; builds it on first use"""
+    version = cache.get(_version_key(language))
+    local = _local_snapshots.get(language)
+    if local and version is not None and local[0] == version:
+        return local[1]
+
+    snapshot = cache.get(_snapshot_key(language))
+    if snapshot is None or version is None or snapshot.get('version') != version:
+        return rebuild_home_snapshot(language)
+    _local_snapshots[language] = (version, snapshot)
+    return snapshot
+
+
+def search_cards(snapshot, q):
+    """Case-insensitive substring match on name/city/region/country, like the old icontains filter"""
+    needle = q.casefold()
+    return [
+        card for card in snapshot['cards']
+        if needle in card['name'].casefold()
+        or needle in card['city'].casefold()
+        or needle in card['region_or_state'].casefold()
+        or needle in card['country'].casefold()
+    ]
+
+
+def _patch_snapshot(language, destination_id, available_languages):
+    """Replace, add or drop one destination's card in a cached snapshot"""
+    snapshot = cache.get(_snapshot_key(language))
+    if snapshot is None or snapshot.get('version') != cache.get(_version_key(language)):
+        return  # Nothing published (or a copy being replaced); the next request builds it
+    lock = f'{_snapshot_key(language)}:patching'
+    if not cache.add(lock, 1, PATCH_LOCK_TIMEOUT):
+        # Another process is patching: a full build on the next request can't lose either change
+        cache.delete(_version_key(language))
+        return
+    try:
+        cards = [card for card in snapshot['cards'] if card['id'] != destination_id]
+        row = _listed(language).filter(pk=destination_id).values(*CARD_FIELDS).first()
+        if row is not None:
+            card = _card(row, language)
+            cards.insert(bisect_left([(c['name'], c['id']) for c in cards], (card['name'], card['id'])), card)
+        snapshot = _summarize(dict(snapshot, cards=cards, available_languages=available_languages))
+        _publish(language, snapshot)
+    finally:
+        cache.delete(lock)
+
+
+def schedule_refresh(destination_id, languages=()):
+    """
+    Patch a destination's card once the current transaction commits, in
+    English, the given languages and every language it has a guide in
+    """
+    languages = set(languages)
+
+    def refresh():
+        available = _available_languages()
+        affected = {'en'} | languages | languages_for_destination(destination_id)
+        for language in affected & HOME_LANGUAGES:
+            _patch_snapshot(language, destination_id, available)
+        # The language count shown on every page may have changed too
+        for language in HOME_LANGUAGES - affected:
+            snapshot = cache.get(_snapshot_key(language))
+            if snapshot is not None and snapshot.get('available_languages') != available:
+                _patch_snapshot(language, destination_id, available)
+
+    transaction.on_commit(refresh)
+
+
+def languages_for_destination(destination_id):
+    """Snapshots a destination appears in: English plus each of its guide languages"""
+    return {'en'} | set(
+        DestinationGuide.objects.filter(destination_id=destination_id)
+        .values_list('language_code', flat=True)
+    )
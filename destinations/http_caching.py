@@ -0,0 +1,104 @@
+"""
+HTTP caching policy for the golf guide and city guide detail pages
+
+Validators come from the URL registry and the cache tags, never from a
+render: one indexed PageRoute lookup gives the guide's updated_at, and the
+ETag hashes that with the current versions of the page's cache tags (its
+destination and country), so it also changes when the destination or a
+related block on the page does. A code version (RENDERER_VERSION, the app's
+templates and views, and the optional PAGE_VERSION setting) is mixed in too,
+so a deploy that changes the markup changes every ETag. Requests carrying a
+matching If-None-Match get a 304 before the view (or the full-page cache)
+runs.
+
+The ETag is weak (W/"..."): the same page is served identity, gzip or brotli
+encoded (see response_store.py), and the validator names the page, not one
+byte representation of it.
+
+No Last-Modified is sent: the tag versions have no timestamp, so a date
+could not move when a related block changes, and a client revalidating
+with If-Modified-Since alone would get a 304 for a page that changed.
+
+Every 200/304 also carries a Cache-Control policy with s-maxage and
+stale-while-revalidate, so a reverse proxy in front of Django can answer
+repeat crawler visits itself.
+"""
+
+import functools
+import hashlib
+import inspect
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache_tags
+from .rendering import RENDERER_VERSION
+from .url_registry import route_validators
+
+# Browsers revalidate after 5 minutes, shared caches after an hour, and may
+# serve a stale copy for a day while they revalidate in the background
+DEFAULT_POLICY = {
+    'public': True,
+    'max_age': 300,
+    's_maxage': 3600,
+    'stale_while_revalidate': 86400,
+}
+
+
+@functools.cache
+def code_version():
+    """Digest of everything besides the data that shapes a page; computed once per process"""
+    app_dir = Path(__file__).resolve().parent
+    digest = hashlib.md5(f"{RENDERER_VERSION}|{getattr(settings, 'PAGE_VERSION', '')}".encode())
+    for path in [app_dir / 'views.py', *sorted((app_dir / 'templates').rglob('*.html'))]:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def _page_etag(validators):
+    tags = [cache_tags.destination_tag(validators['destination_id']), cache_tags.country_tag(validators['country'])]
+    versions = cache_tags.tag_versions(tags)
+    source = '|'.join(
+        [code_version(), validators['updated_at'].isoformat()] + [f'{tag}={versions[tag]}' for tag in tags]
+    )
+    return f'W/"{hashlib.md5(source.encode()).hexdigest()}"'
+
+
+def conditional_page(kind, **policy):
+    """
+    ETag/304 handling and a Cache-Control policy for a detail view taking
+    (request, slug, language). Keyword arguments override DEFAULT_POLICY
+    entries.
+    """
+    cache_control = dict(DEFAULT_POLICY, **policy)
+
+    def decorator(view):
+        signature = inspect.signature(view)
+
+        def validators(request, *args, **kwargs):
+            if not hasattr(request, '_page_validators'):
+                bound = signature.bind(request, *args, **kwargs)
+                bound.apply_defaults()
+                request._page_validators = route_validators(
+                    kind, bound.arguments['language'], bound.arguments['slug']
+                )
+            return request._page_validators
+
+        def etag(request, *args, **kwargs):
+            found = validators(request, *args, **kwargs)
+            return _page_etag(found) if found else None
+
+        conditional_view = condition(etag_func=etag)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, **cache_control)
+            return response
+
+        return wrapper
+
+    return decorator
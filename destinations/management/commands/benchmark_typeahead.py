@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from destinations.models import Destination
+from destinations.typeahead_index import TypeaheadIndex, build_index
+
+DEFAULT_QUERIES = [
+    'pe', 'peb', 'pebble', 'st and', 'andrew', 'cal', 'california', 'japan',
+    'san d', 'mont', 'costa', 'golf', 'cancun', 'malaga', 'zz',
+]
+
+
+def _percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def _orm_search(query):
+    """The original typeahead query (four OR'd icontains + distinct)"""
+    return list(Destination.objects.filter(
+        models.Q(name__icontains=query) |
+        models.Q(city__icontains=query) |
+        models.Q(region_or_state__icontains=query) |
+        models.Q(country__icontains=query)
+    ).filter(guides__isnull=False).distinct().order_by('name')[:10])
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the in-memory typeahead index against the ORM icontains query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Queries to time (defaults to a mixed set)')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per query')
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Also time an index over this many generated rows (no database writes)'
+        )
+
+    def _time(self, label, search, queries, repeat):
+        samples = []
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                search(query)
+                samples.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{label:<28} p50 {_percentile(samples, 0.5):8.3f} ms   "
+            f"p99 {_percentile(samples, 0.99):8.3f} ms   max {max(samples):8.3f} ms"
+        )
+
+    def _synthetic_rows(self, count, rows):
+        """Recombine real name/location parts into `count` plausible rows"""
+        rows = rows or [{
+            'name': 'Pebble Beach', 'city': 'Monterey', 'region_or_state': 'California',
+            'country': 'United States',
+        }]
+        words = sorted({word for row in rows for word in row['name'].split()})
+        for i in range(count):
+            place = random.choice(rows)
+            name = ' '.join(random.sample(words, min(len(words), random.randint(1, 3))))
+            yield {
+                'id': i + 1,
+                'name': f"{name} {i}",
+                'city': place['city'],
+                'region_or_state': place['region_or_state'],
+                'country': place['country'],
+                'url': f"/golf-courses/synthetic-{i}/",
+            }
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        repeat = options['repeat']
+
+        start = time.perf_counter()
+        index = build_index()
+        self.stdout.write(f"Built index over {len(index)} destinations in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        self._time('ORM icontains', _orm_search, queries, max(1, repeat // 10))
+        self._time('index (uncached)', lambda q: index.search(q, cached=False), queries, repeat)
+        self._time('index (result cache)', index.search, queries, repeat)
+
+        if options['synthetic']:
+            rows = list(Destination.objects.values('name', 'city', 'region_or_state', 'country')[:2000])
+            start = time.perf_counter()
+            synthetic = TypeaheadIndex(self._synthetic_rows(options['synthetic'], rows))
+            self.stdout.write(
+                f"Built synthetic index over {len(synthetic)} rows in {(time.perf_counter() - start) * 1000:.1f} ms"
+            )
+            self._time('synthetic (uncached)', lambda q: synthetic.search(q, cached=False), queries, repeat)
+            self._time('synthetic (result cache)', synthetic.search, queries, repeat)
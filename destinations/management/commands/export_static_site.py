@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from destinations.static_export import dump_paths, export_site, export_paths, export_root, brotli
+
+class Command(BaseCommand):
+    help = 'Renders the public site to STATIC_SITE_ROOT (with .gz/.br siblings) for nginx to serve'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Pages rendered in parallel')
+        parser.add_argument('--dumps', action='store_true', help='Only re-export the full JSON dumps (cron)')
+        parser.add_argument('paths', nargs='*', help='Only re-export these paths (no pruning)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Exporting to {export_root()}...")
+        if not brotli:
+            self.stdout.write("brotli is not installed; writing .gz siblings only")
+        if options['paths'] or options['dumps']:
+            paths = options['paths'] + (dump_paths() if options['dumps'] else [])
+            written, failed = export_paths(paths, options['workers'])
+            pruned = 0
+        else:
+            written, failed, pruned = export_site(options['workers'])
+        for path, status in failed:
+            self.stdout.write(self.style.WARNING(f"Skipped {path} (HTTP {status})"))
+        self.stdout.write(self.style.SUCCESS(f"Exported {len(written)} pages, pruned {pruned} stale files"))
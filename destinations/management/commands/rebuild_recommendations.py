@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from destinations.recommendations import rebuild_all, refresh_popular_pool
+
+class Command(BaseCommand):
+    help = 'Rebuilds the precomputed related-destinations index (nearby / same country / popular)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--popular-only', action='store_true', help='Only resample the popular pools (cheap; suitable for cron rotation)')
+
+    def handle(self, *args, **options):
+        if options['popular_only']:
+            refresh_popular_pool()
+            self.stdout.write(self.style.SUCCESS("Resampled popular destination pools"))
+            return
+        count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} related-destination sets"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from destinations.guide_search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index over golf guides and published city guides'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Guides loaded per query')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding search index...")
+        count = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} guides"))
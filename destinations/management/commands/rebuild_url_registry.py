@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from destinations.url_registry import rebuild_registry
+
+class Command(BaseCommand):
+    help = 'Rebuilds the URL registry used to resolve golf guide and city guide detail pages'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding URL registry...")
+        count = rebuild_registry()
+        self.stdout.write(self.style.SUCCESS(f"Registered {count} routes"))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from destinations.work_queue import rebuild_queue
+
+class Command(BaseCommand):
+    help = 'Rebuilds the content generation work queue from the existing guides'
+
+    def handle(self, *args, **options):
+        total = rebuild_queue()
+        self.stdout.write(self.style.SUCCESS(f"Queued {total} work units"))
@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from destinations import cache_tags
+from destinations.models import DestinationGuide, PageRoute
+from destinations.rendering import RENDERER_VERSION, content_hash, render_article
+from destinations.static_export import export_enabled, export_paths
+
+
+def _render(item):
+    """Render one (pk, content) pair in a worker process"""
+    pk, content = item
+    html, truncated = render_article(content)
+    return pk, html, truncated, content_hash(content)
+
+
+class Command(BaseCommand):
+    help = 'Re-renders stored article HTML for golf guides (run after changing the formatter)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every guide, not only stale ones')
+        parser.add_argument('--workers', type=int, default=None, help='Number of render processes (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Guides written per bulk update')
+
+    def handle(self, *args, **options):
+        guides = DestinationGuide.objects.order_by('pk')
+        if not options['all']:
+            guides = guides.exclude(render_version=RENDERER_VERSION, rendered_html__gt='')
+
+        total = guides.count()
+        self.stdout.write(f"Rendering {total} guides (renderer v{RENDERER_VERSION})")
+        if not total:
+            return
+
+        batch_size = options['batch_size']
+        # Collect ids up front: SQLite gives no isolation between an open
+        # cursor and writes to the same table on one connection
+        pks = list(guides.values_list('pk', flat=True))
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for start in range(0, len(pks), batch_size):
+                chunk = pks[start:start + batch_size]
+                items = list(DestinationGuide.objects.filter(pk__in=chunk).values_list('pk', 'content'))
+                now = timezone.now()
+                pending = [
+                    DestinationGuide(
+                        pk=pk,
+                        rendered_html=html,
+                        is_truncated=truncated,
+                        content_hash=digest,
+                        render_version=RENDERER_VERSION,
+                        updated_at=now,
+                    )
+                    for pk, html, truncated, digest in pool.map(_render, items, chunksize=8)
+                ]
+                # bulk_update bypasses save() and its signals: move updated_at (the
+                # change feed and the pages' ETags) and drop the cached pages here
+                DestinationGuide.objects.bulk_update(
+                    pending, ['rendered_html', 'is_truncated', 'content_hash', 'render_version', 'updated_at']
+                )
+                destination_ids = DestinationGuide.objects.filter(pk__in=chunk).values_list('destination_id', flat=True)
+                cache_tags.invalidate(*{cache_tags.destination_tag(pk) for pk in destination_ids})
+                done += len(pending)
+                self.stdout.write(f"  Rendered {done}/{total} guides")
+
+        self.stdout.write(self.style.SUCCESS(f"Re-rendered {done} guides"))
+
+        # Nor does it reach the static export's receivers
+        if export_enabled():
+            paths = list(PageRoute.objects.filter(destination_guide_id__in=pks).values_list('path', flat=True))
+            written, failed = export_paths(paths)
+            self.stdout.write(self.style.SUCCESS(f"Re-exported {len(written)} pages ({len(failed)} skipped)"))
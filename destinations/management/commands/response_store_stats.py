@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from destinations.page_cache import cached_views
+from destinations.response_store import view_stats
+
+class Command(BaseCommand):
+    help = 'Reports bytes saved by minified, precompressed page storage, per view'
+
+    def handle(self, *args, **options):
+        for view_name in cached_views():
+            stats = view_stats(view_name)
+            pages, raw = stats['pages'], stats['raw']
+            if not pages:
+                self.stdout.write(f"{view_name}: no pages stored yet")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"{view_name}: {pages} pages stored, {raw / pages / 1024:.1f}KB average"))
+            for field in ('minified', 'gzip', 'br'):
+                if stats[field]:
+                    saved = raw - stats[field]
+                    self.stdout.write(
+                        f"  {field:>8}: {stats[field] / pages / 1024:.1f}KB average, "
+                        f"{saved / pages / 1024:.1f}KB ({100 * saved / raw:.0f}%) saved per response"
+                    )
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from destinations.models import Destination
+from destinations.realtime_service import (
+    RealTimeDestinationData, get_upstream_call_counts, reset_upstream_call_counts,
+)
+
+
+class Command(BaseCommand):
+    help = 'Refreshes expired realtime data (weather, exchange rates) for every destination with guides'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent upstream requests')
+        parser.add_argument('--report', action='store_true',
+                            help='Only print the upstream call counters, refreshing nothing')
+        parser.add_argument('--reset-counts', action='store_true',
+                            help='Zero the upstream call counters before running (or, with --report, after printing)')
+
+    def report(self):
+        counts = ', '.join(f"{kind}: {count}" for kind, count in get_upstream_call_counts().items())
+        self.stdout.write(f"Upstream calls so far: {counts}")
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self.report()
+            if options['reset_counts']:
+                reset_upstream_call_counts()
+                self.stdout.write(self.style.SUCCESS("Upstream call counters reset"))
+            return
+        if options['reset_counts']:
+            reset_upstream_call_counts()
+
+        locations = list(
+            Destination.objects.filter(guides__isnull=False)
+            .order_by()
+            .values_list('city', 'country')
+            .distinct()
+        )
+        self.stdout.write(f"Checking realtime data for {len(locations)} locations")
+
+        service = RealTimeDestinationData()
+
+        def refresh(location):
+            from django.db import connection
+            try:
+                return service.refresh_destination_data(*location)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            refreshed = sum(pool.map(refresh, locations))
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} expired entries"))
+        self.report()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0009_alter_cityguide_options_cityguide_character_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Public URL path, e.g. /de/golf-courses/de-golf-course-.../', max_length=400, unique=True)),
+                ('kind', models.CharField(choices=[('golf_guide', 'Golf Guide'), ('city_guide', 'City Guide')], max_length=20)),
+                ('language_code', models.CharField(max_length=10)),
+                ('slug', models.SlugField(db_index=False, max_length=300)),
+                ('is_canonical', models.BooleanField(default=True, help_text='False for legacy alias slugs that still resolve')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city_guide', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='routes', to='destinations.cityguide')),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routes', to='destinations.destination')),
+                ('destination_guide', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='routes', to='destinations.destinationguide')),
+            ],
+            options={
+                'ordering': ['path'],
+                'unique_together': {('kind', 'language_code', 'slug')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0010_pageroute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destinationguide',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of content the HTML was rendered from', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='destinationguide',
+            name='is_truncated',
+            field=models.BooleanField(default=False, help_text='Content looks incomplete; a notice is appended to the HTML'),
+        ),
+        migrations.AddField(
+            model_name='destinationguide',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Renderer version that produced rendered_html'),
+        ),
+        migrations.AddField(
+            model_name='destinationguide',
+            name='rendered_html',
+            field=models.TextField(blank=True, help_text='Sanitized article HTML rendered from content'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0011_destinationguide_rendered_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularDestinationPool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', models.CharField(max_length=10, unique=True)),
+                ('entries', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RelatedDestinations',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', models.CharField(max_length=10)),
+                ('nearby_ids', models.JSONField(default=list)),
+                ('same_country_ids', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_sets', to='destinations.destination')),
+            ],
+            options={
+                'unique_together': {('destination', 'language_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0012_related_destinations_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealtimeSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
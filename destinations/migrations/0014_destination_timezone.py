@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+def assign_timezones(apps, schema_editor):
+    from destinations.timezones import guess_timezone
+    Destination = apps.get_model('destinations', 'Destination')
+    destinations = list(Destination.objects.only('id', 'country', 'region_or_state', 'latitude', 'longitude'))
+    for destination in destinations:
+        destination.timezone = guess_timezone(
+            destination.country, destination.region_or_state,
+            destination.latitude, destination.longitude
+        )
+    Destination.objects.bulk_update(destinations, ['timezone'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0013_realtimesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='timezone',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(assign_timezones, migrations.RunPython.noop),
+    ]
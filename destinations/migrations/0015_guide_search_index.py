@@ -0,0 +1,22 @@
+from django.db import migrations
+
+COLUMNS = 'title, location, body, kind UNINDEXED, object_id UNINDEXED, destination_id UNINDEXED, language_code UNINDEXED'
+
+
+class Migration(migrations.Migration):
+    """FTS5 tables for destinations/guide_search.py (filled by rebuild_search_index)"""
+
+    dependencies = [
+        ('destinations', '0014_destination_timezone'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE VIRTUAL TABLE destinations_guide_fts USING fts5({COLUMNS}, tokenize='unicode61 remove_diacritics 2')",
+            "DROP TABLE destinations_guide_fts",
+        ),
+        migrations.RunSQL(
+            f"CREATE VIRTUAL TABLE destinations_guide_fts_trigram USING fts5({COLUMNS}, tokenize='trigram')",
+            "DROP TABLE destinations_guide_fts_trigram",
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0015_guide_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='destination',
+            index=models.Index(fields=['updated_at', 'id'], name='destination_updated_bf1d0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='destinationguide',
+            index=models.Index(fields=['updated_at', 'id'], name='destination_updated_0ee9fe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exporttombstone',
+            index=models.Index(fields=['model', 'deleted_at', 'id'], name='destination_model_546341_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exporttombstone',
+            index=models.Index(fields=['deleted_at'], name='destination_deleted_c6f06a_idx'),
+        ),
+    ]
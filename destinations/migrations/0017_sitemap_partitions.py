@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0016_export_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='e.g. golf-en-0, city-de-2, pages', max_length=50, unique=True)),
+                ('shards', models.JSONField(default=list)),
+                ('dirty_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0017_sitemap_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', models.CharField(max_length=10)),
+                ('kind', models.CharField(choices=[('golf_guide', 'Golf Guide')], default='golf_guide', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('leased', 'Leased'), ('done', 'Done')], default='pending', max_length=10)),
+                ('priority', models.SmallIntegerField(default=0, help_text='Lower is handed out first')),
+                ('lease_token', models.CharField(blank=True, default='', max_length=32)),
+                ('leased_by', models.CharField(blank=True, default='', max_length=100)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='work_units', to='destinations.destination')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'priority', 'id'], name='destination_status_8abef1_idx'), models.Index(fields=['status', 'lease_expires_at'], name='destination_status_997e98_idx')],
+                'unique_together': {('destination', 'language_code', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+from django.db import migrations
+
+# Copied from destinations.work_queue as of this migration, so later changes
+# there don't change what it does
+BATCH_SIZE = 2000
+PRIORITY_ENGLISH = 0
+PRIORITY_TRANSLATION = 10
+TARGET_LANGUAGES = ('es', 'fr', 'de', 'it', 'pt', 'nl', 'ja', 'ko', 'zh', 'ar')
+
+
+def seed_work_units(apps, schema_editor):
+    """Fill the queue from the existing guides on upgrade, like rebuild_work_queue"""
+    Destination = apps.get_model('destinations', 'Destination')
+    DestinationGuide = apps.get_model('destinations', 'DestinationGuide')
+    WorkUnit = apps.get_model('destinations', 'WorkUnit')
+    if WorkUnit.objects.exists():
+        return
+
+    last_id = 0
+    while True:
+        chunk = list(
+            Destination.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        existing = {}
+        for destination_id, language in DestinationGuide.objects.filter(
+            destination_id__in=chunk
+        ).values_list('destination_id', 'language_code'):
+            existing.setdefault(destination_id, set()).add(language)
+        units = []
+        for destination_id in chunk:
+            languages = existing.get(destination_id, set())
+            wanted = ['en'] + list(TARGET_LANGUAGES) if 'en' in languages else ['en']
+            for language in wanted:
+                units.append(WorkUnit(
+                    destination_id=destination_id,
+                    language_code=language,
+                    kind='golf_guide',
+                    status='done' if language in languages else 'pending',
+                    priority=PRIORITY_ENGLISH if language == 'en' else PRIORITY_TRANSLATION,
+                ))
+        WorkUnit.objects.bulk_create(units, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0019_work_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_work_units, migrations.RunPython.noop),
+    ]
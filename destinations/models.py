@@ -1,8 +1,7 @@
 from django.db import models
 from django.utils.text import slugify
 from django.urls import reverse
-from django.core.cache import cache
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 import json
 
@@ -41,6 +40,10 @@ class Destination(models.Model):
     longitude = models.FloatField()
     image_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # IANA zone derived on save from country/region/coordinates (see destinations/timezones.py)
+    timezone = models.CharField(max_length=64, blank=True)
     
     # Multi-language article content stored as JSON
     # Format: {"en": "English content...", "de": "German content...", "es": "Spanish content..."}
@@ -62,6 +65,17 @@ class Destination(models.Model):
         'zh': 'Chinese'
     }
     
+    def save(self, *args, **kwargs):
+        """Derive the IANA timezone from the location on every save"""
+        from .timezones import guess_timezone
+        self.timezone = guess_timezone(self.country, self.region_or_state, self.latitude, self.longitude)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'timezone'}
+        
+        super().save(*args, **kwargs)
+    
     def get_article_content(self, language='en'):
         """Get article content for a specific language, fallback to English"""
         if self.article_content_multilang and language in self.article_content_multilang:
@@ -123,6 +137,9 @@ class Destination(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
 class DestinationGuide(models.Model):
     """
@@ -199,6 +216,25 @@ class DestinationGuide(models.Model):
         help_text="Specific model used for generation (e.g., 'llama3.1:70b')"
     )
     
+    # Pre-rendered article (computed on save, see destinations/rendering.py)
+    rendered_html = models.TextField(
+        blank=True,
+        help_text="Sanitized article HTML rendered from content"
+    )
+    is_truncated = models.BooleanField(
+        default=False,
+        help_text="Content looks incomplete; a notice is appended to the HTML"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA-256 of content the HTML was rendered from"
+    )
+    render_version = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Renderer version that produced rendered_html"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -208,6 +244,12 @@ class DestinationGuide(models.Model):
         help_text="When this content was last regenerated"
     )
     
+    # Fields derived from content in save()
+    DERIVED_FIELDS = [
+        'slug', 'word_count', 'character_count',
+        'rendered_html', 'is_truncated', 'content_hash', 'render_version',
+    ]
+    
     class Meta:
         unique_together = ('destination', 'language_code')
         ordering = ['destination__name', 'language_code']
@@ -217,10 +259,11 @@ class DestinationGuide(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['destination']),
             models.Index(fields=['language_code']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def save(self, *args, **kwargs):
-        """Auto-generate slug and update counts on save"""
+        """Auto-generate slug, update counts and render HTML on save"""
         if not self.slug:
             self.slug = self.generate_slug()
         
@@ -230,8 +273,45 @@ class DestinationGuide(models.Model):
             # Simple word count (split by whitespace)
             self.word_count = len(self.content.split())
         
+        self.render_content()
+        
+        # update_or_create() saves with update_fields=<defaults>; make sure
+        # the values derived from content are written along with it
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.DERIVED_FIELDS)
+        
         super().save(*args, **kwargs)
     
+    def needs_render(self, check_content=True):
+        """True if rendered_html is missing or was produced from other content/renderer"""
+        from .rendering import RENDERER_VERSION, content_hash
+        if not self.rendered_html or self.render_version != RENDERER_VERSION:
+            return True
+        return check_content and self.content_hash != content_hash(self.content)
+    
+    def render_content(self, force=False):
+        """Render content to HTML if it changed since the last render"""
+        from .rendering import RENDERER_VERSION, content_hash, render_article
+        if not force and not self.needs_render():
+            return False
+        self.rendered_html, self.is_truncated = render_article(self.content)
+        self.content_hash = content_hash(self.content)
+        self.render_version = RENDERER_VERSION
+        return True
+    
+    def get_article_html(self):
+        """Stored article HTML; renders and persists it if missing or stale"""
+        # Content only changes through save(), which re-renders, so skip hashing here
+        if self.needs_render(check_content=False) and self.render_content(force=True):
+            DestinationGuide.objects.filter(pk=self.pk).update(
+                rendered_html=self.rendered_html,
+                is_truncated=self.is_truncated,
+                content_hash=self.content_hash,
+                render_version=self.render_version,
+            )
+        return self.rendered_html
+    
     def generate_slug(self):
         """Generate SEO-friendly slug"""
         city = self.destination.city.replace(" ", "-").lower()
@@ -262,26 +342,26 @@ class DestinationGuide(models.Model):
     def __str__(self):
         return f"{self.destination.name} ({self.get_language_code_display()})"
 
-# Cache invalidation signals
+# Cache invalidation signals (see destinations/cache_tags.py)
 @receiver([post_save, post_delete], sender=Destination)
-def invalidate_destination_cache(sender, **kwargs):
-    """Invalidate home page cache when destinations change"""
-    cache.delete('destinations_grid')
-    # Clear view-level cache for home page
-    cache.delete_many([
-        'views.decorators.cache.cache_page.home',
-        'views.decorators.cache.cache_page.home.en',
-    ])
+def invalidate_destination_cache(sender, instance, **kwargs):
+    """A destination's pages, its country's listings and the catalog (names, slugs)"""
+    from .cache_tags import invalidate, destination_tags, country_tag
+    tags = destination_tags(instance)
+    previous = getattr(instance, '_previous_location', None)
+    if previous and previous[2] != instance.country:
+        tags.append(country_tag(previous[2]))
+    invalidate(*tags)
 
 @receiver([post_save, post_delete], sender=DestinationGuide)
-def invalidate_guide_cache(sender, **kwargs):
-    """Invalidate destination detail cache when guides change"""
-    if hasattr(kwargs.get('instance'), 'destination'):
-        dest = kwargs['instance'].destination
-        # Clear destination detail page cache
-        cache.delete(f'destination_detail_{dest.generate_slug()}')
-        # Also clear home page cache as new content might affect featured status
-        cache.delete('destinations_grid')
+def invalidate_guide_cache(sender, instance, created=False, **kwargs):
+    """Content edits touch one destination and language; new/removed guides also the catalog"""
+    from .cache_tags import invalidate, destination_tag, language_tag, country_tag, CATALOG
+    tags = [destination_tag(instance.destination_id), language_tag(instance.language_code)]
+    if created or kwargs['signal'] is post_delete:
+        # Also changes the related-destination blocks of the country's pages
+        tags += [CATALOG, country_tag(instance.destination.country)]
+    invalidate(*tags)
 
 
 class CityGuide(models.Model):
@@ -587,11 +667,499 @@ class CityGuide(models.Model):
 
 # Cache invalidation for city guides
 @receiver([post_save, post_delete], sender=CityGuide)
-def invalidate_city_guide_cache(sender, **kwargs):
-    """Invalidate city guide cache when guides change"""
-    if hasattr(kwargs.get('instance'), 'destination'):
-        dest = kwargs['instance'].destination
-        # Clear city guide detail page cache
-        cache.delete(f'city_guide_detail_{dest.generate_slug()}')
-        # Clear city guide listing cache
-        cache.delete('city_guides_grid')
+def invalidate_city_guide_cache(sender, instance, **kwargs):
+    """The guide's own pages and the nearby-guides block of its country's pages"""
+    from .cache_tags import invalidate, destination_tag, language_tag, country_tag
+    invalidate(
+        destination_tag(instance.destination_id),
+        language_tag(instance.language_code),
+        country_tag(instance.destination.country),
+    )
+
+
+class PageRoute(models.Model):
+    """
+    Persisted URL registry for public detail pages.
+    Maps each public path (language + slug) to the destination and guide that
+    render it, so detail views resolve with a single indexed lookup.
+    """
+    KIND_GOLF_GUIDE = 'golf_guide'
+    KIND_CITY_GUIDE = 'city_guide'
+
+    path = models.CharField(
+        max_length=400,
+        unique=True,
+        help_text="Public URL path, e.g. /de/golf-courses/de-golf-course-.../"
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=[
+            (KIND_GOLF_GUIDE, 'Golf Guide'),
+            (KIND_CITY_GUIDE, 'City Guide'),
+        ]
+    )
+    language_code = models.CharField(max_length=10)
+    slug = models.SlugField(max_length=300, db_index=False)
+    is_canonical = models.BooleanField(
+        default=True,
+        help_text="False for legacy alias slugs that still resolve"
+    )
+
+    destination = models.ForeignKey(
+        Destination,
+        on_delete=models.CASCADE,
+        related_name='routes'
+    )
+    destination_guide = models.ForeignKey(
+        DestinationGuide,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='routes'
+    )
+    city_guide = models.ForeignKey(
+        CityGuide,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='routes'
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'language_code', 'slug')
+        ordering = ['path']
+
+    def __str__(self):
+        return self.path
+
+
+# Keep the URL registry in sync with the rows it points at
+@receiver(post_save, sender=Destination)
+def sync_destination_routes(sender, instance, **kwargs):
+    """Re-register routes when location fields (and therefore slugs) change"""
+    from .url_registry import register_destination
+    register_destination(instance)
+
+@receiver(post_save, sender=DestinationGuide)
+def sync_guide_routes(sender, instance, **kwargs):
+    """Register the public URLs of a saved golf guide"""
+    from .url_registry import register_destination_guide
+    register_destination_guide(instance)
+
+@receiver(post_save, sender=CityGuide)
+def sync_city_guide_routes(sender, instance, **kwargs):
+    """Register (or withdraw, if unpublished) the URL of a saved city guide"""
+    from .url_registry import register_city_guide
+    register_city_guide(instance)
+
+@receiver(post_delete, sender=PageRoute)
+def reassign_removed_route(sender, instance, **kwargs):
+    """Another destination producing the same slug takes over a removed URL"""
+    from .url_registry import route_removed
+    route_removed(instance)
+
+
+class RelatedDestinations(models.Model):
+    """
+    Precomputed "nearby" and "same country" recommendations for one
+    destination page in one language (see destinations/recommendations.py).
+    """
+    destination = models.ForeignKey(
+        Destination,
+        on_delete=models.CASCADE,
+        related_name='related_sets'
+    )
+    language_code = models.CharField(max_length=10)
+    nearby_ids = models.JSONField(default=list)
+    same_country_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('destination', 'language_code')
+
+    def __str__(self):
+        return f"Related to {self.destination_id} ({self.language_code})"
+
+
+class PopularDestinationPool(models.Model):
+    """
+    Pre-sampled, country-diverse pool of destinations per language from which
+    the randomized "popular" block is drawn. Entries are [id, country] pairs.
+    """
+    language_code = models.CharField(max_length=10, unique=True)
+    entries = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Popular pool ({self.language_code}, {len(self.entries)} entries)"
+
+
+# Keep the related-destinations index in sync with the catalog
+@receiver(pre_save, sender=Destination)
+def remember_destination_location(sender, instance, **kwargs):
+    """Stash the previous name/region/country so moves refresh both countries"""
+    instance._previous_location = None
+    if instance.pk:
+        instance._previous_location = (
+            Destination.objects.filter(pk=instance.pk)
+            .values_list('name', 'region_or_state', 'country').first()
+        )
+
+@receiver(post_save, sender=Destination)
+def refresh_destination_recommendations(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_location', None)
+    if created or previous == (instance.name, instance.region_or_state, instance.country):
+        return
+    from .recommendations import refresh_for_destination
+    refresh_for_destination(instance, previous_country=previous[2] if previous else None)
+
+@receiver(post_delete, sender=Destination)
+def refresh_recommendations_after_destination_delete(sender, instance, **kwargs):
+    from .recommendations import refresh_country, remove_from_popular_pool
+    for language in PopularDestinationPool.objects.values_list('language_code', flat=True):
+        refresh_country(instance.country, language)
+        remove_from_popular_pool(instance.id, language)
+
+@receiver(post_save, sender=DestinationGuide)
+def refresh_guide_recommendations(sender, instance, created, **kwargs):
+    """Only catalog membership matters here, so content edits are skipped"""
+    if not created:
+        return
+    from .recommendations import refresh_country, add_to_popular_pool
+    destination = instance.destination
+    refresh_country(destination.country, instance.language_code)
+    add_to_popular_pool(destination.id, destination.country, instance.language_code)
+
+@receiver(post_delete, sender=DestinationGuide)
+def refresh_recommendations_after_guide_delete(sender, instance, **kwargs):
+    from .recommendations import refresh_country, remove_from_popular_pool
+    destination = Destination.objects.filter(pk=instance.destination_id).first()
+    if destination:
+        refresh_country(destination.country, instance.language_code)
+    remove_from_popular_pool(instance.destination_id, instance.language_code)
+
+
+class RealtimeSnapshot(models.Model):
+    """
+    Durable last-known value of a realtime data key (weather, exchange
+    rates). Lets restarted processes serve stale data immediately
+    instead of stampeding the upstream APIs (see destinations/realtime_service.py).
+    """
+    key = models.CharField(max_length=200, unique=True)
+    payload = models.JSONField(default=dict)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} @ {self.fetched_at:%Y-%m-%d %H:%M}"
+
+
+# Keep the materialized home page snapshots current (see destinations/home_snapshot.py)
+@receiver(post_save, sender=Destination)
+def refresh_home_snapshot_for_destination(sender, instance, created, **kwargs):
+    if created:
+        return  # Not listed until it has a guide
+    from .home_snapshot import schedule_refresh
+    schedule_refresh(instance.pk)
+
+@receiver(post_save, sender=DestinationGuide)
+def refresh_home_snapshot_for_guide(sender, instance, created, **kwargs):
+    """Content edits don't change the home page; only new guides do"""
+    if not created:
+        return
+    from .home_snapshot import schedule_refresh
+    schedule_refresh(instance.destination_id, {instance.language_code})
+
+@receiver(post_delete, sender=DestinationGuide)
+def refresh_home_snapshot_after_guide_delete(sender, instance, **kwargs):
+    from .home_snapshot import schedule_refresh
+    schedule_refresh(instance.destination_id, {instance.language_code})
+
+
+@receiver(post_save, sender=Destination)
+def refresh_typeahead_for_destination(sender, instance, created, **kwargs):
+    if created:
+        return  # Not searchable until it has a guide
+    from .typeahead_index import refresh_destination
+    refresh_destination(instance.pk)
+
+@receiver(post_delete, sender=Destination)
+def remove_destination_from_typeahead(sender, instance, **kwargs):
+    from .typeahead_index import refresh_destination
+    refresh_destination(instance.pk)
+
+@receiver([post_save, post_delete], sender=DestinationGuide)
+def refresh_typeahead_for_guide(sender, instance, created=False, **kwargs):
+    """Only membership matters: a destination is searchable once it has any guide"""
+    if kwargs['signal'] is post_save and not created:
+        return
+    from .typeahead_index import refresh_destination
+    refresh_destination(instance.destination_id)
+
+
+@receiver(post_save, sender=DestinationGuide)
+def index_guide_text(sender, instance, **kwargs):
+    from .guide_search import index_golf_guide
+    index_golf_guide(instance)
+
+@receiver(post_save, sender=CityGuide)
+def index_city_guide_text(sender, instance, **kwargs):
+    from .guide_search import index_city_guide
+    index_city_guide(instance)
+
+@receiver(post_save, sender=Destination)
+def reindex_destination_text(sender, instance, created, **kwargs):
+    """Guide rows carry the destination name and location"""
+    if created:
+        return
+    from .guide_search import index_destination
+    index_destination(instance)
+
+@receiver(post_delete, sender=DestinationGuide)
+def unindex_guide_text(sender, instance, **kwargs):
+    from .guide_search import unindex, KIND_GOLF_GUIDE
+    unindex(KIND_GOLF_GUIDE, instance.pk)
+
+@receiver(post_delete, sender=CityGuide)
+def unindex_city_guide_text(sender, instance, **kwargs):
+    from .guide_search import unindex, KIND_CITY_GUIDE
+    unindex(KIND_CITY_GUIDE, instance.pk)
+
+
+class ExportTombstone(models.Model):
+    """
+    Record of a deleted exported row, so the export change feed can tell
+    mirrors to drop it (see destinations/change_feed.py).
+    """
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+@receiver(post_delete, sender=Destination)
+@receiver(post_delete, sender=DestinationGuide)
+def record_export_tombstone(sender, instance, **kwargs):
+    from .change_feed import record_deletion
+    record_deletion(sender, instance.pk)
+
+
+class SitemapPartition(models.Model):
+    """
+    One partition of the sitemap: the shards last written for it, listed in
+    the sitemap index, and whether it needs rewriting (see destinations/sitemaps.py).
+    """
+    key = models.CharField(max_length=50, unique=True, help_text="e.g. golf-en-0, city-de-2, pages")
+    # [[shard name, URL count, newest lastmod (ISO) or null], ...]
+    shards = models.JSONField(default=list)
+    dirty_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# Mark the sitemap partitions a change touches; a debounced flush rewrites them
+@receiver([post_save, post_delete], sender=DestinationGuide)
+def mark_guide_sitemap_dirty(sender, instance, created=False, **kwargs):
+    from .sitemaps import mark_dirty, partition_key
+    keys = [partition_key('golf', instance.language_code, instance.destination_id)]
+    if created or kwargs['signal'] is post_delete:
+        keys.append(partition_key('pages'))  # Home page lastmod per language
+    mark_dirty(keys)
+
+@receiver([post_save, post_delete], sender=CityGuide)
+def mark_city_guide_sitemap_dirty(sender, instance, **kwargs):
+    from .sitemaps import mark_dirty, partition_key
+    mark_dirty([
+        partition_key('city', instance.language_code, instance.destination_id),
+        partition_key('pages'),
+    ])
+
+@receiver(post_save, sender=Destination)
+def mark_destination_sitemap_dirty(sender, instance, created, **kwargs):
+    """Location fields feed the search URLs and every route's slug"""
+    from .sitemaps import mark_dirty, partition_key
+    keys = [partition_key('search')]
+    if not created:
+        routes = PageRoute.objects.filter(destination=instance).order_by().values_list('kind', 'language_code').distinct()
+        sections = {PageRoute.KIND_GOLF_GUIDE: 'golf', PageRoute.KIND_CITY_GUIDE: 'city'}
+        keys += [partition_key(sections[kind], language, instance.pk) for kind, language in routes]
+    mark_dirty(keys)
+
+@receiver(post_delete, sender=Destination)
+def mark_deleted_destination_sitemap_dirty(sender, instance, **kwargs):
+    """Its guides' deletions mark their own partitions"""
+    from .sitemaps import mark_dirty, partition_key
+    mark_dirty([partition_key('search')])
+
+
+
+# Keep the static export (see destinations/static_export.py) current. Paths
+# a change may remove are captured before it, while its routes still exist
+def _export_enabled():
+    from .static_export import export_enabled
+    return export_enabled()
+
+@receiver(post_save, sender=DestinationGuide)
+def export_saved_guide(sender, instance, created, **kwargs):
+    if _export_enabled():
+        from .static_export import schedule_guide_export
+        schedule_guide_export(instance.destination_id, instance.language_code, created)
+
+@receiver(pre_delete, sender=DestinationGuide)
+def remember_guide_export_paths(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import route_paths
+        instance._export_stale = route_paths(destination_guide=instance)
+
+@receiver(post_delete, sender=DestinationGuide)
+def export_deleted_guide(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import schedule_guide_export
+        # Leaving the catalogs and related blocks touches the same pages as entering them
+        schedule_guide_export(
+            instance.destination_id, instance.language_code, True, getattr(instance, '_export_stale', ())
+        )
+
+@receiver(pre_save, sender=Destination)
+def remember_destination_export_paths(sender, instance, **kwargs):
+    if instance.pk and _export_enabled():
+        from .static_export import route_paths
+        instance._export_stale = route_paths(destination_id=instance.pk)
+
+@receiver(post_save, sender=Destination)
+def export_saved_destination(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import schedule_destination_export
+        schedule_destination_export(instance.pk, getattr(instance, '_export_stale', ()))
+
+@receiver(pre_delete, sender=Destination)
+def remember_deleted_destination_export_paths(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import destination_paths
+        instance._export_stale = destination_paths(instance.pk)
+
+@receiver(post_delete, sender=Destination)
+def export_deleted_destination(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import schedule_destination_export
+        schedule_destination_export(instance.pk, getattr(instance, '_export_stale', ()))
+
+@receiver(pre_save, sender=CityGuide)
+@receiver(pre_delete, sender=CityGuide)
+def remember_city_guide_export_paths(sender, instance, **kwargs):
+    if instance.pk and _export_enabled():
+        from .static_export import route_paths
+        instance._export_stale = route_paths(city_guide=instance)
+
+@receiver(post_save, sender=CityGuide)
+@receiver(post_delete, sender=CityGuide)
+def export_city_guide(sender, instance, **kwargs):
+    if _export_enabled():
+        from .static_export import schedule_city_guide_export
+        schedule_city_guide_export(instance.pk, instance.language_code, getattr(instance, '_export_stale', ()))
+
+class WorkUnit(models.Model):
+    """
+    One unit of content generation work, leased to a worker at a time
+    (see destinations/work_queue.py).
+    """
+    KIND_GOLF_GUIDE = 'golf_guide'
+
+    STATUS_PENDING = 'pending'
+    STATUS_LEASED = 'leased'
+    STATUS_DONE = 'done'
+
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='work_units')
+    language_code = models.CharField(max_length=10)
+    kind = models.CharField(max_length=20, choices=[(KIND_GOLF_GUIDE, 'Golf Guide')], default=KIND_GOLF_GUIDE)
+    status = models.CharField(
+        max_length=10,
+        choices=[(STATUS_PENDING, 'Pending'), (STATUS_LEASED, 'Leased'), (STATUS_DONE, 'Done')],
+        default=STATUS_PENDING
+    )
+    priority = models.SmallIntegerField(default=0, help_text="Lower is handed out first")
+    lease_token = models.CharField(max_length=32, blank=True, default='')
+    leased_by = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('destination', 'language_code', 'kind')
+        indexes = [
+            models.Index(fields=['status', 'priority', 'id']),
+            models.Index(fields=['status', 'lease_expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.destination_id} {self.language_code} {self.kind} ({self.status})"
+
+
+class WorkCounter(models.Model):
+    """
+    A count behind the work_status endpoint, kept current by the receivers
+    below in the same transaction as the change (see destinations/work_queue.py).
+    """
+    name = models.CharField(max_length=50, unique=True, help_text="e.g. destinations, guides, guides:de")
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+@receiver(post_save, sender=Destination)
+def queue_destination_work(sender, instance, created, **kwargs):
+    if created:
+        from .work_queue import add_destination
+        add_destination(instance.pk)
+
+@receiver(post_save, sender=DestinationGuide)
+def complete_guide_work(sender, instance, created, **kwargs):
+    # Guides created outside the work API (imports, admin); the submit
+    # endpoint completes every unit it accepts work for itself
+    if created:
+        from .work_queue import complete
+        complete(instance.destination_id, instance.language_code)
+
+@receiver(post_delete, sender=DestinationGuide)
+def reopen_guide_work(sender, instance, **kwargs):
+    from .work_queue import reopen
+    reopen(instance.destination_id, instance.language_code)
+
+
+@receiver(post_save, sender=Destination)
+def count_destination(sender, instance, created, **kwargs):
+    if created:
+        from .work_queue import destination_added
+        destination_added()
+
+@receiver(post_delete, sender=Destination)
+def uncount_destination(sender, instance, **kwargs):
+    from .work_queue import destination_removed
+    destination_removed()
+
+@receiver(post_save, sender=DestinationGuide)
+def count_guide(sender, instance, created, **kwargs):
+    if created:
+        from .work_queue import guide_added
+        guide_added(instance)
+
+@receiver(pre_delete, sender=DestinationGuide)
+def remember_guide_siblings(sender, instance, **kwargs):
+    from .work_queue import guide_removing
+    guide_removing(instance)
+
+@receiver(post_delete, sender=DestinationGuide)
+def uncount_guide(sender, instance, **kwargs):
+    from .work_queue import guide_removed
+    guide_removed(instance)
@@ -0,0 +1,96 @@
+"""
+Full-page cache for the golf guide and city guide detail pages
+
+A detail page is rendered once per (path, language) and its HTML is stored
+under the cache tags the view declares on the response (see cache_tags.py):
+the page's destination and its country. The save/delete receivers in
+models.py invalidate those tags, so a page is re-rendered only when its own
+guides, its destination or its country's related listings change. The
+realtime "current conditions" widget is not part of the cached HTML; the
+pages fetch it from the realtime_widget endpoint after loading. Pages are
+stored minified and precompressed (see response_store.py).
+
+Only anonymous-looking GETs without a query string are served from or stored
+in the cache, and only 200 responses that set no cookies are stored.
+"""
+
+import functools
+import inspect
+
+from django.core.cache import cache
+from django.urls import URLResolver, get_resolver
+
+from . import cache_tags
+from .response_store import store_page, page_response, record_store
+
+# Also bounds how long the randomly sampled "popular destinations" block of
+# a cached page stays the same
+PAGE_TIMEOUT = 3600
+HEADER = 'X-Page-Cache'
+
+
+def _page_key(request, language):
+    return f'page:{request.scheme}://{request.get_host()}{request.path}:{language}'
+
+
+def _cacheable(request):
+    return request.method in ('GET', 'HEAD') and not request.GET
+
+
+def full_page_cache(view):
+    """
+    Cache a detail view's rendered page per (path, language). The view opts a
+    response in by setting response.cache_tags to the tags the page depends on.
+    """
+    signature = inspect.signature(view)
+    view_name = f'{view.__module__}.{view.__name__}'
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return view(request, *args, **kwargs)
+
+        bound = signature.bind(request, *args, **kwargs)
+        bound.apply_defaults()
+        key = _page_key(request, bound.arguments.get('language'))
+
+        # The tags live under a plain key so a lookup needs no rendering
+        tags = cache.get(f'{key}:tags')
+        if tags:
+            page = cache_tags.get_value(key, tags)
+            if page is not None:
+                response = page_response(request, page)
+                response[HEADER] = 'hit'
+                return response
+
+        response = view(request, *args, **kwargs)
+        tags = getattr(response, 'cache_tags', None)
+        if tags and response.status_code == 200 and not response.streaming and not response.cookies:
+            page = store_page(response.content, response['Content-Type'])
+            cache.set(f'{key}:tags', tags, PAGE_TIMEOUT)
+            cache_tags.set_value(key, page, tags, PAGE_TIMEOUT)
+            record_store(view_name, len(response.content), page)
+            # Served from the stored encodings too, so a miss looks like a hit
+            response = page_response(request, page)
+            response[HEADER] = 'miss'
+        return response
+
+    wrapper.page_cache_name = view_name
+    return wrapper
+
+
+def cached_views(patterns=None):
+    """Dotted names of the routed views that use full_page_cache (loads the URLconf)"""
+    names = []
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            found = cached_views(pattern.url_patterns)
+        else:
+            found = [getattr(pattern.callback, 'page_cache_name', None)]
+        names.extend(name for name in found if name and name not in names)
+    return names
+
+
+def destination_page_tags(destination):
+    """Tags of a detail page: its destination, plus its country for the related blocks"""
+    return [cache_tags.destination_tag(destination.pk), cache_tags.country_tag(destination.country)]
@@ -1,11 +1,21 @@
 """
 Real-time data service for golf destinations
-Integrates with external APIs to provide current weather, time, and exchange rate data
+Integrates with external APIs to provide current weather and exchange rate data;
+local time is computed offline from the destination's stored IANA zone
+
+Values are served stale-while-revalidate: a request always gets the last known
+value immediately (from the cache, or from the durable RealtimeSnapshot table
+after a restart) and expired entries are refreshed on a background thread
+pool, so upstream latency never lands on the page render.
 """
 
 import requests
 import json
-from datetime import datetime
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
 from urllib.parse import quote
 try:
     from django.core.cache import cache
@@ -13,45 +23,282 @@ try:
 except:
     DJANGO_CACHE_AVAILABLE = False
 import logging
+from .timezones import guess_timezone, local_time_data
 
 logger = logging.getLogger(__name__)
 
+# Background refresh state shared by every RealTimeDestinationData instance
+_refresh_pool = None
+_refresh_pool_lock = threading.Lock()
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+# key -> monotonic time before which a failed upstream is not retried
+_retry_after = {}
+# Seconds to wait before retrying a key whose upstream call failed
+FAILED_REFRESH_BACKOFF = 120
+# Seconds a cross-process refresh lock is held at most
+REFRESH_LOCK_TIMEOUT = 60
+
+# One shared USD rates table serves every country
+EXCHANGE_RATES_KEY = 'realtime_exchange_rates_usd'
+
+# Currency mapping for countries
+COUNTRY_CURRENCIES = {
+    'Japan': 'JPY',
+    'South Korea': 'KRW',
+    'Germany': 'EUR',
+    'Spain': 'EUR',
+    'France': 'EUR',
+    'Italy': 'EUR',
+    'United Kingdom': 'GBP',
+    'Australia': 'AUD',
+    'New Zealand': 'NZD',
+    'Thailand': 'THB',
+    'Singapore': 'SGD',
+    'Malaysia': 'MYR',
+    'Indonesia': 'IDR',
+    'Philippines': 'PHP',
+    'China': 'CNY',
+    'India': 'INR',
+    'UAE': 'AED',
+    'South Africa': 'ZAR',
+    'Mexico': 'MXN',
+    'Canada': 'CAD',
+    'Brazil': 'BRL',
+    'Argentina': 'ARS',
+    'Chile': 'CLP'
+}
+
+# Upstream request counters (this process); shared totals live in the cache
+UPSTREAM_CALL_COUNTS = Counter()
+UPSTREAM_CALL_KINDS = ('weather', 'exchange')
+
+
+def _count_upstream_call(kind):
+    with _in_flight_lock:
+        UPSTREAM_CALL_COUNTS[kind] += 1
+    if DJANGO_CACHE_AVAILABLE:
+        key = f'realtime_upstream_calls_{kind}'
+        try:
+            cache.add(key, 0, None)
+            cache.incr(key)
+        except Exception:
+            pass
+
+
+def get_upstream_call_counts():
+    """Upstream HTTP calls made so far, per API (shared across processes when the cache is)"""
+    if DJANGO_CACHE_AVAILABLE:
+        try:
+            shared = cache.get_many([f'realtime_upstream_calls_{kind}' for kind in UPSTREAM_CALL_KINDS])
+            return {kind: shared.get(f'realtime_upstream_calls_{kind}', 0) for kind in UPSTREAM_CALL_KINDS}
+        except Exception:
+            pass
+    return {kind: UPSTREAM_CALL_COUNTS[kind] for kind in UPSTREAM_CALL_KINDS}
+
+
+def reset_upstream_call_counts():
+    """Zero the upstream call counters, to measure a run from a clean start"""
+    with _in_flight_lock:
+        UPSTREAM_CALL_COUNTS.clear()
+    if DJANGO_CACHE_AVAILABLE:
+        try:
+            cache.delete_many([f'realtime_upstream_calls_{kind}' for kind in UPSTREAM_CALL_KINDS])
+        except Exception:
+            pass
+
+
+def _setting(name, default):
+    try:
+        from django.conf import settings
+        return getattr(settings, name, default)
+    except Exception:
+        return default
+
+
+def _get_refresh_pool():
+    global _refresh_pool
+    with _refresh_pool_lock:
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(
+                max_workers=_setting('REALTIME_REFRESH_WORKERS', 4),
+                thread_name_prefix='realtime-refresh'
+            )
+        return _refresh_pool
+
 class RealTimeDestinationData:
     """Service to fetch real-time data for golf destinations"""
     
     def __init__(self):
         # Free API services (no keys required for basic usage)
-        self.weather_api = "http://wttr.in"
-        self.timezone_api = "http://worldtimeapi.org/api"
-        self.exchange_api = "https://api.exchangerate-api.com/v4/latest"
+        # Base URLs can be overridden in settings (e.g. to point at a local stand-in server)
+        api_urls = _setting('REALTIME_API_URLS', {})
+        self.weather_api = api_urls.get('weather', "http://wttr.in")
+        self.exchange_api = api_urls.get('exchange', "https://api.exchangerate-api.com/v4/latest")
         self.country_api = "https://restcountries.com/v3.1"
         
-        # Cache timeout in seconds (15 minutes for weather, 1 hour for exchange rates)
+        # Freshness in seconds (15 minutes for weather, 1 hour for exchange rates)
         self.weather_cache_timeout = 900  # 15 minutes
         self.exchange_cache_timeout = 3600  # 1 hour
-        self.timezone_cache_timeout = 86400  # 24 hours
+        # How long stale values stay servable in the cache (durable copy is kept forever)
+        self.stale_cache_timeout = 7 * 86400
+        # Run refreshes inline instead of on the pool (tests, scripts)
+        self.refresh_sync = _setting('REALTIME_REFRESH_SYNC', not DJANGO_CACHE_AVAILABLE)
     
     def get_cache_key(self, data_type, location):
         """Generate cache key for data storage"""
         return f"realtime_{data_type}_{location.lower().replace(' ', '_').replace(',', '')}"
     
-    def get_weather_data(self, city, country):
-        """Get current weather data with caching"""
-        cache_key = self.get_cache_key('weather', f"{city}_{country}")
-        
-        # Try to get cached data if Django cache is available
-        cached_data = None
+    # ------------------------------------------------------------------
+    # Stale-while-revalidate storage
+    # ------------------------------------------------------------------
+    
+    def _read_entry(self, cache_key):
+        """Last known {'data', 'fetched_at'} entry from the cache, then the durable store"""
+        entry = None
         if DJANGO_CACHE_AVAILABLE:
             try:
-                cached_data = cache.get(cache_key)
+                entry = cache.get(cache_key)
             except:
-                cached_data = None
-        
-        if cached_data:
-            return cached_data
+                entry = None
+        if isinstance(entry, dict) and 'fetched_at' in entry:
+            return entry
         
+        try:
+            from .models import RealtimeSnapshot
+            snapshot = RealtimeSnapshot.objects.filter(key=cache_key).values_list('payload', 'fetched_at').first()
+        except Exception as e:
+            logger.debug(f"Realtime snapshot unavailable for {cache_key}: {e}")
+            snapshot = None
+        if snapshot:
+            entry = {'data': snapshot[0], 'fetched_at': snapshot[1].timestamp()}
+            self._write_cache(cache_key, entry)
+        return entry
+    
+    def _write_cache(self, cache_key, entry):
+        if DJANGO_CACHE_AVAILABLE:
+            try:
+                cache.set(cache_key, entry, self.stale_cache_timeout)
+            except:
+                pass  # Continue without caching
+    
+    def _store_entry(self, cache_key, data):
+        """Persist a freshly fetched value to the cache and the durable store"""
+        fetched_at = time.time()
+        self._write_cache(cache_key, {'data': data, 'fetched_at': fetched_at})
+        try:
+            from .models import RealtimeSnapshot
+            RealtimeSnapshot.objects.update_or_create(
+                key=cache_key,
+                defaults={
+                    'payload': data,
+                    'fetched_at': datetime.fromtimestamp(fetched_at, tz=dt_timezone.utc),
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Could not persist realtime snapshot {cache_key}: {e}")
+    
+    def _refresh(self, cache_key, fetch, args):
+        """Fetch from upstream and store; runs on the refresh pool"""
+        try:
+            data = fetch(*args)
+            if data is not None:
+                self._store_entry(cache_key, data)
+                _retry_after.pop(cache_key, None)
+            else:
+                _retry_after[cache_key] = time.monotonic() + FAILED_REFRESH_BACKOFF
+        except Exception as e:
+            _retry_after[cache_key] = time.monotonic() + FAILED_REFRESH_BACKOFF
+            logger.warning(f"Realtime refresh failed for {cache_key}: {e}")
+        finally:
+            self._release_refresh_lock(cache_key)
+            with _in_flight_lock:
+                _in_flight.discard(cache_key)
+            if not self.refresh_sync:
+                try:
+                    from django.db import connection
+                    connection.close()
+                except Exception:
+                    pass
+    
+    def _acquire_refresh_lock(self, cache_key):
+        if not DJANGO_CACHE_AVAILABLE:
+            return True
+        try:
+            return cache.add(f'{cache_key}_refresh_lock', 1, REFRESH_LOCK_TIMEOUT)
+        except Exception:
+            return True
+    
+    def _release_refresh_lock(self, cache_key):
+        if DJANGO_CACHE_AVAILABLE:
+            try:
+                cache.delete(f'{cache_key}_refresh_lock')
+            except Exception:
+                pass
+    
+    def _schedule_refresh(self, cache_key, fetch, args):
+        """Queue a refresh unless one is already running or the upstream recently failed"""
+        if _retry_after.get(cache_key, 0) > time.monotonic():
+            return
+        with _in_flight_lock:
+            if cache_key in _in_flight:
+                return
+            _in_flight.add(cache_key)
+        # Single flight across processes sharing the cache
+        if not self._acquire_refresh_lock(cache_key):
+            with _in_flight_lock:
+                _in_flight.discard(cache_key)
+            return
+        if self.refresh_sync:
+            self._refresh(cache_key, fetch, args)
+        else:
+            _get_refresh_pool().submit(self._refresh, cache_key, fetch, args)
+    
+    def _get_stale_while_revalidate(self, cache_key, max_age, fetch, *args):
+        """
+        Return the last known value for cache_key immediately (None if there has
+        never been one) and schedule a background refresh if it is older than max_age.
+        """
+        entry = self._read_entry(cache_key)
+        if entry is None or time.time() - entry['fetched_at'] >= max_age:
+            self._schedule_refresh(cache_key, fetch, args)
+            # A synchronous refresh may have produced a value
+            if entry is None and self.refresh_sync:
+                entry = self._read_entry(cache_key)
+        return entry['data'] if entry else None
+    
+    def refresh_if_stale(self, cache_key, max_age, fetch, *args):
+        """Synchronously refresh one key if expired (used by the warm-up command)"""
+        entry = self._read_entry(cache_key)
+        if entry is not None and time.time() - entry['fetched_at'] < max_age:
+            return False
+        with _in_flight_lock:
+            if cache_key in _in_flight:
+                return False
+            _in_flight.add(cache_key)
+        if not self._acquire_refresh_lock(cache_key):
+            with _in_flight_lock:
+                _in_flight.discard(cache_key)
+            return False
+        self._refresh(cache_key, fetch, args)
+        return True
+    
+    # ------------------------------------------------------------------
+    # Public getters
+    # ------------------------------------------------------------------
+    
+    def get_weather_data(self, city, country):
+        """Get current weather data (stale-while-revalidate)"""
+        cache_key = self.get_cache_key('weather', f"{city}_{country}")
+        return self._get_stale_while_revalidate(
+            cache_key, self.weather_cache_timeout, self._fetch_weather_data, city, country
+        )
+    
+    def _fetch_weather_data(self, city, country):
+        """Fetch current weather from the upstream API"""
         try:
             location = f"{city},{country}"
+            _count_upstream_call('weather')
             response = requests.get(
                 f"{self.weather_api}/{quote(location)}?format=j1",
                 timeout=10
@@ -75,13 +322,6 @@ class RealTimeDestinationData:
                     'icon': self._get_weather_icon(current.get('weatherDesc', [{}])[0].get('value', '')),
                     'updated_at': datetime.now().isoformat()
                 }
-                
-                # Cache the data if Django cache is available
-                if DJANGO_CACHE_AVAILABLE:
-                    try:
-                        cache.set(cache_key, weather_data, self.weather_cache_timeout)
-                    except:
-                        pass  # Continue without caching
                 return weather_data
                 
         except Exception as e:
@@ -89,169 +329,76 @@ class RealTimeDestinationData:
         
         return None
     
-    def get_timezone_data(self, country):
-        """Get current local time data with caching"""
-        cache_key = self.get_cache_key('timezone', country)
-        
-        # Try to get cached data if Django cache is available
-        cached_data = None
-        if DJANGO_CACHE_AVAILABLE:
-            try:
-                cached_data = cache.get(cache_key)
-            except:
-                cached_data = None
-        
-        if cached_data:
-            return cached_data
-        
-        try:
-            # Country to timezone mapping
-            country_zones = {
-                'Japan': 'Asia/Tokyo',
-                'South Korea': 'Asia/Seoul',
-                'Germany': 'Europe/Berlin',
-                'Spain': 'Europe/Madrid',
-                'France': 'Europe/Paris',
-                'Italy': 'Europe/Rome',
-                'United Kingdom': 'Europe/London',
-                'Australia': 'Australia/Sydney',
-                'New Zealand': 'Pacific/Auckland',
-                'Thailand': 'Asia/Bangkok',
-                'Singapore': 'Asia/Singapore',
-                'Malaysia': 'Asia/Kuala_Lumpur',
-                'Indonesia': 'Asia/Jakarta',
-                'Philippines': 'Asia/Manila',
-                'China': 'Asia/Shanghai',
-                'India': 'Asia/Kolkata',
-                'UAE': 'Asia/Dubai',
-                'South Africa': 'Africa/Johannesburg',
-                'Mexico': 'America/Mexico_City',
-                'Canada': 'America/Toronto',
-                'Brazil': 'America/Sao_Paulo',
-                'Argentina': 'America/Buenos_Aires',
-                'Chile': 'America/Santiago'
-            }
-            
-            timezone = country_zones.get(country, 'UTC')
-            response = requests.get(
-                f"{self.timezone_api}/timezone/{timezone}",
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Parse datetime
-                dt_str = data.get('datetime', '')
-                if 'T' in dt_str:
-                    date_part, time_part = dt_str.split('T')
-                    local_time = time_part[:8] if len(time_part) >= 8 else time_part
-                    local_date = date_part
-                else:
-                    local_time = 'N/A'
-                    local_date = 'N/A'
-                
-                timezone_data = {
-                    'timezone': data.get('timezone', timezone),
-                    'local_time': local_time,
-                    'local_date': local_date,
-                    'utc_offset': data.get('utc_offset', 'N/A'),
-                    'day_of_week': data.get('day_of_week', 'N/A'),
-                    'updated_at': datetime.now().isoformat()
-                }
-                
-                # Cache the data if Django cache is available
-                if DJANGO_CACHE_AVAILABLE:
-                    try:
-                        cache.set(cache_key, timezone_data, self.timezone_cache_timeout)
-                    except:
-                        pass  # Continue without caching
-                return timezone_data
-                
-        except Exception as e:
-            logger.warning(f"Timezone API error for {country}: {e}")
-        
-        return None
+    def get_timezone_data(self, country, timezone_name=None):
+        """
+        Get current local time data, computed in-process with zoneinfo.
+        timezone_name is the destination's stored IANA zone; without it the
+        country's default zone is used.
+        """
+        if not timezone_name:
+            timezone_name = guess_timezone(country)
+        return local_time_data(timezone_name)
     
     def get_exchange_data(self, country):
-        """Get exchange rate data with caching"""
-        cache_key = self.get_cache_key('exchange', country)
-        
-        # Try to get cached data if Django cache is available
-        cached_data = None
-        if DJANGO_CACHE_AVAILABLE:
-            try:
-                cached_data = cache.get(cache_key)
-            except:
-                cached_data = None
-        
-        if cached_data:
-            return cached_data
-        
+        """
+        Get exchange rate data for a country.
+        Derived in memory from the single shared USD rates snapshot, which is
+        fetched once per TTL for every country (stale-while-revalidate).
+        """
+        snapshot = self._get_stale_while_revalidate(
+            EXCHANGE_RATES_KEY, self.exchange_cache_timeout, self._fetch_exchange_rates
+        )
+        if not snapshot:
+            return None
+        return self._derive_exchange_data(country, snapshot)
+    
+    def _derive_exchange_data(self, country, snapshot):
+        """Per-country exchange figures from a {'rates', 'date', 'fetched'} snapshot"""
+        rates = snapshot.get('rates', {})
+        currency = COUNTRY_CURRENCIES.get(country, 'USD')
+        return {
+            'currency': currency,
+            'currency_symbol': self._get_currency_symbol(currency),
+            'usd_to_local': rates.get(currency, 1),
+            'eur_to_local': rates.get(currency, 1) / rates.get('EUR', 1) if rates.get('EUR') else None,
+            'gbp_to_local': rates.get(currency, 1) / rates.get('GBP', 1) if rates.get('GBP') else None,
+            'last_updated': snapshot.get('date', 'N/A'),
+            'updated_at': snapshot.get('fetched', datetime.now().isoformat())
+        }
+    
+    def _fetch_exchange_rates(self):
+        """Fetch the full USD-based rates table from the upstream API"""
         try:
-            # Currency mapping for countries
-            currency_map = {
-                'Japan': 'JPY',
-                'South Korea': 'KRW',
-                'Germany': 'EUR',
-                'Spain': 'EUR',
-                'France': 'EUR',
-                'Italy': 'EUR',
-                'United Kingdom': 'GBP',
-                'Australia': 'AUD',
-                'New Zealand': 'NZD',
-                'Thailand': 'THB',
-                'Singapore': 'SGD',
-                'Malaysia': 'MYR',
-                'Indonesia': 'IDR',
-                'Philippines': 'PHP',
-                'China': 'CNY',
-                'India': 'INR',
-                'UAE': 'AED',
-                'South Africa': 'ZAR',
-                'Mexico': 'MXN',
-                'Canada': 'CAD',
-                'Brazil': 'BRL',
-                'Argentina': 'ARS',
-                'Chile': 'CLP'
-            }
-            
-            currency = currency_map.get(country, 'USD')
-            
-            # Get rates from USD base
+            _count_upstream_call('exchange')
             response = requests.get(f"{self.exchange_api}/USD", timeout=10)
             if response.status_code == 200:
                 data = response.json()
-                rates = data.get('rates', {})
-                
-                exchange_data = {
-                    'currency': currency,
-                    'currency_symbol': self._get_currency_symbol(currency),
-                    'usd_to_local': rates.get(currency, 1),
-                    'eur_to_local': rates.get(currency, 1) / rates.get('EUR', 1) if rates.get('EUR') else None,
-                    'gbp_to_local': rates.get(currency, 1) / rates.get('GBP', 1) if rates.get('GBP') else None,
-                    'last_updated': data.get('date', 'N/A'),
-                    'updated_at': datetime.now().isoformat()
+                return {
+                    'rates': data.get('rates', {}),
+                    'date': data.get('date', 'N/A'),
+                    'fetched': datetime.now().isoformat()
                 }
                 
-                # Cache the data if Django cache is available
-                if DJANGO_CACHE_AVAILABLE:
-                    try:
-                        cache.set(cache_key, exchange_data, self.exchange_cache_timeout)
-                    except:
-                        pass  # Continue without caching
-                return exchange_data
-                
         except Exception as e:
-            logger.warning(f"Exchange rate API error for {country}: {e}")
+            logger.warning(f"Exchange rate API error: {e}")
         
         return None
     
-    def get_all_destination_data(self, city, country):
+    def refresh_destination_data(self, city, country):
+        """Synchronously refresh whichever of a destination's entries have expired"""
+        refreshed = [
+            self.refresh_if_stale(self.get_cache_key('weather', f"{city}_{country}"),
+                                  self.weather_cache_timeout, self._fetch_weather_data, city, country),
+            self.refresh_if_stale(EXCHANGE_RATES_KEY,
+                                  self.exchange_cache_timeout, self._fetch_exchange_rates),
+        ]
+        return sum(refreshed)
+    
+    def get_all_destination_data(self, city, country, timezone_name=None):
         """Get all real-time data for a destination"""
         return {
             'weather': self.get_weather_data(city, country),
-            'timezone': self.get_timezone_data(country),
+            'timezone': self.get_timezone_data(country, timezone_name),
             'exchange': self.get_exchange_data(country),
             'generated_at': datetime.now().isoformat()
         }
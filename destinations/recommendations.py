@@ -0,0 +1,209 @@
+"""
+Precomputed related-destinations index for golf guide pages
+
+"Nearby" (same region) and "same country" recommendations are stored per
+(destination, language) in RelatedDestinations, and a country-diverse sample
+of each language's catalog is stored in PopularDestinationPool. Both are
+refreshed from save/delete signals, so destination_detail reads a couple of
+small rows instead of scanning every destination in the language.
+"""
+
+import random
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Destination, DestinationGuide, RelatedDestinations, PopularDestinationPool
+
+NEARBY_LIMIT = 3
+SAME_COUNTRY_LIMIT = 3
+POPULAR_LIMIT = 6
+# Size of the pre-sampled pool the popular block is drawn from
+POPULAR_POOL_SIZE = 48
+
+
+def _related_lists(dest_id, region, by_region, country_ids):
+    """Nearby and same-country id lists for one destination (lists are name-ordered)"""
+    nearby = [i for i in by_region[region][:NEARBY_LIMIT + 1] if i != dest_id][:NEARBY_LIMIT]
+    excluded = set(nearby) | {dest_id}
+    same_country = [
+        i for i in country_ids[:NEARBY_LIMIT + SAME_COUNTRY_LIMIT + 1] if i not in excluded
+    ][:SAME_COUNTRY_LIMIT]
+    return nearby, same_country
+
+
+def _country_rows(country, language):
+    return list(
+        Destination.objects.filter(country=country, guides__language_code=language)
+        .order_by('name')
+        .values_list('id', 'region_or_state')
+    )
+
+
+def refresh_country(country, language):
+    """Recompute the related sets of every destination in one country/language"""
+    rows = _country_rows(country, language)
+    country_ids = [dest_id for dest_id, _ in rows]
+    by_region = defaultdict(list)
+    for dest_id, region in rows:
+        by_region[region].append(dest_id)
+
+    related = []
+    for dest_id, region in rows:
+        nearby, same_country = _related_lists(dest_id, region, by_region, country_ids)
+        related.append(RelatedDestinations(
+            destination_id=dest_id,
+            language_code=language,
+            nearby_ids=nearby,
+            same_country_ids=same_country,
+        ))
+
+    with transaction.atomic():
+        RelatedDestinations.objects.filter(
+            destination__country=country, language_code=language
+        ).exclude(destination_id__in=country_ids).delete()
+        RelatedDestinations.objects.bulk_create(
+            related,
+            update_conflicts=True,
+            unique_fields=['destination', 'language_code'],
+            update_fields=['nearby_ids', 'same_country_ids', 'updated_at'],
+        )
+
+
+def refresh_for_destination(destination, previous_country=None):
+    """Refresh after a destination is saved; covers a move between countries"""
+    languages = list(destination.guides.values_list('language_code', flat=True))
+    moved = previous_country and previous_country != destination.country
+    for language in languages:
+        refresh_country(destination.country, language)
+        if moved:
+            refresh_country(previous_country, language)
+            remove_from_popular_pool(destination.id, language)
+
+
+def _sample_pool(rows):
+    """Round-robin over shuffled countries so the pool stays country-diverse"""
+    by_country = defaultdict(list)
+    for dest_id, country in rows:
+        by_country[country].append(dest_id)
+    for ids in by_country.values():
+        random.shuffle(ids)
+    countries = list(by_country)
+    random.shuffle(countries)
+
+    pool = []
+    while countries and len(pool) < POPULAR_POOL_SIZE:
+        for country in list(countries):
+            if not by_country[country]:
+                countries.remove(country)
+                continue
+            pool.append([by_country[country].pop(), country])
+            if len(pool) >= POPULAR_POOL_SIZE:
+                break
+    return pool
+
+
+def refresh_popular_pool(language=None):
+    """Resample the popular pool for one language (or all); rotates its contents"""
+    if language:
+        languages = [language]
+    else:
+        languages = set(DestinationGuide.objects.order_by().values_list('language_code', flat=True).distinct())
+        languages |= set(PopularDestinationPool.objects.values_list('language_code', flat=True))
+    for lang in languages:
+        rows = Destination.objects.filter(guides__language_code=lang).values_list('id', 'country')
+        PopularDestinationPool.objects.update_or_create(
+            language_code=lang,
+            defaults={'entries': _sample_pool(rows)}
+        )
+
+
+def add_to_popular_pool(destination_id, country, language):
+    """
+    Incrementally admit a newly published destination: fill an underfull pool,
+    or swap out an entry from the most common country if this country is new.
+    """
+    pool, _ = PopularDestinationPool.objects.get_or_create(language_code=language)
+    entries = pool.entries
+    if any(dest_id == destination_id for dest_id, _ in entries):
+        return
+    counts = Counter(entry_country for _, entry_country in entries)
+    if len(entries) < POPULAR_POOL_SIZE:
+        entries.append([destination_id, country])
+    elif country not in counts:
+        crowded = counts.most_common(1)[0][0]
+        candidates = [i for i, (_, entry_country) in enumerate(entries) if entry_country == crowded]
+        entries[random.choice(candidates)] = [destination_id, country]
+    else:
+        return
+    pool.save(update_fields=['entries', 'updated_at'])
+
+
+def remove_from_popular_pool(destination_id, language):
+    """Resample the pool if it referenced a destination that left it"""
+    pool = PopularDestinationPool.objects.filter(language_code=language).first()
+    if pool and any(dest_id == destination_id for dest_id, _ in pool.entries):
+        refresh_popular_pool(language)
+
+
+def rebuild_all():
+    """Rebuild the whole index; returns the number of related sets written"""
+    pairs = (
+        Destination.objects.filter(guides__isnull=False)
+        .order_by()
+        .values_list('country', 'guides__language_code')
+        .distinct()
+    )
+    with transaction.atomic():
+        RelatedDestinations.objects.all().delete()
+        for country, language in pairs:
+            refresh_country(country, language)
+        refresh_popular_pool()
+    return RelatedDestinations.objects.count()
+
+
+def _pick_popular(entries, exclude_id):
+    """Random, country-diverse pick of POPULAR_LIMIT ids from a pool"""
+    by_country = defaultdict(list)
+    for dest_id, country in entries:
+        if dest_id != exclude_id:
+            by_country[country].append(dest_id)
+    countries = list(by_country)
+    random.shuffle(countries)
+
+    picked = [random.choice(by_country[country]) for country in countries[:POPULAR_LIMIT]]
+    remaining = [dest_id for dest_id, _ in entries if dest_id != exclude_id and dest_id not in picked]
+    random.shuffle(remaining)
+    picked.extend(remaining[:POPULAR_LIMIT - len(picked)])
+    return picked
+
+
+def get_related_destinations(destination, language):
+    """
+    Return {'nearby': [...], 'same_country': [...], 'popular': [...]} lists of
+    Destination objects for a detail page, using the precomputed index.
+    """
+    related = RelatedDestinations.objects.filter(
+        destination=destination, language_code=language
+    ).values_list('nearby_ids', 'same_country_ids').first()
+    if related:
+        nearby_ids, same_country_ids = related
+    else:
+        # Page served through the English fallback: not indexed, compute from one country
+        rows = _country_rows(destination.country, language)
+        by_region = defaultdict(list)
+        for dest_id, region in rows:
+            by_region[region].append(dest_id)
+        nearby_ids, same_country_ids = _related_lists(
+            destination.id, destination.region_or_state, by_region, [dest_id for dest_id, _ in rows]
+        )
+
+    pool = PopularDestinationPool.objects.filter(language_code=language).values_list('entries', flat=True).first()
+    popular_ids = _pick_popular(pool or [], destination.id)
+
+    found = Destination.objects.in_bulk(set(nearby_ids) | set(same_country_ids) | set(popular_ids))
+    return {
+        'nearby': [found[i] for i in nearby_ids if i in found],
+        'same_country': [found[i] for i in same_country_ids if i in found],
+        'popular': [found[i] for i in popular_ids if i in found],
+    }
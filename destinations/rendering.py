@@ -0,0 +1,167 @@
+"""
+Render-at-write pipeline for golf guide articles
+
+Guide content is converted from Markdown to HTML once, when a
+DestinationGuide is saved, and stored on the row together with a truncation
+flag and a content hash. Detail views only read the stored HTML.
+
+Markdown passes raw HTML through, and guide content comes from the
+generation workers, so the rendered HTML is cleaned with nh3 against an
+allow-list of the tags and attributes Markdown itself produces before it is
+stored.
+
+Bump RENDERER_VERSION whenever the formatter changes, then run
+`python manage.py rerender_guides` to refresh stored HTML in parallel.
+"""
+
+import hashlib
+import re
+
+import markdown as md
+import nh3
+
+# Increment when improve_content_formatting/render_article output changes
+RENDERER_VERSION = 2
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'strong', 'em', 'b', 'i', 'code', 'pre', 'blockquote',
+    'ul', 'ol', 'li', 'a', 'img',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'th': {'style'},
+    'td': {'style'},
+}
+
+TRUNCATION_NOTICE_HTML = '<div class="alert alert-warning mt-4" role="alert"><strong>Note:</strong> This guide appears to be incomplete. Please check back later for the full content.</div>'
+
+# Helper to improve content formatting while preserving structure
+def improve_content_formatting(text):
+    """
+    Improve content formatting while preserving the existing structure.
+    Handles bold headers, bullet points, and markdown tables properly.
+    """
+    if not text:
+        return ""
+    
+    # Remove template instructions and clean up markers
+    text = re.sub(r'---.*\(Continue with.*\).*---', '', text, flags=re.DOTALL)
+    text = re.sub(r'\n*---.*---\n*', '\n\n', text)
+    text = re.sub(r'\*\*\s*$', '', text)
+    text = re.sub(r'\n\s*\*\*\s*\n', '\n\n', text)
+    
+    # Fix markdown table formatting
+    lines = text.split('\n')
+    result = []
+    table_started = False
+    needs_header = False
+    
+    for i, line in enumerate(lines):
+        line = line.strip()
+        
+        # Skip empty lines and lines with just pipes
+        if not line or line.strip('| ') == '':
+            if not table_started:
+                result.append('')
+            continue
+        
+        # Check for table content
+        if '|' in line:
+            cells = [cell.strip() for cell in line.split('|')]
+            if len(cells) < 3:  # Need at least one real column
+                continue
+                
+            # Clean and standardize the row
+            cleaned_row = '|' + '|'.join(f' {cell.strip()} ' for cell in cells[1:-1]) + '|'
+            
+            # Handle start of table
+            if not table_started:
+                table_started = True
+                if 'Month' in line or 'Month'.upper() in line or any(c.isupper() for c in line):
+                    # This is a header row
+                    result.append(cleaned_row)
+                    # Add separator row
+                    cols = len(cells) - 2  # subtract first/last empty cells
+                    result.append('|' + '|'.join([' --- ' for _ in range(cols)]) + '|')
+                else:
+                    # Missing header - add it based on context
+                    if "Month" in text[:1000]:  # Check if this is a monthly table
+                        result.append('| Month | Avg. High (°C) | Avg. Low (°C) | Rainfall (mm) | Playing Conditions |')
+                        result.append('| --- | --- | --- | --- | --- |')
+                    needs_header = True
+                continue
+            
+            # Skip separator rows if we already added one
+            if '---' in line:
+                continue
+                
+            # Add content row
+            result.append(cleaned_row)
+            continue
+        
+        # Not a table row
+        if table_started:
+            table_started = False
+            result.append('')  # Add space after table
+        
+        # Handle regular content
+        if line.startswith('#'):
+            result.append(line)
+        elif re.match(r'^\*\*(\d+\.\s*.+?)\*\*$', line):
+            header_text = re.match(r'^\*\*(\d+\.\s*.+?)\*\*$', line).group(1).strip()
+            result.append(f"### {header_text}")
+        elif line not in ['**', '***', '____', '---']:
+            result.append(line)
+    
+    # Join and clean up
+    content = '\n'.join(result)
+    content = re.sub(r'\n{3,}', '\n\n', content)  # Remove excessive blank lines
+    
+    # If content appears truncated, append a note
+    if re.search(r'\*\*\s*$', content):
+        content += "\n\n---\n\n**Note:** This guide appears to be incomplete. Please check back later for the full content."
+    
+    return content
+
+
+def content_hash(text):
+    """SHA-256 hex digest of guide content, used to detect changes"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def is_truncated(text):
+    """Heuristic used by the detail page to flag incomplete guides"""
+    text = text or ''
+    return len(text) < 1000 or text.strip().endswith('**')
+
+
+def sanitize_html(html):
+    """Strip everything outside the allow-list (scripts, handlers, javascript: URLs)"""
+    return nh3.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        # Table column alignment is the only inline style Markdown emits
+        filter_style_properties={'text-align'},
+        url_schemes={'http', 'https', 'mailto'},
+    )
+
+
+def render_article(text):
+    """
+    Render guide Markdown to the HTML shown on the detail page.
+    Returns (html, truncated). Pure function so it can run in worker processes.
+    """
+    content = improve_content_formatting(text)
+    article_html = sanitize_html(md.markdown(content, extensions=["tables", "fenced_code", "nl2br"]))
+    # Add target="_blank" to all links
+    article_html = re.sub(r'<a (?![^>]*target=)', '<a target="_blank" ', article_html)
+
+    truncated = is_truncated(text)
+    # Add a warning if content seems truncated
+    if truncated:
+        article_html += TRUNCATION_NOTICE_HTML
+    return article_html, truncated
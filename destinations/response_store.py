@@ -0,0 +1,136 @@
+"""
+Minified, precompressed encodings of cached HTML pages
+
+When the full-page cache stores a page it stores a StoredPage: the HTML
+minified once, plus its gzip and (when the brotli package is installed)
+brotli encodings. Requests are answered with whichever encoding their
+Accept-Encoding allows, byte for byte from the cache, so compression CPU is
+spent once per content change instead of once per request.
+
+Minification is deliberately conservative: it strips indentation, blank
+lines and HTML comments, and CSS comments inside <style>, but keeps every
+line break and leaves <script>, <pre> and <textarea> elements untouched
+(whitespace is significant in all three).
+
+Raw, minified and encoded sizes are added to per-view counters in the cache
+each time a page is stored; response_store_stats reports them.
+"""
+
+import gzip
+import re
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ('br', 'gzip')
+STATS_FIELDS = ('pages', 'raw', 'minified', 'gzip', 'br')
+_STATS_PREFIX = 'response_store'
+
+_PRESERVED = re.compile(r'(<(script|pre|textarea)\b.*?</\2>)', re.IGNORECASE | re.DOTALL)
+_STYLE = re.compile(r'(<style\b[^>]*>)(.*?)(</style>)', re.IGNORECASE | re.DOTALL)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_INDENT = re.compile(r'\n[ \t]+|[ \t]+\n')
+_BLANK_LINES = re.compile(r'\n{2,}')
+_ACCEPT_PART = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+# body: {'identity': bytes, 'gzip': bytes, 'br': bytes}
+StoredPage = namedtuple('StoredPage', 'content_type body')
+
+
+def _minify_markup(html):
+    html = _HTML_COMMENT.sub('', html)
+    html = _STYLE.sub(lambda m: m.group(1) + _CSS_COMMENT.sub('', m.group(2)) + m.group(3), html)
+    html = _INDENT.sub('\n', html)
+    return _BLANK_LINES.sub('\n', html)
+
+
+def minify_html(html):
+    """Conservatively minified HTML (see module docstring)"""
+    parts = _PRESERVED.split(html)
+    # split() also returns the tag-name group; drop it
+    out = []
+    for i, part in enumerate(parts):
+        if i % 3 == 0:
+            out.append(_minify_markup(part))
+        elif i % 3 == 1:
+            out.append(part)
+    return ''.join(out).strip()
+
+
+def store_page(content, content_type):
+    """StoredPage for a rendered page; HTML is minified before encoding"""
+    if content_type.startswith('text/html'):
+        content = minify_html(content.decode()).encode()
+    body = {'identity': content, 'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        body['br'] = brotli.compress(content, quality=11)
+    return StoredPage(content_type, body)
+
+
+def accepted_encodings(request):
+    """Codings the client accepts (q > 0), from its Accept-Encoding header"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        match = _ACCEPT_PART.match(part)
+        if not match:
+            continue
+        coding, quality = match.group(1).lower(), match.group(2)
+        try:
+            if quality is not None and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+def page_response(request, page):
+    """Response with the best stored encoding the request accepts"""
+    accepted = accepted_encodings(request)
+    encoding = next((coding for coding in ENCODINGS if coding in accepted and coding in page.body), None)
+    response = HttpResponse(page.body[encoding or 'identity'], content_type=page.content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = len(response.content)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _stats_key(view_name, field):
+    return f'{_STATS_PREFIX}:{view_name}:{field}'
+
+
+def record_store(view_name, raw_size, page):
+    """Add one stored page's sizes to the view's counters"""
+    sizes = {
+        'pages': 1,
+        'raw': raw_size,
+        'minified': len(page.body['identity']),
+        'gzip': len(page.body['gzip']),
+        'br': len(page.body.get('br', b'')),
+    }
+    for field, amount in sizes.items():
+        key = _stats_key(view_name, field)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add() and incr(); the next store starts it again
+            pass
+
+
+def view_stats(view_name):
+    """{field: total} counters for one view"""
+    keys = {_stats_key(view_name, field): field for field in STATS_FIELDS}
+    found = cache.get_many(list(keys))
+    return {field: found.get(key, 0) for key, field in keys.items()}
@@ -0,0 +1,425 @@
+"""
+Sitemap engine: streamed, sharded, gzipped sitemaps behind one sitemap index
+
+URLs come from a handful of set-based queries read with iterator(): the
+home and listing pages, the canonical golf and city guide routes in the URL
+registry (with the guide's updated_at as lastmod) and the search pages for
+every distinct city, region and country. Search terms are merged from
+per-column SELECT DISTINCT streams that are already sorted, so duplicates
+are dropped without holding a set.
+
+URLs are grouped into partitions. Guide URLs are partitioned
+deterministically by language and destination id range (golf-en-0 holds the
+English golf guides of destinations 0-9999, city-de-2 the German city
+guides of 20000-29999), so a saved guide always lands in the same partition;
+the small page and search sections are one partition each. A partition is
+written as gzipped shards (sitemaps/<partition>-<n>.xml.gz) that roll over
+at the protocol limits of 50,000 URLs or 50MB uncompressed, and sitemap.xml
+becomes a sitemap index of the shards with the newest lastmod of each.
+Memory use is the same for a thousand URLs or millions; files are written
+under a temporary name and renamed into place.
+
+SitemapPartition rows record each partition's shards, so the index can be
+rewritten without reading them, and a dirty mark. Receivers in models.py
+mark the partitions a save or delete touches; a debounced background flush
+(or generate_sitemap --dirty from cron) rewrites only the dirty partitions
+and then the index. generate_sitemaps() rewrites everything.
+"""
+
+import gzip
+import heapq
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote_plus
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Concat, Trim
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Destination, DestinationGuide, CityGuide, PageRoute, SitemapPartition
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+SHARD_DIR = 'sitemaps'
+INDEX_NAME = 'sitemap.xml'
+QUERY_CHUNK_SIZE = 2000
+# Destinations per guide partition; one canonical URL each per language
+PARTITION_SPAN = 10000
+# Quiet period before dirty partitions are rewritten, so a burst of saves
+# costs one rewrite
+FLUSH_DELAY_SECONDS = 30
+
+SitemapUrl = namedtuple('SitemapUrl', 'path lastmod changefreq priority')
+
+_URLSET_HEAD = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'.encode()
+_URLSET_TAIL = b'</urlset>\n'
+
+
+def site_url():
+    return getattr(settings, 'SITE_URL', 'https://tcgplex.com').rstrip('/')
+
+
+def sitemap_root():
+    return Path(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR))
+
+
+def _lastmod(moment):
+    return moment.date().isoformat() if moment else None
+
+
+# URL sources, each a generator of SitemapUrl
+
+def page_urls():
+    """Home pages per guide language and the city guide listings"""
+    latest = dict(
+        DestinationGuide.objects.order_by().values_list('language_code').annotate(latest=Max('updated_at'))
+    )
+    yield SitemapUrl(reverse('destinations:home'), max(latest.values(), default=None), 'daily', '1.0')
+    for language in sorted(latest):
+        if language != 'en':
+            path = reverse('destinations:home_lang', kwargs={'language': language})
+            yield SitemapUrl(path, latest[language], 'daily', '0.9')
+
+    latest = dict(
+        CityGuide.objects.filter(is_published=True).order_by()
+        .values_list('language_code').annotate(latest=Max('updated_at'))
+    )
+    if latest:
+        yield SitemapUrl(reverse('destinations:city_guide_home'), latest.get('en'), 'weekly', '0.7')
+    for language in sorted(latest):
+        if language != 'en':
+            path = reverse('destinations:city_guide_home_lang', kwargs={'language': language})
+            yield SitemapUrl(path, latest[language], 'weekly', '0.7')
+
+
+def _route_urls(kind, lastmod_field, changefreq, priority, **filters):
+    routes = (
+        PageRoute.objects.filter(kind=kind, **filters)
+        .order_by('path')
+        .values_list('path', lastmod_field)
+    )
+    for path, updated_at in routes.iterator(chunk_size=QUERY_CHUNK_SIZE):
+        yield SitemapUrl(path, updated_at, changefreq, priority)
+
+
+def golf_guide_urls(language, bucket):
+    """Canonical golf guide URLs of one language and destination id range"""
+    return _route_urls(
+        PageRoute.KIND_GOLF_GUIDE, 'destination_guide__updated_at', 'weekly', '0.8',
+        is_canonical=True, language_code=language,
+        destination_id__gte=bucket * PARTITION_SPAN, destination_id__lt=(bucket + 1) * PARTITION_SPAN,
+    )
+
+
+def city_guide_urls(language, bucket):
+    """Published city guide URLs (unpublished guides have no route) of one partition"""
+    return _route_urls(
+        PageRoute.KIND_CITY_GUIDE, 'city_guide__updated_at', 'weekly', '0.7',
+        language_code=language,
+        destination_id__gte=bucket * PARTITION_SPAN, destination_id__lt=(bucket + 1) * PARTITION_SPAN,
+    )
+
+
+def _distinct_terms(expression, *required):
+    """Sorted distinct values of an expression over destinations whose required fields aren't blank"""
+    destinations = Destination.objects.annotate(**{f'{field}_trimmed': Trim(field) for field in required})
+    for field in required:
+        destinations = destinations.exclude(**{f'{field}_trimmed': ''})
+    terms = (
+        destinations.annotate(term=expression)
+        .order_by('term')
+        .values_list('term', flat=True)
+        .distinct()
+    )
+    return terms.iterator(chunk_size=QUERY_CHUNK_SIZE)
+
+
+def search_urls():
+    """Home page searches for each distinct city, region, country and their combinations"""
+    streams = [
+        _distinct_terms(Trim('city'), 'city'),
+        _distinct_terms(Trim('region_or_state'), 'region_or_state'),
+        _distinct_terms(Trim('country'), 'country'),
+        _distinct_terms(Concat(Trim('city'), Value(' '), Trim('region_or_state')), 'city', 'region_or_state'),
+        _distinct_terms(Concat(Trim('city'), Value(' '), Trim('country')), 'city', 'country'),
+    ]
+    home = reverse('destinations:home')
+    previous = None
+    for term in heapq.merge(*streams):
+        if term != previous:
+            yield SitemapUrl(f'{home}?q={quote_plus(term)}', None, 'weekly', '0.5')
+        previous = term
+
+
+# Sections written whole, as a single partition
+SECTIONS = {
+    'pages': page_urls,
+    'search': search_urls,
+}
+# Sections partitioned by language and destination id range
+PARTITIONED = {
+    'golf': (PageRoute.KIND_GOLF_GUIDE, golf_guide_urls),
+    'city': (PageRoute.KIND_CITY_GUIDE, city_guide_urls),
+}
+
+
+# Partitions
+
+def partition_key(section, language=None, destination_id=None):
+    """Name of the partition a URL belongs to, e.g. golf-en-0 or pages"""
+    if section in SECTIONS:
+        return section
+    return f'{section}-{language}-{destination_id // PARTITION_SPAN}'
+
+
+def partition_urls(key):
+    """URLs of one partition, in path order"""
+    if key in SECTIONS:
+        return SECTIONS[key]()
+    section, rest = key.split('-', 1)
+    language, bucket = rest.rsplit('-', 1)
+    return PARTITIONED[section][1](language, int(bucket))
+
+
+def all_partitions():
+    """Every partition that currently has URLs (plus the whole sections)"""
+    keys = list(SECTIONS)
+    for section, (kind, _) in PARTITIONED.items():
+        buckets = (
+            PageRoute.objects.filter(kind=kind).order_by()
+            .annotate(bucket=F('destination_id') / PARTITION_SPAN)
+            .values_list('language_code', 'bucket')
+            .distinct()
+        )
+        keys += sorted(f'{section}-{language}-{bucket}' for language, bucket in buckets)
+    return keys
+
+
+# Writing
+
+def _url_entry(base, url):
+    parts = [f'<url><loc>{escape(base + url.path)}</loc>']
+    if url.lastmod:
+        parts.append(f'<lastmod>{_lastmod(url.lastmod)}</lastmod>')
+    parts.append(f'<changefreq>{url.changefreq}</changefreq><priority>{url.priority}</priority></url>\n')
+    return ''.join(parts).encode()
+
+
+class _Shard:
+    """One gzipped urlset being written to a temporary file"""
+
+    def __init__(self, directory, name):
+        self.path = directory / name
+        fd, self.temp = tempfile.mkstemp(dir=directory, prefix='.sitemap-')
+        self.file = gzip.GzipFile(fileobj=os.fdopen(fd, 'wb'), mode='wb', compresslevel=6, mtime=0)
+        self.file.write(_URLSET_HEAD)
+        self.urls = 0
+        self.bytes = len(_URLSET_HEAD) + len(_URLSET_TAIL)
+        self.lastmod = None
+
+    def fits(self, entry):
+        return self.urls < MAX_URLS and self.bytes + len(entry) <= MAX_BYTES
+
+    def add(self, entry, lastmod):
+        self.file.write(entry)
+        self.urls += 1
+        self.bytes += len(entry)
+        if lastmod and (self.lastmod is None or lastmod > self.lastmod):
+            self.lastmod = lastmod
+
+    def close(self):
+        self.file.write(_URLSET_TAIL)
+        fileobj = self.file.fileobj
+        self.file.close()
+        fileobj.close()
+        os.chmod(self.temp, 0o644)
+        os.replace(self.temp, self.path)
+
+
+def write_section(directory, section, urls):
+    """Write one section's (or partition's) shards; returns [(shard name, urls, newest lastmod)]"""
+    base = site_url()
+    shards = []
+    shard = None
+    for url in urls:
+        entry = _url_entry(base, url)
+        if shard is None or not shard.fits(entry):
+            if shard:
+                shard.close()
+            shard = _Shard(directory, f'{section}-{len(shards) + 1}.xml.gz')
+            shards.append(shard)
+        shard.add(entry, url.lastmod)
+    if shard:
+        shard.close()
+    return [(shard.path.name, shard.urls, shard.lastmod) for shard in shards]
+
+
+def write_index(root, shards):
+    """Write the sitemap index listing every shard"""
+    base = site_url()
+    lines = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n']
+    for name, _, lastmod in shards:
+        lines.append(f'<sitemap><loc>{escape(f"{base}/{SHARD_DIR}/{name}")}</loc>')
+        if lastmod:
+            lines.append(f'<lastmod>{_lastmod(lastmod)}</lastmod>')
+        lines.append('</sitemap>\n')
+    lines.append('</sitemapindex>\n')
+    fd, temp = tempfile.mkstemp(dir=root, prefix='.sitemap-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(''.join(lines))
+    os.chmod(temp, 0o644)
+    os.replace(temp, root / INDEX_NAME)
+
+
+def _stored(shards):
+    return [[name, urls, lastmod.isoformat() if lastmod else None] for name, urls, lastmod in shards]
+
+
+def _loaded(stored):
+    return [(name, urls, datetime.fromisoformat(lastmod) if lastmod else None) for name, urls, lastmod in stored]
+
+
+def _write_partition(directory, key):
+    """Rewrite one partition's shards and remove any it no longer has"""
+    shards = write_section(directory, key, partition_urls(key))
+    current = {name for name, _, _ in shards}
+    for path in directory.glob(f'{key}-*.xml.gz'):
+        if path.name not in current:
+            path.unlink()
+    return shards
+
+
+def _indexed_shards():
+    shards = []
+    for stored in SitemapPartition.objects.order_by('key').values_list('shards', flat=True):
+        shards += _loaded(stored)
+    return shards
+
+
+def generate_sitemaps(root=None):
+    """Write every partition and the index; returns [(shard name, urls, lastmod)]"""
+    root = Path(root) if root else sitemap_root()
+    directory = root / SHARD_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+
+    started = timezone.now()
+    shards = []
+    partitions = []
+    for key in all_partitions():
+        written = write_section(directory, key, partition_urls(key))
+        shards += written
+        partitions.append(SitemapPartition(key=key, shards=_stored(written)))
+    write_index(root, shards)
+
+    with transaction.atomic():
+        SitemapPartition.objects.exclude(key__in=[p.key for p in partitions]).delete()
+        SitemapPartition.objects.bulk_create(
+            partitions, update_conflicts=True, unique_fields=['key'], update_fields=['shards']
+        )
+        # Marks made while this ran may refer to rows read before them
+        SitemapPartition.objects.filter(dirty_at__lte=started).update(dirty_at=None)
+
+    # Shards of partitions that no longer exist
+    current = {name for name, _, _ in shards}
+    for path in directory.glob('*.xml.gz'):
+        if path.name not in current:
+            path.unlink()
+    return shards
+
+
+def mark_dirty(keys):
+    """Mark partitions for the next flush and schedule it once the transaction commits"""
+    now = timezone.now()
+    SitemapPartition.objects.bulk_create(
+        [SitemapPartition(key=key, dirty_at=now) for key in set(keys)],
+        update_conflicts=True, unique_fields=['key'], update_fields=['dirty_at'],
+    )
+    transaction.on_commit(schedule_flush)
+
+
+def flush_dirty(root=None, settle_seconds=0):
+    """
+    Rewrite partitions marked dirty at least settle_seconds ago, then the
+    index; returns the keys rewritten. A partition marked again while it was
+    being written stays dirty for the next flush.
+    """
+    root = Path(root) if root else sitemap_root()
+    directory = root / SHARD_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+
+    settled = timezone.now() - timedelta(seconds=settle_seconds)
+    dirty = list(
+        SitemapPartition.objects.filter(dirty_at__lte=settled)
+        .order_by('key').values_list('key', 'dirty_at')
+    )
+    for key, marked_at in dirty:
+        stored = _stored(_write_partition(directory, key))
+        unchanged = SitemapPartition.objects.filter(key=key, dirty_at=marked_at)
+        if not stored and key not in SECTIONS:
+            # Its last guide is gone
+            if not unchanged.delete()[0]:
+                SitemapPartition.objects.filter(key=key).update(shards=stored)
+        elif not unchanged.update(shards=stored, dirty_at=None):
+            SitemapPartition.objects.filter(key=key).update(shards=stored)
+    if dirty:
+        write_index(root, _indexed_shards())
+    return [key for key, _ in dirty]
+
+
+_flush_timer = None
+_flush_lock = threading.Lock()
+
+
+def _run_flush():
+    global _flush_timer
+    try:
+        keys = flush_dirty(settle_seconds=FLUSH_DELAY_SECONDS)
+        if keys:
+            logger.info(f"Rewrote sitemap partitions {', '.join(keys)}")
+        pending = SitemapPartition.objects.filter(dirty_at__isnull=False).exists()
+    except Exception as e:
+        logger.error(f"Sitemap flush failed: {e}")
+        pending = False
+    finally:
+        connection.close()
+        with _flush_lock:
+            _flush_timer = None
+    if pending:
+        schedule_flush()
+
+
+def schedule_flush():
+    """
+    Flush dirty partitions FLUSH_DELAY_SECONDS from now, unless a flush is
+    already pending in this process. Does nothing until a full generation
+    has written the index.
+    """
+    global _flush_timer
+    if not (sitemap_root() / INDEX_NAME).exists():
+        return
+    with _flush_lock:
+        if _flush_timer is not None:
+            return
+        _flush_timer = threading.Timer(FLUSH_DELAY_SECONDS, _run_flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def shard_paths():
+    """URL paths of the shards currently on disk"""
+    directory = sitemap_root() / SHARD_DIR
+    if not directory.is_dir():
+        return []
+    return sorted(f'/{SHARD_DIR}/{path.name}' for path in directory.glob('*.xml.gz'))
@@ -0,0 +1,390 @@
+"""
+Static export of the public site for nginx to serve without Python
+
+Every public page (home pages, golf guide and city guide pages, city guide
+listings, the JSON exports and the home catalog) is rendered through the
+normal URL configuration and middleware (a request built with
+RequestFactory handed straight to the handler) and written under
+STATIC_SITE_ROOT: /a/b/ becomes a/b/index.html (index.json for JSON). The
+sitemaps are not copied; nginx serves them from SITEMAP_ROOT, where they
+are kept current incrementally (see sitemaps.py). Each file gets precompressed .gz and, when
+the brotli package is installed, .br siblings for gzip_static/brotli_static.
+Files are written to a temporary name and renamed, so nginx never serves a
+partial file. Anything not on disk (query strings, POSTs, the realtime
+widget) falls through to Django.
+
+export_site() renders everything in parallel and prunes files for pages
+that no longer exist. Between full exports the save/delete receivers in
+models.py schedule the pages a guide, city guide or destination change
+touches; they are re-rendered (or, once they 404, removed) in the
+background after the change commits, with cheaper compression settings.
+The full JSON dumps are not part of these: they are rewritten by the full
+export and by the hourly `export_static_site --dumps` cron job deploy.sh
+installs. rerender_guides, which bypasses the receivers, re-exports the
+guides it rewrote itself.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import translation
+
+from .home_snapshot import get_home_snapshot, languages_for_destination
+from .models import CityGuide, Destination, DestinationGuide, PageRoute, RelatedDestinations
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+# Not worth compressing (nginx would serve the original anyway)
+MIN_COMPRESS_SIZE = 256
+# (gzip level, brotli quality): full exports compress as hard as they can;
+# incremental re-exports run on every edit and trade a little size for speed
+FULL_COMPRESSION = (9, 11)
+QUICK_COMPRESSION = (6, 5)
+
+
+def export_root():
+    return Path(getattr(settings, 'STATIC_SITE_ROOT', settings.BASE_DIR / 'static_site'))
+
+
+def _export_workers():
+    return getattr(settings, 'STATIC_SITE_WORKERS', 4)
+
+
+def _languages():
+    return sorted(set(
+        DestinationGuide.objects.order_by().values_list('language_code', flat=True).distinct()
+    ) | {'en'})
+
+
+def _home_paths(language):
+    if language == 'en':
+        home = reverse('destinations:home')
+    else:
+        home = reverse('destinations:home_lang', kwargs={'language': language})
+    catalog = reverse('destinations:home_catalog', kwargs={
+        'language': language, 'version': get_home_snapshot(language)['catalog_hash']
+    })
+    return [home, catalog]
+
+
+def _city_guide_home_paths(language):
+    if language == 'en':
+        return [reverse('destinations:city_guide_home')]
+    return [reverse('destinations:city_guide_home_lang', kwargs={'language': language})]
+
+
+def dump_paths():
+    """The full JSON dumps (only rewritten by full and --dumps exports)"""
+    return [
+        reverse('destinations:export_destinations'),
+        reverse('destinations:export_destination_guides'),
+    ]
+
+
+def site_paths():
+    """Every path the static export covers"""
+    paths = []
+    for language in _languages():
+        paths += _home_paths(language)
+    for language in {'en'} | set(PageRoute.objects.filter(kind=PageRoute.KIND_CITY_GUIDE).values_list('language_code', flat=True)):
+        paths += _city_guide_home_paths(language)
+    paths += list(PageRoute.objects.order_by('path').values_list('path', flat=True))
+    return paths + dump_paths()
+
+
+def route_paths(**filters):
+    """Registered paths of the PageRoute rows matching filters"""
+    return list(PageRoute.objects.filter(**filters).values_list('path', flat=True))
+
+
+def _neighbour_paths(destination_id, languages):
+    """Golf guide pages whose related blocks list the destination"""
+    country = Destination.objects.filter(pk=destination_id).values_list('country', flat=True).first()
+    related = RelatedDestinations.objects.filter(
+        destination__country=country, language_code__in=languages
+    ).values_list('destination_id', 'nearby_ids', 'same_country_ids')
+    neighbours = [dest_id for dest_id, nearby, same in related if destination_id in nearby + same]
+    return route_paths(kind=PageRoute.KIND_GOLF_GUIDE, destination_id__in=neighbours)
+
+
+def guide_paths(destination_id, language, created):
+    """Paths whose content changes when a destination's guide is submitted"""
+    paths = route_paths(destination_id=destination_id)
+    if created:
+        # A new guide enters the home catalogs and its country's related blocks
+        for lang in {'en', language}:
+            paths += _home_paths(lang)
+        paths += _neighbour_paths(destination_id, [language])
+    return list(dict.fromkeys(paths))
+
+
+def destination_paths(destination_id):
+    """Paths whose content changes when a destination is edited or deleted"""
+    paths = route_paths(destination_id=destination_id)
+    # Only the home pages listing it (a deletion captures these beforehand)
+    languages = sorted(languages_for_destination(destination_id))
+    for language in languages:
+        paths += _home_paths(language)
+    city_languages = {'en'} | set(
+        CityGuide.objects.filter(destination_id=destination_id).values_list('language_code', flat=True)
+    )
+    for language in city_languages:
+        paths += _city_guide_home_paths(language)
+    paths += _neighbour_paths(destination_id, languages)
+    return list(dict.fromkeys(paths))
+
+
+def file_for(path, content_type):
+    """Location of a path's file under the export root"""
+    relative = path.lstrip('/')
+    if not relative or relative.endswith('/'):
+        relative += 'index.json' if content_type.startswith('application/json') else 'index.html'
+    return export_root() / relative
+
+
+def _write_atomic(target, chunks):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=target.parent, prefix='.export-')
+    size = 0
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    os.chmod(temp, 0o644)
+    os.replace(temp, target)
+    return size
+
+
+def _read_blocks(path, block_size=1 << 20):
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            yield block
+
+
+def _gzip_blocks(blocks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for block in blocks:
+        yield compressor.compress(block)
+    yield compressor.flush()
+
+
+def _brotli_blocks(blocks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for block in blocks:
+        yield compressor.process(block)
+    yield compressor.finish()
+
+
+def write_file(target, chunks, compression=FULL_COMPRESSION):
+    """
+    Write a file from an iterable of byte chunks, then its precompressed
+    siblings (streamed from the written file; stale siblings are removed)
+    """
+    size = _write_atomic(target, chunks)
+    gzip_level, brotli_quality = compression
+    variants = {}
+    if size >= MIN_COMPRESS_SIZE:
+        variants['.gz'] = lambda blocks: _gzip_blocks(blocks, gzip_level)
+        if brotli is not None:
+            variants['.br'] = lambda blocks: _brotli_blocks(blocks, brotli_quality)
+    for suffix in COMPRESSED_SUFFIXES:
+        sibling = target.with_name(target.name + suffix)
+        if suffix in variants:
+            _write_atomic(sibling, variants[suffix](_read_blocks(target)))
+        elif sibling.exists():
+            sibling.unlink()
+
+
+def remove_file(path):
+    """Drop a page's files so requests fall through to Django again"""
+    if path.endswith('/'):
+        targets = [file_for(path, 'text/html'), file_for(path, 'application/json')]
+    else:
+        targets = [file_for(path, '')]
+    for target in targets:
+        for suffix in ('',) + COMPRESSED_SUFFIXES:
+            candidate = target.with_name(target.name + suffix)
+            if candidate.exists():
+                candidate.unlink()
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def _get_handler():
+    # The site's middleware stack, loaded once; get_response() sends no
+    # request_started/request_finished signals of its own, so rendering never
+    # touches the receivers live requests depend on
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            handler = BaseHandler()
+            handler.load_middleware()
+            _handler = handler
+        return _handler
+
+
+def _render_batch(paths, compression=FULL_COMPRESSION):
+    """Render and write paths on one thread; returns (written files, failed paths)"""
+    handler = _get_handler()
+    factory = RequestFactory(HTTP_HOST=getattr(settings, 'STATIC_SITE_HOST', 'tcgplex.com'))
+    written, failed = [], []
+    try:
+        for path in paths:
+            # Views activate their page's language; don't let it leak into the next page
+            with translation.override(settings.LANGUAGE_CODE):
+                response = handler.get_response(factory.get(path, secure=True))
+            try:
+                if response.status_code == 200:
+                    target = file_for(path, response.get('Content-Type', ''))
+                    # Streamed exports are written as they arrive, never held in memory
+                    write_file(
+                        target, response.streaming_content if response.streaming else [response.content], compression
+                    )
+                    written.append(target)
+                else:
+                    # Nothing stale stays on disk: nginx falls through to Django for it
+                    remove_file(path)
+                    failed.append((path, response.status_code))
+            finally:
+                response.close()
+    finally:
+        connection.close()
+    return written, failed
+
+
+def export_paths(paths, workers=None):
+    """Render paths in parallel; returns (written files, [(path, status)] not exported)"""
+    workers = max(1, min(workers or _export_workers(), len(paths) or 1))
+    batches = [paths[i::workers] for i in range(workers)]
+    written, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='static-export') as pool:
+        for batch_written, batch_failed in pool.map(_render_batch, batches):
+            written += batch_written
+            failed += batch_failed
+    return written, failed
+
+
+def prune(keep):
+    """Remove exported files (and siblings) not in `keep`; returns the number removed"""
+    keep = {str(path) for path in keep}
+    removed = 0
+    for dirpath, _, filenames in os.walk(export_root()):
+        for name in filenames:
+            full = os.path.join(dirpath, name)
+            original = full
+            for suffix in COMPRESSED_SUFFIXES:
+                if full.endswith(suffix):
+                    original = full[:-len(suffix)]
+            if original not in keep:
+                os.unlink(full)
+                removed += 1
+    return removed
+
+
+def export_site(workers=None):
+    """Export every page; returns (written files, not exported, files pruned)"""
+    written, failed = export_paths(site_paths(), workers)
+    return written, failed, prune(written)
+
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+
+def _get_export_pool():
+    # One thread: incremental exports run in submission order
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='static-export')
+        return _export_pool
+
+
+def export_enabled():
+    """Incremental exports only run once a full export has created the export root"""
+    return export_root().is_dir()
+
+
+_pending = {'describe': [], 'stale': set(), 'queued': False}
+_pending_lock = threading.Lock()
+
+
+def _drain():
+    with _pending_lock:
+        describe, stale = _pending['describe'], _pending['stale']
+        _pending.update(describe=[], stale=set(), queued=False)
+    try:
+        paths = []
+        for func in describe:
+            paths += func()
+        # Stale paths that no longer resolve render a 404 and are removed
+        paths = list(dict.fromkeys(paths + sorted(stale)))
+        written, failed = _render_batch(paths, QUICK_COMPRESSION)
+        logger.info(f"Static export: {len(written)} files")
+        # Deleted pages (404) and superseded catalog versions (302) are expected
+        errors = [(path, status) for path, status in failed if status >= 500]
+        if len(errors) < len(failed):
+            logger.info(f"Static export removed {[path for path, status in failed if status < 500]}")
+        if errors:
+            logger.error(f"Static export skipped {errors}")
+    except Exception as e:
+        logger.error(f"Static export failed: {e}")
+
+
+def schedule_export(describe, stale=()):
+    """
+    Re-export pages in the background once the current transaction commits.
+    `describe` is called then and returns the paths to render; `stale` are
+    paths the change may have removed (captured before it). Changes that
+    commit while an export is queued are folded into it.
+    """
+    if not export_enabled():
+        return
+
+    def queue():
+        with _pending_lock:
+            _pending['describe'].append(describe)
+            _pending['stale'].update(stale)
+            if _pending['queued']:
+                return
+            _pending['queued'] = True
+        _get_export_pool().submit(_drain)
+
+    transaction.on_commit(queue)
+
+
+def schedule_guide_export(destination_id, language, created, stale=()):
+    """Re-export a saved (or deleted, with created=True) guide's pages"""
+    schedule_export(lambda: guide_paths(destination_id, language, created), stale)
+
+
+def schedule_destination_export(destination_id, stale=()):
+    """Re-export every page showing a saved or deleted destination"""
+    schedule_export(lambda: destination_paths(destination_id), stale)
+
+
+def schedule_city_guide_export(city_guide_id, language, stale=()):
+    """Re-export a saved or deleted city guide's page and its listing"""
+    def describe():
+        paths = list(PageRoute.objects.filter(city_guide_id=city_guide_id).values_list('path', flat=True))
+        return paths + _city_guide_home_paths(language)
+
+    schedule_export(describe, stale)
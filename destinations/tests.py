@@ -1,3 +1,1145 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import realtime_service, static_export, work_queue
+from .models import (
+    Destination, DestinationGuide, PageRoute, PopularDestinationPool, RealtimeSnapshot, RelatedDestinations,
+    SitemapPartition, WorkUnit,
+)
+
+# Keep caches and generated files out of the deployment's own locations
+TEST_OUTPUT_ROOT = os.path.join(tempfile.gettempdir(), 'golfplex-tests')
+ISOLATED_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-shared'},
+    },
+    'SITEMAP_ROOT': os.path.join(TEST_OUTPUT_ROOT, 'sitemaps'),
+    'STATIC_SITE_ROOT': os.path.join(TEST_OUTPUT_ROOT, 'static_site'),
+}
+
+
+def make_destination(name='Pebble Beach', city='Monterey', region='California', country='United States',
+                     latitude=36.57, longitude=-121.95, **kwargs):
+    return Destination.objects.create(
+        name=name, city=city, region_or_state=region, country=country,
+        description='', latitude=latitude, longitude=longitude, **kwargs
+    )
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class UrlRegistryTests(TestCase):
+    def test_lowest_pk_owns_a_shared_slug(self):
+        from .url_registry import rebuild_registry, resolve_golf_guide
+        first = make_destination(name='Zeta Links')
+        second = make_destination(name='Alpha Links')
+        DestinationGuide.objects.create(destination=first, language_code='en', content='first')
+        DestinationGuide.objects.create(destination=second, language_code='en', content='second')
+        slug = first.generate_slug('en')
+        self.assertEqual(slug, second.generate_slug('en'))
+
+        # Saving the higher pk last does not take the URL over
+        second.save()
+        self.assertEqual(resolve_golf_guide('en', slug)[0], first)
+
+        rebuild_registry()
+        self.assertEqual(resolve_golf_guide('en', slug)[0], first)
+        self.assertEqual(PageRoute.objects.filter(slug=slug).count(), 1)
+
+    def test_next_lowest_pk_takes_over_a_removed_url(self):
+        from .url_registry import resolve_golf_guide
+        first, second, third = (make_destination(name=name) for name in ('Zeta Links', 'Alpha Links', 'Beta Links'))
+        for destination in (first, second, third):
+            DestinationGuide.objects.create(destination=destination, language_code='en', content='guide')
+        slug = first.generate_slug('en')
+
+        # The owner moves away
+        with self.captureOnCommitCallbacks(execute=True):
+            first.city = 'Carmel'
+            first.save()
+        self.assertEqual(resolve_golf_guide('en', slug)[0], second)
+        self.assertEqual(resolve_golf_guide('en', first.generate_slug('en'))[0], first)
+
+        # The owner is deleted, with its routes
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(resolve_golf_guide('en', slug)[0], third)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class RenderingTests(TestCase):
+    def test_rendered_html_is_sanitized(self):
+        from .rendering import render_article
+        html, _ = render_article(
+            '# Title\n\n<script>alert(1)</script><img src="x.png" onerror="alert(1)"> '
+            '[bad](javascript:alert(1)) [good](https://example.com)'
+        )
+        self.assertIn('<h1>Title</h1>', html)
+        self.assertNotIn('script', html)
+        self.assertNotIn('onerror', html)
+        self.assertNotIn('javascript:', html)
+        self.assertIn('<a target="_blank" href="https://example.com"', html)
+
+    def test_rerender_moves_updated_at(self):
+        guide = DestinationGuide.objects.create(destination=make_destination(), language_code='en', content='# Guide')
+        DestinationGuide.objects.filter(pk=guide.pk).update(render_version=0)
+        before = DestinationGuide.objects.get(pk=guide.pk).updated_at
+        call_command('rerender_guides', workers=1, stdout=io.StringIO())
+        guide.refresh_from_db()
+        self.assertGreater(guide.updated_at, before)
+        self.assertGreater(guide.render_version, 0)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        places = [
+            ('Carmel', 'California', 'United States'),
+            ('Monterey', 'California', 'United States'),
+            ('Pebble Beach', 'California', 'United States'),
+            ('Las Vegas', 'Nevada', 'United States'),
+            ('Reno', 'Nevada', 'United States'),
+            ('St Andrews', 'Fife', 'Scotland'),
+        ]
+        self.destinations = {}
+        for city, region, country in places:
+            destination = make_destination(name=f'{city} Links', city=city, region=region, country=country)
+            DestinationGuide.objects.create(destination=destination, language_code='en', content='guide')
+            self.destinations[city] = destination
+
+    def ids(self, *cities):
+        return [self.destinations[city].pk for city in cities]
+
+    def test_rebuild_lists_the_region_first_then_the_country(self):
+        from .recommendations import rebuild_all
+        self.assertEqual(rebuild_all(), 6)
+        related = RelatedDestinations.objects.get(destination=self.destinations['Carmel'], language_code='en')
+        self.assertEqual(related.nearby_ids, self.ids('Monterey', 'Pebble Beach'))
+        self.assertEqual(related.same_country_ids, self.ids('Las Vegas', 'Reno'))
+        related = RelatedDestinations.objects.get(destination=self.destinations['St Andrews'], language_code='en')
+        self.assertEqual((related.nearby_ids, related.same_country_ids), ([], []))
+
+    def test_popular_picks_are_country_diverse_and_skip_the_page(self):
+        from .recommendations import get_related_destinations, rebuild_all
+        rebuild_all()
+        pool = PopularDestinationPool.objects.get(language_code='en').entries
+        self.assertEqual(sorted(dest_id for dest_id, _ in pool), sorted(self.ids(*self.destinations)))
+
+        for _ in range(10):
+            popular = get_related_destinations(self.destinations['Reno'], 'en')['popular']
+            self.assertNotIn(self.destinations['Reno'], popular)
+            # One per country comes first, so Scotland's only entry is always picked
+            self.assertIn(self.destinations['St Andrews'], popular)
+            self.assertEqual(len(popular), 5)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class TimezoneTests(TestCase):
+    def test_backfill_splits_a_multi_zone_country(self):
+        places = {
+            'America/Los_Angeles': make_destination(city='Monterey', region='California', longitude=-121.9),
+            'America/Chicago': make_destination(city='Pensacola', region='Florida', longitude=-87.2),
+            'America/New_York': make_destination(city='Miami', region='Florida', longitude=-80.2),
+        }
+        Destination.objects.update(timezone='')
+
+        migration = importlib.import_module('destinations.migrations.0014_destination_timezone')
+        migration.assign_timezones(django_apps, None)
+        for zone, destination in places.items():
+            destination.refresh_from_db()
+            self.assertEqual(destination.timezone, zone)
+
+    def test_partial_save_writes_the_new_timezone(self):
+        destination = make_destination()
+        self.assertEqual(destination.timezone, 'America/Los_Angeles')
+        destination.region_or_state = 'New York'
+        destination.save(update_fields=['region_or_state'])
+        destination.refresh_from_db()
+        self.assertEqual(destination.timezone, 'America/New_York')
+
+
+class StandInAPI(BaseHTTPRequestHandler):
+    """Local stand-in for the weather and exchange rate APIs"""
+    hits = []
+    status = 200
+    delay = 0
+
+    def do_GET(self):
+        type(self).hits.append(self.path)
+        time.sleep(self.delay)
+        if self.path.startswith('/weather/'):
+            body = {'current_condition': [{'temp_C': '21', 'weatherDesc': [{'value': 'Sunny'}]}]}
+        else:
+            body = {'rates': {'USD': 1, 'EUR': 0.5, 'JPY': 150}, 'date': '2026-01-01'}
+        payload = json.dumps(body).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServerMixin:
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInAPI)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.api_settings = override_settings(
+            **ISOLATED_SETTINGS,
+            REALTIME_API_URLS={'weather': f'{base}/weather', 'exchange': f'{base}/exchange'},
+        )
+        cls.api_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.api_settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StandInAPI.hits = []
+        StandInAPI.status = 200
+        StandInAPI.delay = 0
+        realtime_service._retry_after.clear()
+        realtime_service._in_flight.clear()
+        cache.clear()
+
+    def weather_hits(self):
+        return [path for path in StandInAPI.hits if path.startswith('/weather/')]
+
+
+@override_settings(REALTIME_REFRESH_SYNC=True)
+class RealtimeServiceTests(StandInServerMixin, TestCase):
+    def test_fresh_value_is_served_without_upstream_calls(self):
+        service = realtime_service.RealTimeDestinationData()
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], '21')
+        self.assertEqual(service.get_exchange_data('Japan')['usd_to_local'], 150)
+        self.assertEqual(len(StandInAPI.hits), 2)
+
+        service.get_weather_data('Monterey', 'United States')
+        # Every country derives from the one shared rates table
+        service.get_exchange_data('Germany')
+        self.assertEqual(len(StandInAPI.hits), 2)
+        self.assertTrue(RealtimeSnapshot.objects.filter(key=realtime_service.EXCHANGE_RATES_KEY).exists())
+
+    def test_stale_value_is_served_while_it_is_refreshed(self):
+        service = realtime_service.RealTimeDestinationData()
+        key = service.get_cache_key('weather', 'Monterey_United States')
+        stale = {'data': {'temperature_c': 'old'}, 'fetched_at': time.time() - service.weather_cache_timeout - 1}
+        cache.set(key, stale)
+
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], 'old')
+        self.assertEqual(len(self.weather_hits()), 1)
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], '21')
+        self.assertEqual(len(self.weather_hits()), 1)
+
+    def test_durable_snapshot_is_served_after_a_cache_loss(self):
+        service = realtime_service.RealTimeDestinationData()
+        service.get_weather_data('Monterey', 'United States')
+        cache.clear()
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], '21')
+        self.assertEqual(len(self.weather_hits()), 1)
+
+    def test_failed_upstream_is_not_retried_until_the_backoff_ends(self):
+        StandInAPI.status = 500
+        service = realtime_service.RealTimeDestinationData()
+        self.assertIsNone(service.get_weather_data('Monterey', 'United States'))
+        self.assertIsNone(service.get_weather_data('Monterey', 'United States'))
+        self.assertEqual(len(self.weather_hits()), 1)
+
+        StandInAPI.status = 200
+        key = service.get_cache_key('weather', 'Monterey_United States')
+        realtime_service._retry_after[key] = time.monotonic() - 1
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], '21')
+        self.assertEqual(len(self.weather_hits()), 2)
+
+    def test_refresh_lock_held_elsewhere_skips_the_upstream_call(self):
+        service = realtime_service.RealTimeDestinationData()
+        key = service.get_cache_key('weather', 'Monterey_United States')
+        cache.add(f'{key}_refresh_lock', 1)
+        self.assertIsNone(service.get_weather_data('Monterey', 'United States'))
+        self.assertEqual(self.weather_hits(), [])
+
+    def test_every_country_shares_one_exchange_rate_call(self):
+        realtime_service.reset_upstream_call_counts()
+        service = realtime_service.RealTimeDestinationData()
+        for country in realtime_service.COUNTRY_CURRENCIES:
+            service.get_exchange_data(country)
+        self.assertEqual(realtime_service.get_upstream_call_counts(), {'weather': 0, 'exchange': 1})
+
+
+@override_settings(REALTIME_REFRESH_SYNC=False)
+class RealtimeThreadedTests(StandInServerMixin, TransactionTestCase):
+    """Refreshes on other threads need their own database connection"""
+
+    def test_concurrent_requests_share_one_refresh(self):
+        StandInAPI.delay = 0.3
+        service = realtime_service.RealTimeDestinationData()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.get_weather_data('Monterey', 'United States')))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Nobody waits on the upstream call
+        self.assertEqual(results, [None] * 8)
+
+        key = service.get_cache_key('weather', 'Monterey_United States')
+        deadline = time.monotonic() + 5
+        while key in realtime_service._in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(service.get_weather_data('Monterey', 'United States')['temperature_c'], '21')
+        self.assertEqual(len(self.weather_hits()), 1)
+
+    def test_warm_command_reports_and_resets_the_counters(self):
+        from io import StringIO
+        from django.core.management import call_command
+        destination = make_destination()
+        DestinationGuide.objects.create(destination=destination, language_code='en', content='guide')
+        realtime_service.reset_upstream_call_counts()
+
+        call_command('warm_realtime_data', stdout=StringIO())
+        self.assertTrue(RealtimeSnapshot.objects.filter(key=realtime_service.EXCHANGE_RATES_KEY).exists())
+        out = StringIO()
+        call_command('warm_realtime_data', '--report', '--reset-counts', stdout=out)
+        self.assertIn('weather: 1, exchange: 1', out.getvalue())
+        self.assertEqual(realtime_service.get_upstream_call_counts(), {'weather': 0, 'exchange': 0})
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class HomeLanguageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_unsupported_language_is_not_snapshotted(self):
+        from .home_snapshot import _version_key
+        self.assertEqual(self.client.get('/zz/').status_code, 404)
+        self.assertEqual(self.client.get('/api/home-catalog/zz/abc.json').status_code, 404)
+        self.assertIsNone(cache.get(_version_key('zz')))
+
+        self.assertEqual(self.client.get('/de/').status_code, 200)
+        self.assertIsNotNone(cache.get(_version_key('de')))
+
+    def add_guide(self, destination, language='en'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return DestinationGuide.objects.create(destination=destination, language_code=language, content='guide')
+
+    def test_changes_patch_the_cached_snapshot(self):
+        from . import home_snapshot
+        first = make_destination(name='Pebble Beach')
+        self.add_guide(first)
+        home_snapshot.get_home_snapshot('en')
+        second = make_destination(name='Cypress Point', city='Carmel')
+
+        def matches_a_full_build(language='en'):
+            patched = home_snapshot.get_home_snapshot(language)
+            built = home_snapshot.build_home_snapshot(language)
+            for field in ('cards', 'catalog_hash', 'total_destinations', 'available_languages'):
+                self.assertEqual(patched[field], built[field])
+            return patched
+
+        with mock.patch.object(home_snapshot, 'build_home_snapshot', side_effect=AssertionError('full build')):
+            self.add_guide(second)
+            self.add_guide(second, 'de')
+            with self.captureOnCommitCallbacks(execute=True):
+                first.name = 'Alpha Links'
+                first.save()
+        self.assertEqual([card['name'] for card in matches_a_full_build()['cards']], ['Alpha Links', 'Cypress Point'])
+        self.assertEqual(matches_a_full_build()['available_languages'], ['de', 'en'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DestinationGuide.objects.filter(destination=first).delete()
+        self.assertEqual([card['name'] for card in matches_a_full_build()['cards']], ['Cypress Point'])
+
+    def test_guide_saves_build_nothing(self):
+        from .home_snapshot import _version_key
+        self.add_guide(make_destination())
+        self.assertIsNone(cache.get(_version_key('en')))
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class HomeCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = make_destination()
+        DestinationGuide.objects.create(destination=self.destination, language_code='en', content='guide')
+
+    def catalog_url(self, version):
+        return reverse('destinations:home_catalog', kwargs={'language': 'en', 'version': version})
+
+    def test_hash_follows_the_content_and_stale_hashes_redirect(self):
+        from .home_snapshot import get_home_snapshot, rebuild_home_snapshot
+        old = get_home_snapshot('en')['catalog_hash']
+        response = self.client.get(self.catalog_url(old))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['name'], ['Pebble Beach'])
+        self.assertEqual(self.client.get(self.catalog_url(old), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Rebuilding unchanged content keeps the hash
+        self.assertEqual(rebuild_home_snapshot('en')['catalog_hash'], old)
+        Destination.objects.filter(pk=self.destination.pk).update(name='Cypress Point')
+        new = rebuild_home_snapshot('en')['catalog_hash']
+        self.assertNotEqual(new, old)
+
+        response = self.client.get(self.catalog_url(old))
+        self.assertRedirects(response, self.catalog_url(new), fetch_redirect_response=False)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class GuideSearchTests(TestCase):
+    def test_snippets_are_escaped_and_languages_kept_apart(self):
+        from .guide_search import search
+        destination = make_destination()
+        english = DestinationGuide.objects.create(
+            destination=destination, language_code='en',
+            content='# Links\n\nPlay the <b>bunker</b> on the seventh hole with care.'
+        )
+        DestinationGuide.objects.create(
+            destination=make_destination(city='Carmel'), language_code='de',
+            content='# Plätze\n\nDer bunker am siebten Loch ist tief.'
+        )
+
+        hits = search('bunker', 'en')
+        self.assertEqual([(hit.object_id, hit.destination_id) for hit in hits], [(english.pk, destination.pk)])
+        self.assertIn('<mark>bunker</mark>', hits[0].snippet)
+        self.assertIn('&lt;b', hits[0].snippet)
+        self.assertNotIn('<b', hits[0].snippet)
+        self.assertEqual(len(search('bunker', 'de')), 1)
+        self.assertEqual(search('bunker', 'fr'), [])
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class CacheTagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidating_a_tag_drops_only_its_entries(self):
+        from . import cache_tags
+        calls = []
+
+        def cached(key, *tags):
+            return cache_tags.get_or_set(key, tags, lambda: calls.append(key) or len(calls))
+
+        first = cached('a', 'destination:1', 'country:spain')
+        other = cached('b', 'destination:2', 'country:spain')
+        self.assertEqual((cached('a', 'destination:1', 'country:spain'), len(calls)), (first, 2))
+
+        cache_tags.invalidate('destination:1')
+        self.assertNotEqual(cached('a', 'destination:1', 'country:spain'), first)
+        self.assertEqual(cached('b', 'destination:2', 'country:spain'), other)
+        self.assertEqual(len(calls), 3)
+
+        # A shared tag drops every entry under it
+        cache_tags.invalidate('country:spain')
+        cached('a', 'destination:1', 'country:spain')
+        cached('b', 'destination:2', 'country:spain')
+        self.assertEqual(len(calls), 5)
+
+
+SHARED_CACHE_FILE = os.path.join(TEST_OUTPUT_ROOT, 'shared-cache.sqlite3')
+TWO_PROCESS_CACHES = {
+    # Two "processes", each with its own L1 and its own connection to one SQLite file
+    name: {
+        'BACKEND': 'destinations.cache_backends.TwoTierCache',
+        'LOCATION': f'{name}_l2',
+        'OPTIONS': {'SYNC_INTERVAL': 0, 'L1_TIMEOUT': 30},
+    }
+    for name in ('first', 'second')
+} | {
+    f'{name}_l2': {'BACKEND': 'destinations.cache_backends.SQLiteCache', 'LOCATION': SHARED_CACHE_FILE}
+    for name in ('first', 'second')
+}
+
+
+@override_settings(CACHES=dict(ISOLATED_SETTINGS['CACHES'], **TWO_PROCESS_CACHES))
+class CacheBackendTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        os.makedirs(TEST_OUTPUT_ROOT, exist_ok=True)
+        self.first, self.second = caches['first'], caches['second']
+        self.first.clear()
+
+    def test_a_write_evicts_other_processes_l1_copies(self):
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.assertEqual(self.second.stats['l1_hits'], 1)
+
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.set_many({'key': 'newer'})
+        self.assertEqual(self.second.get('key'), 'newer')
+
+    def test_a_delete_evicts_other_processes_l1_copies(self):
+        self.first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+
+        self.assertTrue(self.first.delete('a'))
+        self.assertFalse(self.first.delete('a'))
+        self.assertIsNone(self.second.get('a'))
+        self.first.delete_many(['b'])
+        self.assertIsNone(self.second.get('b'))
+
+    def test_value_and_log_entry_are_written_together(self):
+        shared = self.first._shared
+        self.first.set('key', 'value')
+        seq = shared.get(self.first.SEQ_KEY)
+        self.assertEqual(shared.get(self.first.LOG_KEY.format(seq)), [self.first.make_key('key')])
+        self.first.delete('key')
+        self.assertEqual(shared.get(self.first.SEQ_KEY), seq + 1)
+
+    def test_l1_copies_are_bounded_by_l1_timeout(self):
+        self.assertEqual(self.first._l1_ttl(None), 30)
+        self.assertEqual(self.first._l1_ttl(3600), 30)
+        self.assertEqual(self.first._l1_ttl(5), 5)
+
+    def test_write_count_is_exact_across_threads(self):
+        shared = self.first._shared
+        before = shared._writes
+
+        def write(n):
+            for i in range(50):
+                shared.set(f'thread-{n}-{i}', i)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(shared._writes - before, 200)
+
+
+class TypeaheadIndexTests(TestCase):
+    ROWS = [
+        ('St Andrews Links', 'St Andrews', 'Fife', 'United Kingdom'),
+        ('Andrews Bay', 'Monterey', 'California', 'United States'),
+        ('Pebble Beach', 'Monterey', 'California', 'United States'),
+        ('Beach Dunes', 'San Diego', 'California', 'United States'),
+        ('Torrey Pines', 'San Diego', 'California', 'United States'),
+        ('Dunes Stadium', 'Bandon', 'Oregon', 'United States'),
+        ('Kawana Hotel', 'Ito', 'Shizuoka', 'Japan'),
+        ('Sandy Lane', 'Holetown', 'Saint James', 'Barbados'),
+    ]
+
+    def setUp(self):
+        from .typeahead_index import TypeaheadIndex
+        self.rows = [
+            {'id': i, 'name': name, 'city': city, 'region_or_state': region, 'country': country, 'url': f'/{i}/'}
+            for i, (name, city, region, country) in enumerate(self.ROWS, start=1)
+        ]
+        self.index = TypeaheadIndex(self.rows)
+
+    def names(self, query, limit=10):
+        return [entry.name for entry in self.index.search(query, limit=limit, cached=False)]
+
+    def exhaustive(self, query, limit):
+        """Reference ranking: score every entry"""
+        from .typeahead_index import fold
+        folded = fold(query)
+        matches = [dict(self.index._matching_tokens(term)) for term in sorted(set(folded.split()))]
+        scored = sorted(
+            (score, entry.folded_name, entry.name)
+            for entry in self.index._entries.values()
+            if (score := self.index._score(entry, matches, folded)) is not None
+        )
+        return [name for _, _, name in scored[:limit]]
+
+    def test_ranks_name_before_location_and_prefix_before_infix(self):
+        self.assertEqual(self.names('andrews'), ['Andrews Bay', 'St Andrews Links'])
+        self.assertEqual(self.names('san'), ['Sandy Lane', 'Beach Dunes', 'Torrey Pines'])
+        self.assertEqual(self.names('ndrew'), ['Andrews Bay', 'St Andrews Links'])
+        self.assertEqual(self.names('pebble beach'), ['Pebble Beach'])
+        self.assertEqual(self.names('zzz'), [])
+
+    def test_exact_token_outranks_a_longer_token_of_the_same_term(self):
+        # "st" is a whole word in one name and a prefix of "stadium" in another
+        self.assertEqual(self.names('st', limit=1), ['St Andrews Links'])
+        self.assertEqual(self.names('dunes st', limit=1), ['Dunes Stadium'])
+
+    def test_matches_exhaustive_scoring(self):
+        queries = ['a', 's', 'st', 'san d', 'beach', 'dunes s', 'united states', 'c m', 'and be', 'pines san']
+        for query in queries:
+            for limit in (1, 2, 3, 10):
+                with self.subTest(query=query, limit=limit):
+                    self.assertEqual(self.names(query, limit), self.exhaustive(query, limit))
+
+    def test_upsert_and_remove(self):
+        row = dict(self.rows[2], name='Cypress Point')
+        self.assertTrue(self.index.upsert(row))
+        self.assertFalse(self.index.upsert(row))
+        self.assertEqual(self.names('pebble'), [])
+        self.assertEqual(self.names('cypress'), ['Cypress Point'])
+        self.assertTrue(self.index.remove(row['id']))
+        self.assertEqual(self.names('cypress'), [])
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = make_destination()
+        DestinationGuide.objects.create(destination=self.destination, language_code='en', content='# Guide\n\n' + 'Text. ' * 300)
+        self.url = self.destination.get_absolute_url()
+
+    def test_etag_revalidation_without_last_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        # Weak: the same page goes out in several content encodings
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('s-maxage=3600', response['Cache-Control'])
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A date alone can't show that a related block changed
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200
+        )
+
+    def test_destination_edit_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.destination.description = 'Updated'
+        self.destination.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deploying_new_code_changes_the_etag(self):
+        from .http_caching import code_version
+        etag = self.client.get(self.url)['ETag']
+        code_version.cache_clear()
+        try:
+            with self.settings(PAGE_VERSION='next-release'):
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        finally:
+            code_version.cache_clear()
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = make_destination()
+        DestinationGuide.objects.create(destination=self.destination, language_code='en', content='# Guide')
+        self.url = self.destination.get_absolute_url()
+
+    def test_repeat_get_is_served_from_the_cache(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        # Only the conditional-request route lookup (http_caching.py), no rendering
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Pebble Beach')
+
+    def test_query_strings_and_non_get_requests_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.assertNotIn('X-Page-Cache', self.client.get(self.url, {'utm_source': 'feed'}))
+        self.assertNotIn('X-Page-Cache', self.client.post(self.url))
+        # And neither stored anything in place of the plain GET's page
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+
+    def test_tag_bump_evicts_the_page(self):
+        from . import cache_tags
+        self.client.get(self.url)
+        cache_tags.invalidate(cache_tags.country_tag('United States'))
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+
+        # Other destinations' tags leave it alone
+        cache_tags.invalidate(cache_tags.destination_tag(self.destination.pk + 1))
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class ResponseStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.destination = make_destination()
+        DestinationGuide.objects.create(destination=self.destination, language_code='en', content='# Guide')
+        self.url = self.destination.get_absolute_url()
+
+    def test_minify_leaves_whitespace_sensitive_elements_alone(self):
+        from .response_store import minify_html
+        script = '<script>\n    const a = 1;\n    if (a) {\n        go();\n    }\n</script>'
+        pre = '<pre>\n    indented\n\n        more\n</pre>'
+        html = f'<div>\n    <!-- note -->\n    <p>Text</p>\n\n\n    {script}\n    {pre}\n</div>\n'
+        self.assertEqual(minify_html(html), f'<div>\n<p>Text</p>\n{script}\n{pre}\n</div>')
+
+    def test_encoding_negotiation(self):
+        from django.test import RequestFactory
+        from .response_store import accepted_encodings, page_response, store_page
+        page = store_page(b'<p>Hello</p>', 'text/html; charset=utf-8')
+        factory = RequestFactory()
+
+        def negotiate(header):
+            return page_response(factory.get('/', HTTP_ACCEPT_ENCODING=header), page)
+
+        response = negotiate('gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'<p>Hello</p>')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        for header in ('', 'gzip;q=0', 'identity'):
+            response = negotiate(header)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(response.content, b'<p>Hello</p>')
+        self.assertEqual(accepted_encodings(factory.get('/', HTTP_ACCEPT_ENCODING='*')), {'*', 'br', 'gzip'})
+
+    def test_cached_page_is_stored_once_and_replaced_on_invalidation(self):
+        from . import cache_tags
+        from .response_store import store_page
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        first = gzip.decompress(response.content)
+        self.assertIn(b'Pebble Beach', first)
+        self.assertEqual(self.client.get(self.url).content, first)
+
+        with mock.patch('destinations.page_cache.store_page', wraps=store_page) as store:
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+            store.assert_not_called()
+            cache_tags.invalidate(cache_tags.destination_tag(self.destination.pk))
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'miss')
+            store.assert_called_once()
+
+    def test_stats_report_each_cached_view(self):
+        self.client.get(self.url)
+        out = io.StringIO()
+        call_command('response_store_stats', stdout=out)
+        self.assertIn('destinations.views.destination_detail: 1 pages stored', out.getvalue())
+        self.assertIn('destinations.views.city_guide_detail_lang: no pages stored yet', out.getvalue())
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class StaticExportTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        # Incremental exports only run once the export root exists
+        self.root = tempfile.mkdtemp(prefix='golfplex-static-site-')
+        settings_override = override_settings(STATIC_SITE_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.destination = make_destination()
+        # One change at a time: a background render and a write in the test
+        # lock each other out of the shared in-memory test database
+        self.wait_for_exports()
+
+    def add_guide(self, language='en'):
+        guide = DestinationGuide.objects.create(
+            destination=self.destination, language_code=language, content='# Guide\n\n' + 'Text. ' * 300
+        )
+        self.wait_for_exports()
+        return guide
+
+    def wait_for_exports(self):
+        static_export._get_export_pool().submit(lambda: None).result(timeout=30)
+
+    def exported(self, path):
+        return static_export.file_for(path, 'text/html').exists()
+
+    def test_saved_guide_is_exported_and_deleted_guide_removed(self):
+        guide = self.add_guide()
+        path = self.destination.get_absolute_url()
+        self.assertTrue(self.exported(path))
+
+        guide.delete()
+        self.wait_for_exports()
+        self.assertFalse(self.exported(path))
+
+    def test_destination_move_and_delete_remove_old_pages(self):
+        self.add_guide()
+        old_path = self.destination.get_absolute_url()
+        self.destination.city = 'Pebble Beach'
+        self.destination.save()
+        self.wait_for_exports()
+        new_path = Destination.objects.get(pk=self.destination.pk).get_absolute_url()
+        self.assertFalse(self.exported(old_path))
+        self.assertTrue(self.exported(new_path))
+
+        self.destination.delete()
+        self.wait_for_exports()
+        self.assertFalse(self.exported(new_path))
+
+    def test_edits_leave_the_full_dumps_and_unrelated_home_pages_alone(self):
+        self.add_guide()
+        other = make_destination(name='Valderrama', city='Sotogrande', region='Andalusia', country='Spain')
+        DestinationGuide.objects.create(destination=other, language_code='es', content='# Guía')
+        self.wait_for_exports()
+        spanish_home = reverse('destinations:home_lang', kwargs={'language': 'es'})
+        self.assertEqual(static_export.destination_paths(self.destination.pk).count(spanish_home), 0)
+        for path in static_export.dump_paths():
+            self.assertNotIn(path, static_export.destination_paths(self.destination.pk))
+            self.assertNotIn(path, static_export.guide_paths(self.destination.pk, 'en', True))
+
+        static_export.remove_file(spanish_home)
+        static_export.remove_file(reverse('destinations:home'))
+        self.destination.description = 'Updated'
+        self.destination.save()
+        self.wait_for_exports()
+        self.assertTrue(self.exported(reverse('destinations:home')))
+        self.assertFalse(self.exported(spanish_home))
+        for path in static_export.dump_paths():
+            self.assertFalse(static_export.file_for(path, 'application/json').exists())
+
+        call_command('export_static_site', '--dumps', stdout=io.StringIO())
+        for path in static_export.dump_paths():
+            self.assertTrue(static_export.file_for(path, 'application/json').exists())
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='golfplex-sitemaps-')
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def add_guides(self, *cities, language='en'):
+        guides = []
+        for city in cities:
+            destination = make_destination(name=f'{city} Links', city=city)
+            guides.append(DestinationGuide.objects.create(destination=destination, language_code=language, content='# Guide'))
+        return guides
+
+    def shard_names(self):
+        return sorted(os.listdir(os.path.join(self.root, 'sitemaps')))
+
+    def index(self):
+        with open(os.path.join(self.root, 'sitemap.xml'), encoding='utf-8') as f:
+            return f.read()
+
+    def dirty(self):
+        return set(SitemapPartition.objects.filter(dirty_at__isnull=False).values_list('key', flat=True))
+
+    def test_partition_rolls_over_into_shards(self):
+        from . import sitemaps
+        self.add_guides('Monterey', 'Carmel', 'Pacific Grove', 'Salinas', 'Seaside')
+        with mock.patch('destinations.sitemaps.MAX_URLS', 2):
+            shards = sitemaps.generate_sitemaps(self.root)
+        golf = [(name, urls) for name, urls, _ in shards if name.startswith('golf-en-0-')]
+        self.assertEqual(golf, [('golf-en-0-1.xml.gz', 2), ('golf-en-0-2.xml.gz', 2), ('golf-en-0-3.xml.gz', 1)])
+        with gzip.open(os.path.join(self.root, 'sitemaps', 'golf-en-0-3.xml.gz'), 'rt') as f:
+            self.assertEqual(f.read().count('<url>'), 1)
+        for name, _ in golf:
+            self.assertIn(f'/sitemaps/{name}</loc>', self.index())
+
+    def test_guide_changes_mark_only_their_partitions(self):
+        from . import sitemaps
+        guide, = self.add_guides('Monterey')
+        sitemaps.generate_sitemaps(self.root)
+        self.assertEqual(self.dirty(), set())
+
+        guide.content = '# Updated'
+        guide.save()
+        self.assertEqual(self.dirty(), {'golf-en-0'})
+        # A new guide also changes its home page's lastmod
+        DestinationGuide.objects.create(destination=guide.destination, language_code='de', content='# Anleitung')
+        self.assertEqual(self.dirty(), {'golf-en-0', 'golf-de-0', 'pages'})
+
+    def test_mark_made_during_a_flush_stays_dirty(self):
+        from . import sitemaps
+        guide, = self.add_guides('Monterey')
+        sitemaps.generate_sitemaps(self.root)
+        guide.save()
+        write_partition = sitemaps._write_partition
+
+        def write_while_edited(directory, key):
+            shards = write_partition(directory, key)
+            sitemaps.mark_dirty([key])
+            return shards
+
+        with mock.patch('destinations.sitemaps._write_partition', write_while_edited):
+            self.assertEqual(sitemaps.flush_dirty(self.root), ['golf-en-0'])
+        self.assertEqual(self.dirty(), {'golf-en-0'})
+        self.assertEqual(sitemaps.flush_dirty(self.root), ['golf-en-0'])
+        self.assertEqual(self.dirty(), set())
+
+    def test_deleting_the_last_guide_drops_its_partition(self):
+        from . import sitemaps
+        self.add_guides('Monterey')
+        german, = self.add_guides('Carmel', language='de')
+        sitemaps.generate_sitemaps(self.root)
+        self.assertIn('golf-de-0-1.xml.gz', self.shard_names())
+
+        german.delete()
+        sitemaps.flush_dirty(self.root)
+        self.assertNotIn('golf-de-0-1.xml.gz', self.shard_names())
+        self.assertNotIn('golf-de-0', self.index())
+        self.assertFalse(SitemapPartition.objects.filter(key='golf-de-0').exists())
+        self.assertIn('golf-en-0-1.xml.gz', self.shard_names())
+
+    def test_blank_location_values_get_no_search_url(self):
+        from . import sitemaps
+        make_destination(city='  ', region=' ')
+        paths = [url.path for url in sitemaps.search_urls()]
+        self.assertEqual(paths, ['/?q=United+States'])
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.url = reverse('destinations:export_destinations')
+        self.destinations = [make_destination(city=city) for city in ('Monterey', 'Carmel', 'Pacific Grove')]
+
+    def rows(self, response):
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_pages_follow_the_cursor(self):
+        first = self.client.get(self.url, {'fields': 'id,city', 'limit': 2})
+        self.assertEqual([row['city'] for row in self.rows(first)], ['Monterey', 'Carmel'])
+        second = self.client.get(self.url, {'fields': 'id,city', 'limit': 2, 'after': first['X-Next-Cursor']})
+        self.assertEqual(self.rows(second), [{'id': self.destinations[2].pk, 'city': 'Pacific Grove'}])
+        self.assertNotIn('X-Next-Cursor', second)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'fields': 'name', 'omit': 'name'}, {'limit': 0}, {'limit': -1}, {'fields': 'nope'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+@mock.patch('destinations.change_feed.SETTLE_SECONDS', 0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.url = reverse('destinations:export_destinations')
+        self.destinations = [make_destination(city=city) for city in ('Monterey', 'Carmel', 'Pacific Grove')]
+
+    def page(self, since, limit=2):
+        response = self.client.get(self.url, {'since': since, 'fields': 'city', 'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content)), response
+
+    def test_pages_resume_from_the_cursor(self):
+        first, response = self.page('0')
+        self.assertEqual([entry['row']['city'] for entry in first], ['Monterey', 'Carmel'])
+        self.assertEqual(response['X-Has-More'], 'true')
+        second, response = self.page(response['X-Next-Cursor'])
+        self.assertEqual([entry['id'] for entry in second], [self.destinations[2].pk])
+        self.assertEqual(response['X-Has-More'], 'false')
+
+        # Nothing new: the same cursor comes back
+        cursor = response['X-Next-Cursor']
+        empty, response = self.page(cursor)
+        self.assertEqual((empty, response['X-Next-Cursor']), ([], cursor))
+
+    def test_updates_and_deletions_after_the_cursor(self):
+        _, response = self.page('0', limit=10)
+        cursor = response['X-Next-Cursor']
+        updated, deleted = self.destinations[0], self.destinations[1]
+        updated.description = 'Updated'
+        updated.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        entries, _ = self.page(cursor, limit=10)
+        self.assertEqual(
+            sorted((entry['op'], entry['id']) for entry in entries),
+            sorted([('upsert', updated.pk), ('delete', deleted_id)])
+        )
+
+    def test_invalid_and_expired_cursors(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': '1.0.1'}).status_code, 410)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class WorkQueueTests(TestCase):
+    def setUp(self):
+        self.destinations = [make_destination(city=city) for city in ('Monterey', 'Carmel', 'Pacific Grove')]
+
+    def add_guide(self, destination, language='en'):
+        return DestinationGuide.objects.create(destination=destination, language_code=language, content='Text. ' * 300)
+
+    def test_claims_never_overlap(self):
+        first = work_queue.claim_many('a', 2)
+        second = work_queue.claim_many('b', 5)
+        self.assertEqual([lease.destination_id for lease in first], [d.pk for d in self.destinations[:2]])
+        self.assertEqual(len({lease.token for lease in first}), 1)
+        self.assertEqual([lease.destination_id for lease in second], [self.destinations[2].pk])
+        self.assertIsNone(work_queue.claim('c'))
+
+    def test_expired_lease_is_handed_out_again(self):
+        lease = work_queue.claim('a')
+        WorkUnit.objects.filter(pk=lease.unit_id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        reclaimed = work_queue.claim('b')
+        self.assertEqual(reclaimed.unit_id, lease.unit_id)
+        self.assertEqual(WorkUnit.objects.get(pk=lease.unit_id).attempts, 2)
+        # The first worker has lost it
+        self.assertEqual(work_queue.renew([lease.unit_id], lease.token)[1], [])
+        self.assertEqual(work_queue.renew([lease.unit_id], reclaimed.token)[1], [lease.unit_id])
+
+    def test_english_guide_completes_its_unit_and_opens_translations(self):
+        destination = self.destinations[0]
+        self.add_guide(destination)
+        units = dict(WorkUnit.objects.filter(destination=destination).values_list('language_code', 'status'))
+        self.assertEqual(units.pop('en'), WorkUnit.STATUS_DONE)
+        self.assertEqual(set(units), set(work_queue.TARGET_LANGUAGES))
+        self.assertEqual(set(units.values()), {WorkUnit.STATUS_PENDING})
+        # English work is handed out before translations
+        self.assertEqual(
+            [lease.language_code for lease in work_queue.claim_many('a', 3)],
+            ['en', 'en', next(iter(work_queue.TARGET_LANGUAGES))]
+        )
+
+    def test_upgrade_migration_seeds_an_empty_queue(self):
+        self.add_guide(self.destinations[0])
+        self.add_guide(self.destinations[0], 'de')
+        expected = set(WorkUnit.objects.values_list('destination_id', 'language_code', 'status'))
+        WorkUnit.objects.all().delete()
+
+        migration = importlib.import_module('destinations.migrations.0020_seed_work_queue')
+        migration.seed_work_units(django_apps, None)
+        self.assertEqual(set(WorkUnit.objects.values_list('destination_id', 'language_code', 'status')), expected)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class WorkApiTests(TestCase):
+    content = '# Guide\n\n' + 'Text. ' * 300
+
+    def setUp(self):
+        cache.clear()
+        self.destination = make_destination()
+        self.lease = work_queue.claim('a')
+
+    def post(self, name, payload):
+        return self.client.post(reverse(f'destinations:{name}'), json.dumps(payload), content_type='application/json')
+
+    def submission(self, **overrides):
+        payload = {'destination_id': self.destination.pk, 'language_code': 'en', 'content': self.content,
+                   'token': self.lease.token, 'worker_info': {'generation_seconds': 120}}
+        return dict(payload, **overrides)
+
+    def test_heartbeat_rejects_a_body_that_is_not_an_object(self):
+        self.assertEqual(self.post('work_heartbeat', [1, 2]).status_code, 400)
+        response = self.post('work_heartbeat', {'unit_id': self.lease.unit_id, 'token': self.lease.token})
+        self.assertEqual(response.json()['renewed'], [self.lease.unit_id])
+
+    def test_submission_needs_the_lease_token(self):
+        self.assertEqual(self.post('submit_work', [1, 2]).status_code, 400)
+        self.assertEqual(self.post('submit_work', self.submission(token=None)).status_code, 400)
+        self.assertEqual(self.post('submit_work', self.submission()).status_code, 200)
+        self.assertEqual(WorkUnit.objects.get(pk=self.lease.unit_id).status, WorkUnit.STATUS_DONE)
+
+    def test_stale_token_is_rejected_and_counted_as_duplicate_work(self):
+        WorkUnit.objects.filter(pk=self.lease.unit_id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        current = work_queue.claim('b')
+
+        self.assertEqual(self.post('submit_work', self.submission()).status_code, 409)
+        self.assertFalse(DestinationGuide.objects.exists())
+        self.assertEqual(work_queue.metrics()['duplicate_submissions'], 1)
+
+        response = self.post('submit_work', {'items': [
+            dict(self.submission(), generation_seconds=60),
+            dict(self.submission(token=current.token), generation_seconds=60),
+        ]})
+        self.assertEqual([result['status'] for result in response.json()['results']], ['lease_lost', 'created'])
+        self.assertEqual(work_queue.metrics()['duplicate_submissions'], 2)
+
+    def test_gzip_encoded_batch_submission(self):
+        other = make_destination(name='Cypress Point', city='Carmel')
+        other_lease = work_queue.claim('a')
+        self.assertEqual(other_lease.destination_id, other.pk)
+        items = [
+            self.submission(),
+            self.submission(destination_id=other.pk, token=other_lease.token),
+            self.submission(destination_id=other.pk, language_code='fr', content='Too short'),
+        ]
+        response = self.client.post(
+            reverse('destinations:submit_work'), gzip.compress(json.dumps({'items': items}).encode()),
+            content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'created', 'error'])
+        self.assertEqual([result['destination_id'] for result in results], [self.destination.pk, other.pk, other.pk])
+        self.assertIn('too short', results[2]['message'])
+        self.assertEqual(response.json()['summary']['created'], 2)
+        self.assertEqual(DestinationGuide.objects.get(destination=other).content, self.content)
+
+        # A body that says gzip but isn't is rejected
+        response = self.client.post(
+            reverse('destinations:submit_work'), b'not gzip', content_type='application/json',
+            HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_submission_over_an_existing_guide_finishes_the_unit(self):
+        DestinationGuide.objects.create(destination=self.destination, language_code='en', content='# Old guide')
+        unit = WorkUnit.objects.filter(pk=self.lease.unit_id)
+        formats = {
+            'atomic': lambda token: self.submission(token=token),
+            'legacy': lambda token: {'destination_id': self.destination.pk, 'token': token,
+                                     'guides': {'en': {'content': self.content}}},
+            'batch': lambda token: {'items': [self.submission(token=token)]},
+        }
+        for name, payload in formats.items():
+            with self.subTest(name):
+                # Queued for regeneration and leased again
+                unit.update(status=WorkUnit.STATUS_PENDING)
+                lease = work_queue.claim('a')
+                self.assertEqual(self.post('submit_work', payload(lease.token)).status_code, 200)
+                self.assertEqual(unit.get().status, WorkUnit.STATUS_DONE)
+                self.assertEqual(DestinationGuide.objects.get().content, self.content)
+
+
+@override_settings(**ISOLATED_SETTINGS)
+class WorkCounterTests(TestCase):
+    def setUp(self):
+        self.destinations = [make_destination(city=city) for city in ('Monterey', 'Carmel', 'Pacific Grove')]
+        work_queue.rebuild_counters()
+        for destination in self.destinations[:2]:
+            for language in ('en', 'de', 'fr'):
+                DestinationGuide.objects.create(destination=destination, language_code=language, content='Text. ' * 300)
+
+    def assertCountersMatchARecount(self):
+        kept = work_queue.counters()
+        self.assertEqual(kept, work_queue.rebuild_counters())
+        return kept
+
+    def test_single_guide_deletes(self):
+        guides = DestinationGuide.objects.filter(destination=self.destinations[0])
+        guides.get(language_code='de').delete()
+        self.assertEqual(self.assertCountersMatchARecount()[work_queue.COUNTER_WITH_GUIDES], 2)
+        for guide in list(guides):
+            guide.delete()
+        self.assertEqual(self.assertCountersMatchARecount()[work_queue.COUNTER_WITH_GUIDES], 1)
+
+    def test_bulk_delete(self):
+        DestinationGuide.objects.filter(destination=self.destinations[0]).delete()
+        counts = self.assertCountersMatchARecount()
+        self.assertEqual(counts[work_queue.COUNTER_WITH_GUIDES], 1)
+        self.assertEqual(counts[work_queue.COUNTER_GUIDES], 3)
+
+        DestinationGuide.objects.all().delete()
+        self.assertEqual(self.assertCountersMatchARecount()[work_queue.COUNTER_WITH_GUIDES], 0)
+
+    def test_cascade_delete(self):
+        self.destinations[0].delete()
+        counts = self.assertCountersMatchARecount()
+        self.assertEqual((counts[work_queue.COUNTER_DESTINATIONS], counts[work_queue.COUNTER_WITH_GUIDES]), (2, 1))
+
+        Destination.objects.all().delete()
+        self.assertEqual(self.assertCountersMatchARecount()[work_queue.COUNTER_WITH_GUIDES], 0)
@@ -0,0 +1,301 @@
+"""
+Offline IANA timezone lookup for destinations
+
+Destinations store their IANA zone (derived on save from country, region and
+coordinates using the bundled tables below), so the realtime widget computes
+local time, UTC offset and day of week in-process with zoneinfo instead of
+asking an upstream time API.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Countries that sit in a single zone (or where one zone covers the golf regions)
+COUNTRY_ZONES = {
+    'Japan': 'Asia/Tokyo',
+    'South Korea': 'Asia/Seoul',
+    'Germany': 'Europe/Berlin',
+    'Spain': 'Europe/Madrid',
+    'France': 'Europe/Paris',
+    'Italy': 'Europe/Rome',
+    'Portugal': 'Europe/Lisbon',
+    'Netherlands': 'Europe/Amsterdam',
+    'Switzerland': 'Europe/Zurich',
+    'Austria': 'Europe/Vienna',
+    'Denmark': 'Europe/Copenhagen',
+    'Sweden': 'Europe/Stockholm',
+    'Norway': 'Europe/Oslo',
+    'Belgium': 'Europe/Brussels',
+    'Greece': 'Europe/Athens',
+    'Czech Republic': 'Europe/Prague',
+    'Poland': 'Europe/Warsaw',
+    'Finland': 'Europe/Helsinki',
+    'Iceland': 'Atlantic/Reykjavik',
+    'United Kingdom': 'Europe/London',
+    'UK': 'Europe/London',
+    'England': 'Europe/London',
+    'Scotland': 'Europe/London',
+    'Wales': 'Europe/London',
+    'Northern Ireland': 'Europe/London',
+    'Ireland': 'Europe/Dublin',
+    'Turkey': 'Europe/Istanbul',
+    'Cyprus': 'Asia/Nicosia',
+    'New Zealand': 'Pacific/Auckland',
+    'Fiji': 'Pacific/Fiji',
+    'Thailand': 'Asia/Bangkok',
+    'Vietnam': 'Asia/Ho_Chi_Minh',
+    'Singapore': 'Asia/Singapore',
+    'Malaysia': 'Asia/Kuala_Lumpur',
+    'Philippines': 'Asia/Manila',
+    'China': 'Asia/Shanghai',
+    'Taiwan': 'Asia/Taipei',
+    'Hong Kong': 'Asia/Hong_Kong',
+    'India': 'Asia/Kolkata',
+    'Sri Lanka': 'Asia/Colombo',
+    'UAE': 'Asia/Dubai',
+    'United Arab Emirates': 'Asia/Dubai',
+    'Qatar': 'Asia/Qatar',
+    'Oman': 'Asia/Muscat',
+    'Bahrain': 'Asia/Bahrain',
+    'Saudi Arabia': 'Asia/Riyadh',
+    'Israel': 'Asia/Jerusalem',
+    'South Africa': 'Africa/Johannesburg',
+    'Mauritius': 'Indian/Mauritius',
+    'Morocco': 'Africa/Casablanca',
+    'Egypt': 'Africa/Cairo',
+    'Kenya': 'Africa/Nairobi',
+    'Ghana': 'Africa/Accra',
+    "Côte d'Ivoire": 'Africa/Abidjan',
+    'Argentina': 'America/Argentina/Buenos_Aires',
+    'Chile': 'America/Santiago',
+    'Colombia': 'America/Bogota',
+    'Peru': 'America/Lima',
+    'Uruguay': 'America/Montevideo',
+    'Costa Rica': 'America/Costa_Rica',
+    'Panama': 'America/Panama',
+    'Dominican Republic': 'America/Santo_Domingo',
+    'Puerto Rico': 'America/Puerto_Rico',
+    'Jamaica': 'America/Jamaica',
+    'Bahamas': 'America/Nassau',
+    'Barbados': 'America/Barbados',
+    'Bermuda': 'Atlantic/Bermuda',
+}
+
+# Region (state / province) overrides for multi-zone countries.
+# Keys are lower-cased full names and common abbreviations.
+_US_STATES = {
+    'America/New_York': [
+        ('connecticut', 'ct'), ('delaware', 'de'), ('district of columbia', 'dc'),
+        ('florida', 'fl'), ('georgia', 'ga'), ('indiana', 'in'), ('kentucky', 'ky'),
+        ('maine', 'me'), ('maryland', 'md'), ('massachusetts', 'ma'), ('michigan', 'mi'),
+        ('new hampshire', 'nh'), ('new jersey', 'nj'), ('new york', 'ny'),
+        ('north carolina', 'nc'), ('ohio', 'oh'), ('pennsylvania', 'pa'),
+        ('rhode island', 'ri'), ('south carolina', 'sc'), ('vermont', 'vt'),
+        ('virginia', 'va'), ('west virginia', 'wv'),
+    ],
+    'America/Chicago': [
+        ('alabama', 'al'), ('arkansas', 'ar'), ('illinois', 'il'), ('iowa', 'ia'),
+        ('kansas', 'ks'), ('louisiana', 'la'), ('minnesota', 'mn'), ('mississippi', 'ms'),
+        ('missouri', 'mo'), ('nebraska', 'ne'), ('north dakota', 'nd'), ('oklahoma', 'ok'),
+        ('south dakota', 'sd'), ('tennessee', 'tn'), ('texas', 'tx'), ('wisconsin', 'wi'),
+    ],
+    'America/Denver': [
+        ('colorado', 'co'), ('idaho', 'id'), ('montana', 'mt'), ('new mexico', 'nm'),
+        ('utah', 'ut'), ('wyoming', 'wy'),
+    ],
+    'America/Phoenix': [('arizona', 'az')],
+    'America/Los_Angeles': [
+        ('california', 'ca'), ('nevada', 'nv'), ('oregon', 'or'), ('washington', 'wa'),
+    ],
+    'America/Anchorage': [('alaska', 'ak')],
+    'Pacific/Honolulu': [('hawaii', 'hi')],
+}
+
+_CANADA_PROVINCES = {
+    'America/Toronto': [('ontario', 'on'), ('quebec', 'qc'), ('québec', 'qc')],
+    'America/Halifax': [
+        ('nova scotia', 'ns'), ('new brunswick', 'nb'), ('prince edward island', 'pe'),
+    ],
+    'America/St_Johns': [('newfoundland and labrador', 'nl'), ('newfoundland', 'nl')],
+    'America/Winnipeg': [('manitoba', 'mb')],
+    'America/Regina': [('saskatchewan', 'sk')],
+    'America/Edmonton': [('alberta', 'ab'), ('northwest territories', 'nt')],
+    'America/Vancouver': [('british columbia', 'bc')],
+    'America/Whitehorse': [('yukon', 'yt')],
+    'America/Iqaluit': [('nunavut', 'nu')],
+}
+
+_AUSTRALIA_STATES = {
+    'Australia/Sydney': [
+        ('new south wales', 'nsw'), ('australian capital territory', 'act'),
+    ],
+    'Australia/Melbourne': [('victoria', 'vic')],
+    'Australia/Brisbane': [('queensland', 'qld')],
+    'Australia/Adelaide': [('south australia', 'sa')],
+    'Australia/Perth': [('western australia', 'wa')],
+    'Australia/Hobart': [('tasmania', 'tas')],
+    'Australia/Darwin': [('northern territory', 'nt')],
+}
+
+_MEXICO_STATES = {
+    'America/Tijuana': [('baja california', 'bc')],
+    'America/Mazatlan': [('baja california sur', 'bcs'), ('sinaloa', 'sin'), ('nayarit', 'nay')],
+    'America/Hermosillo': [('sonora', 'son')],
+    'America/Cancun': [('quintana roo', 'q. roo'), ('quintana roo', 'qroo')],
+    'America/Chihuahua': [('chihuahua', 'chih')],
+}
+
+_BRAZIL_STATES = {
+    'America/Manaus': [('amazonas', 'am')],
+    'America/Cuiaba': [('mato grosso', 'mt')],
+    'America/Campo_Grande': [('mato grosso do sul', 'ms')],
+    'America/Fortaleza': [('ceará', 'ce'), ('ceara', 'ce'), ('rio grande do norte', 'rn')],
+    'America/Recife': [('pernambuco', 'pe')],
+    'America/Bahia': [('bahia', 'ba')],
+}
+
+
+def _expand(zones):
+    table = {}
+    for zone, names in zones.items():
+        for full, abbr in names:
+            table[full] = zone
+            table[abbr] = zone
+    return table
+
+
+REGION_ZONES = {
+    'United States': _expand(_US_STATES),
+    'Canada': _expand(_CANADA_PROVINCES),
+    'Australia': _expand(_AUSTRALIA_STATES),
+    'Mexico': _expand(_MEXICO_STATES),
+    'Brazil': _expand(_BRAZIL_STATES),
+}
+REGION_ZONES['USA'] = REGION_ZONES['US'] = REGION_ZONES['United States']
+
+# Abbreviation -> full name, so split-state checks work for either spelling
+_US_STATE_NAMES = {abbr: full for names in _US_STATES.values() for full, abbr in names}
+
+# States split between two zones: (boundary longitude, zone west of it, zone east of it)
+SPLIT_REGIONS = {
+    ('United States', 'florida'): (-85.0, 'America/Chicago', 'America/New_York'),
+    ('United States', 'tennessee'): (-85.6, 'America/Chicago', 'America/New_York'),
+    ('United States', 'kentucky'): (-86.0, 'America/Chicago', 'America/New_York'),
+    ('United States', 'indiana'): (-87.0, 'America/Chicago', 'America/Indiana/Indianapolis'),
+    ('United States', 'texas'): (-104.9, 'America/Denver', 'America/Chicago'),
+    ('United States', 'idaho'): (-115.5, 'America/Los_Angeles', 'America/Boise'),
+    ('United States', 'michigan'): (-87.5, 'America/Menominee', 'America/Detroit'),
+}
+
+# Default zone for multi-zone countries before coordinates are consulted
+COUNTRY_DEFAULT_ZONES = {
+    'United States': 'America/New_York',
+    'Canada': 'America/Toronto',
+    'Australia': 'Australia/Sydney',
+    'Mexico': 'America/Mexico_City',
+    'Brazil': 'America/Sao_Paulo',
+    'Indonesia': 'Asia/Jakarta',
+    'Russia': 'Europe/Moscow',
+}
+
+
+def _zone_from_coordinates(country, latitude, longitude):
+    """Coarse longitude bands for multi-zone countries when the region is unknown"""
+    if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+        return None
+    if country in ('United States', 'USA', 'US'):
+        if longitude < -154 and latitude < 23:
+            return 'Pacific/Honolulu'
+        if latitude > 51 and longitude < -130:
+            return 'America/Anchorage'
+        if longitude >= -87:
+            return 'America/New_York'
+        if longitude >= -101:
+            return 'America/Chicago'
+        if longitude >= -114.5:
+            return 'America/Denver'
+        return 'America/Los_Angeles'
+    if country == 'Canada':
+        if longitude > -59.5 and latitude > 46:
+            return 'America/St_Johns'
+        if longitude > -67:
+            return 'America/Halifax'
+        if longitude > -90:
+            return 'America/Toronto'
+        if longitude > -102:
+            return 'America/Winnipeg'
+        if longitude > -120:
+            return 'America/Edmonton'
+        return 'America/Vancouver'
+    if country == 'Australia':
+        if latitude < -39.5:
+            return 'Australia/Hobart'
+        if longitude < 129:
+            return 'Australia/Perth'
+        if longitude < 141:
+            return 'Australia/Darwin' if latitude > -26 else 'Australia/Adelaide'
+        if latitude > -29:
+            return 'Australia/Brisbane'
+        return 'Australia/Melbourne' if latitude < -34 and longitude < 150 else 'Australia/Sydney'
+    if country == 'Indonesia':
+        if longitude > 126:
+            return 'Asia/Jayapura'
+        if longitude > 114.5:
+            return 'Asia/Makassar'
+        return 'Asia/Jakarta'
+    return None
+
+
+def guess_timezone(country, region_or_state='', latitude=None, longitude=None):
+    """
+    Best-effort IANA zone for a destination from bundled tables.
+    Order: split-state boundary, region table, single-zone country,
+    coordinate bands, country default, then UTC.
+    """
+    country = (country or '').strip()
+    region = (region_or_state or '').strip().lower()
+
+    if country in ('United States', 'USA', 'US'):
+        split = SPLIT_REGIONS.get(('United States', _US_STATE_NAMES.get(region, region)))
+    else:
+        split = SPLIT_REGIONS.get((country, region))
+    if split and longitude is not None:
+        boundary, west, east = split
+        return west if longitude < boundary else east
+
+    region_zone = REGION_ZONES.get(country, {}).get(region)
+    if region_zone:
+        return region_zone
+
+    if country in COUNTRY_ZONES:
+        return COUNTRY_ZONES[country]
+
+    return (
+        _zone_from_coordinates(country, latitude, longitude)
+        or COUNTRY_DEFAULT_ZONES.get(country)
+        or 'UTC'
+    )
+
+
+def local_time_data(zone_name):
+    """
+    Current local time for an IANA zone, computed in-process.
+    Returns the same keys the realtime widget used to get from worldtimeapi.
+    """
+    try:
+        zone = ZoneInfo(zone_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        zone_name, zone = 'UTC', ZoneInfo('UTC')
+
+    now = datetime.now(dt_timezone.utc).astimezone(zone)
+    offset = now.strftime('%z')
+    return {
+        'timezone': zone_name or 'UTC',
+        'local_time': now.strftime('%H:%M:%S'),
+        'local_date': now.strftime('%Y-%m-%d'),
+        'utc_offset': f"{offset[:3]}:{offset[3:]}",
+        # worldtimeapi convention: Sunday = 0
+        'day_of_week': now.isoweekday() % 7,
+        'abbreviation': now.tzname(),
+        'updated_at': now.isoformat(),
+    }
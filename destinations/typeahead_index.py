@@ -0,0 +1,353 @@
+"""
+In-process search index for the typeahead API
+
+Destinations with at least one guide are indexed by the accent-folded words
+of their name, city, region and country. A sorted token list answers prefix
+lookups with a binary search, and a trigram -> tokens map answers infix
+lookups ("andrew" in "St Andrews") without scanning. Matches are ranked by
+quality: exact word before prefix before infix, name before city before
+region/country, ties broken by name.
+
+Each query term's postings are merged in rank order and the terms' streams
+are walked together until no entry further along can still make the top
+results, so a query scores a few dozen entries even when every term is
+common.
+
+The index is built on first use in each process and kept current by the
+save/delete receivers in models.py. A version key in the cache tells other
+processes that the catalog changed so they rebuild their copy.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Destination
+
+FIELDS = ('name', 'city', 'region_or_state', 'country')
+# Lower is better; a query term scores its best match kind + field
+FIELD_COST = (0, 2, 3, 3)
+EXACT, PREFIX, INFIX = 0, 1, 4
+# Whole query matching the start of the name beats any per-term match
+NAME_PREFIX_BONUS = -2
+NAME_EXACT_BONUS = -3
+# Infix (n-gram) matching only kicks in for terms this long
+MIN_INFIX_LENGTH = 3
+# Upper bound on entries scored per query, a latency guard; past it the
+# ranking becomes approximate
+MAX_CANDIDATES = 200
+RESULT_CACHE_SIZE = 1024
+VERSION_KEY = 'typeahead_index_version'
+VERSION_TIMEOUT = 7 * 86400
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+Entry = namedtuple('Entry', 'id name city region_or_state country url folded_name tokens')
+
+
+def fold(text):
+    """Lowercase, strip accents and collapse punctuation to single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class TypeaheadIndex:
+    """Token/trigram index over a set of destination rows"""
+
+    def __init__(self, rows=()):
+        self._lock = threading.RLock()
+        self._entries = {}
+        # token -> [(field cost, folded name, destination id)], kept sorted so
+        # each token's matches come out already in rank order
+        self._postings = {}
+        self._tokens = []
+        # trigram -> set of tokens containing it
+        self._grams = {}
+        # [(folded name, destination id)], sorted, for whole-query name prefixes
+        self._names = []
+        self._results = OrderedDict()
+        for row in rows:
+            self._add(row, bulk=True)
+        self._tokens.sort()
+        self._names.sort()
+        for posting in self._postings.values():
+            posting.sort()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(row):
+        tokens = {}
+        for field_cost, field in zip(FIELD_COST, FIELDS):
+            for token in fold(row[field]).split():
+                if field_cost < tokens.get(token, field_cost + 1):
+                    tokens[token] = field_cost
+        return Entry(
+            row['id'], row['name'], row['city'], row['region_or_state'], row['country'],
+            row['url'], fold(row['name']), tokens
+        )
+
+    def _add(self, row, bulk=False):
+        entry = self._entry(row)
+        self._entries[entry.id] = entry
+        add = list.append if bulk else insort
+        add(self._names, (entry.folded_name, entry.id))
+        for token, field_cost in entry.tokens.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = []
+                add(self._tokens, token)
+                for gram in _trigrams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            add(posting, (field_cost, entry.folded_name, entry.id))
+
+    def _remove(self, destination_id):
+        entry = self._entries.pop(destination_id, None)
+        if entry is None:
+            return
+        del self._names[bisect_left(self._names, (entry.folded_name, entry.id))]
+        for token, field_cost in entry.tokens.items():
+            posting = self._postings[token]
+            del posting[bisect_left(posting, (field_cost, entry.folded_name, entry.id))]
+            if posting:
+                continue
+            del self._postings[token]
+            del self._tokens[bisect_left(self._tokens, token)]
+            for gram in _trigrams(token):
+                tokens = self._grams[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self._grams[gram]
+
+    def upsert(self, row):
+        """Add or replace one destination row; returns False if it was already current"""
+        with self._lock:
+            if self._entries.get(row['id']) == self._entry(row):
+                return False
+            self._remove(row['id'])
+            self._add(row)
+            self._results.clear()
+            return True
+
+    def remove(self, destination_id):
+        """Drop one destination; returns False if it was not indexed"""
+        with self._lock:
+            if destination_id not in self._entries:
+                return False
+            self._remove(destination_id)
+            self._results.clear()
+            return True
+
+    def _matching_tokens(self, term):
+        """(token, match cost) for every indexed token the term matches"""
+        tokens = self._tokens
+        i = bisect_left(tokens, term)
+        while i < len(tokens) and tokens[i].startswith(term):
+            yield tokens[i], EXACT if tokens[i] == term else PREFIX
+            i += 1
+
+        if len(term) >= MIN_INFIX_LENGTH:
+            grams = sorted((self._grams.get(gram, ()) for gram in _trigrams(term)), key=len)
+            for token in set(grams[0]).intersection(*grams[1:]):
+                if term in token and not token.startswith(term):
+                    yield token, INFIX
+
+    @staticmethod
+    def _term_score(entry, matches):
+        """Best score against an entry of one term, given as its {token: match cost}, or None"""
+        tokens = entry.tokens
+        best = None
+        if len(matches) < len(tokens):
+            for token, match_cost in matches.items():
+                field_cost = tokens.get(token)
+                if field_cost is not None and (best is None or match_cost + field_cost < best):
+                    best = match_cost + field_cost
+        else:
+            for token, field_cost in tokens.items():
+                match_cost = matches.get(token)
+                if match_cost is not None and (best is None or match_cost + field_cost < best):
+                    best = match_cost + field_cost
+        return best
+
+    def _score(self, entry, term_matches, folded, total=0):
+        for matches in term_matches:
+            score = self._term_score(entry, matches)
+            if score is None:
+                return None
+            total += score
+        if entry.folded_name.startswith(folded):
+            total += NAME_EXACT_BONUS if entry.folded_name == folded else NAME_PREFIX_BONUS
+        return total
+
+    def _scored_postings(self, token, match_cost):
+        for field_cost, name, destination_id in self._postings[token]:
+            yield match_cost + field_cost, name, destination_id
+
+    def _stream(self, matches):
+        """(score, folded name, id) for every entry a term matches, best first"""
+        return heapq.merge(*(self._scored_postings(token, match_cost) for token, match_cost in matches.items()))
+
+    def search(self, query, limit=10, cached=True):
+        """Best matching entries for a query; every query word must match"""
+        folded = fold(query)
+        terms = sorted(set(folded.split()))
+        if not terms:
+            return []
+        key = (folded, limit)
+
+        with self._lock:
+            hit = self._results.get(key) if cached else None
+            if hit is not None:
+                self._results.move_to_end(key)
+                return hit
+
+            # Per term, {token: match cost} for every indexed token it matches
+            matches = [dict(self._matching_tokens(term)) for term in terms]
+            if not all(matches):
+                return self._remember(key, [])
+            top = []  # sorted (score, folded name, id), at most `limit` long
+            seen = set()
+
+            def offer(destination_id, term_matches, total=0):
+                seen.add(destination_id)
+                entry = self._entries[destination_id]
+                score = self._score(entry, term_matches, folded, total)
+                if score is not None:
+                    insort(top, (score, entry.folded_name, entry.id))
+                    del top[limit:]
+
+            def beaten(score, name):
+                """Whether nothing scoring at least `score` (ties by name) can enter the top"""
+                return len(top) == limit and (score, name) > top[-1][:2]
+
+            # Lowest score any entry can get: each term's best match kind plus
+            # the best field cost among the tokens it matches
+            floor = sum(
+                min(match_cost + self._postings[token][0][0] for token, match_cost in term_matches.items())
+                for term_matches in matches
+            )
+
+            # Names starting with the whole query get the bonus, so they come
+            # first. For one term the name order is also the score order;
+            # otherwise they are walked until even the best score still
+            # possible can't beat the current last place
+            names = self._names
+            i = bisect_left(names, (folded,))
+            examined = 0
+            while i < len(names) and names[i][0].startswith(folded) and examined < MAX_CANDIDATES:
+                name, destination_id = names[i]
+                if len(terms) == 1 and len(top) == limit:
+                    break
+                if beaten(floor + (NAME_EXACT_BONUS if name == folded else NAME_PREFIX_BONUS), name):
+                    break
+                offer(destination_id, matches)
+                i += 1
+                examined += 1
+            # Names the walk was capped before may still earn the bonus below
+            bonus = NAME_PREFIX_BONUS if examined == MAX_CANDIDATES else 0
+
+            # Each term's postings are merged into one stream in rank order and
+            # the streams are advanced in turn: an entry none of them has
+            # reached yet scores at least the sum of their current positions,
+            # so the walk stops once that can't beat the current last place
+            streams = [self._stream(term_matches) for term_matches in matches]
+            # Scoring an entry met in one stream only needs the other terms
+            others = [matches[:k] + matches[k + 1:] for k in range(len(matches))]
+            heads = [next(stream) for stream in streams]
+            turn = 0
+            # Once any stream runs out, every entry matching all terms was in it
+            while None not in heads:
+                if beaten(sum([head[0] for head in heads]) + bonus, max([head[1] for head in heads])):
+                    break
+                k = turn % len(streams)
+                turn += 1
+                base, _, destination_id = heads[k]
+                heads[k] = next(streams[k], None)
+                if destination_id in seen:
+                    continue
+                examined += 1
+                if examined > MAX_CANDIDATES:
+                    break
+                # A stream meets each entry first at that term's best score
+                offer(destination_id, others[k], base)
+
+            return self._remember(key, [self._entries[destination_id] for _, _, destination_id in top])
+
+    def _remember(self, key, results):
+        self._results[key] = results
+        if len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return results
+
+
+def _destination_rows(queryset):
+    for row in queryset.values('id', *FIELDS):
+        # Model instance (not saved) only to reuse slug/URL generation
+        row['url'] = Destination(**row).get_absolute_url()
+        yield row
+
+
+def _indexed_destinations():
+    return Destination.objects.filter(guides__isnull=False).order_by().distinct()
+
+
+def build_index():
+    """Build an index over every destination that has a guide"""
+    return TypeaheadIndex(_destination_rows(_indexed_destinations()))
+
+
+_index = None
+_index_version = None
+_build_lock = threading.Lock()
+
+
+def get_index():
+    """This process's index; rebuilt when another process has changed the catalog"""
+    global _index, _index_version
+    version = cache.get(VERSION_KEY)
+    if _index is not None and version == _index_version:
+        return _index
+    with _build_lock:
+        if _index is None or version != _index_version:
+            _index = build_index()
+            _index_version = version
+    return _index
+
+
+def _publish_change():
+    """Bump the shared version; this process's index already has the change"""
+    global _index_version
+    version = time.time()
+    cache.set(VERSION_KEY, version, VERSION_TIMEOUT)
+    if _index is not None:
+        _index_version = version
+
+
+def refresh_destination(destination_id):
+    """Re-index (or drop) one destination once the current transaction commits"""
+
+    def apply():
+        rows = list(_destination_rows(_indexed_destinations().filter(pk=destination_id)))
+        if _index is None:
+            changed = True  # Can't tell here; let other processes rebuild
+        elif rows:
+            changed = _index.upsert(rows[0])
+        else:
+            changed = _index.remove(destination_id)
+        if changed:
+            _publish_change()
+
+    transaction.on_commit(apply)
@@ -0,0 +1,256 @@
+"""
+URL registry for golf guide and city guide detail pages
+
+Every public detail URL is stored as a PageRoute row keyed by
+(kind, language_code, slug) and by its full path, so views resolve a request
+with one indexed lookup no matter how many destinations exist.
+Rows are kept in sync by the post_save receivers in models.py and removed by
+cascade when the destination or guide is deleted.
+
+When two destinations produce the same slug, the one with the lowest pk owns
+the URL, whichever was saved last, so incremental updates and
+rebuild_registry() always agree on which page a URL serves. When the owner's
+route goes away (it is deleted or its slug changes), the next-lowest pk
+still producing the slug is registered in its place once the change commits.
+"""
+
+import threading
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils.text import slugify
+
+from .models import Destination, DestinationGuide, CityGuide, PageRoute
+
+_local = threading.local()
+
+
+def golf_guide_path(language, slug):
+    """Public path for a golf guide slug"""
+    if language == 'en':
+        return reverse('destinations:destination_detail', kwargs={'slug': slug})
+    return reverse('destinations:destination_detail_lang', kwargs={
+        'language': language,
+        'slug': slug
+    })
+
+
+def city_guide_path(language, slug):
+    """Public path for a city guide slug"""
+    if language == 'en':
+        return reverse('destinations:city_guide_detail', kwargs={'slug': slug})
+    return reverse('destinations:city_guide_detail_lang', kwargs={
+        'language': language,
+        'slug': slug
+    })
+
+
+def _save_route(kind, language, slug, destination, is_canonical=True,
+                destination_guide=None, city_guide=None):
+    if not slug:
+        return None
+    owner = (
+        PageRoute.objects.filter(kind=kind, language_code=language, slug=slug)
+        .values_list('destination_id', flat=True).first()
+    )
+    if owner is not None and owner < destination.pk:
+        return None
+    path = golf_guide_path(language, slug) if kind == PageRoute.KIND_GOLF_GUIDE else city_guide_path(language, slug)
+    route, _ = PageRoute.objects.update_or_create(
+        kind=kind,
+        language_code=language,
+        slug=slug,
+        defaults={
+            'path': path,
+            'destination': destination,
+            'destination_guide': destination_guide,
+            'city_guide': city_guide,
+            'is_canonical': is_canonical,
+        }
+    )
+    return route
+
+
+def register_destination_guide(guide):
+    """
+    Register both URLs a golf guide is reachable at:
+    the canonical destination slug (golf-course-...) used by links across the
+    site, and the guide's own stored slug (golf-guide-...) as an alias.
+    """
+    destination = guide.destination
+    language = guide.language_code
+    with transaction.atomic():
+        # Drop aliases left behind by an earlier slug for this guide
+        PageRoute.objects.filter(destination_guide=guide).exclude(
+            slug__in=[destination.generate_slug(language), guide.slug]
+        ).delete()
+        _save_route(
+            PageRoute.KIND_GOLF_GUIDE, language, destination.generate_slug(language),
+            destination, destination_guide=guide
+        )
+        if guide.slug and guide.slug != destination.generate_slug(language):
+            _save_route(
+                PageRoute.KIND_GOLF_GUIDE, language, guide.slug,
+                destination, is_canonical=False, destination_guide=guide
+            )
+
+
+def register_city_guide(city_guide):
+    """Register a published city guide, or withdraw its route if unpublished"""
+    with transaction.atomic():
+        PageRoute.objects.filter(city_guide=city_guide).exclude(slug=city_guide.slug).delete()
+        if not city_guide.is_published:
+            PageRoute.objects.filter(city_guide=city_guide).delete()
+            return
+        _save_route(
+            PageRoute.KIND_CITY_GUIDE, city_guide.language_code, city_guide.slug,
+            city_guide.destination, city_guide=city_guide
+        )
+
+
+def register_destination(destination):
+    """Rebuild every route belonging to a destination (its slugs may have changed)"""
+    with transaction.atomic():
+        for guide in destination.guides.all():
+            guide.destination = destination
+            register_destination_guide(guide)
+        for city_guide in destination.city_guides.all():
+            city_guide.destination = destination
+            register_city_guide(city_guide)
+
+
+def rebuild_registry():
+    """Rebuild the whole registry from scratch; returns the number of routes"""
+    with transaction.atomic():
+        # Every slug is registered again below, lowest pk first
+        _local.rebuilding = True
+        try:
+            PageRoute.objects.all().delete()
+        finally:
+            _local.rebuilding = False
+        for guide in DestinationGuide.objects.select_related('destination').order_by('destination_id', 'pk'):
+            register_destination_guide(guide)
+        for city_guide in CityGuide.objects.select_related('destination').order_by('destination_id', 'pk'):
+            register_city_guide(city_guide)
+    return PageRoute.objects.count()
+
+
+def _golf_guide_claimant(language, slug):
+    """The lowest-pk destination's guide whose canonical or alias slug is `slug`, or None"""
+    claimants = list(
+        DestinationGuide.objects.select_related('destination')
+        .filter(language_code=language, slug=slug).order_by('destination_id')[:1]
+    )
+    # Canonical slugs end in the country; only destinations in a matching
+    # country can produce one
+    countries = [
+        country for country in Destination.objects.order_by().values_list('country', flat=True).distinct()
+        if slug.endswith(slugify(country.replace(' ', '-').lower()))
+    ]
+    if countries:
+        claimants += [
+            guide for guide in DestinationGuide.objects.select_related('destination')
+            .filter(language_code=language, destination__country__in=countries)
+            if guide.destination.generate_slug(language) == slug
+        ]
+    return min(claimants, key=lambda guide: guide.destination_id, default=None)
+
+
+def _register_claimant(kind, language, slug):
+    if kind == PageRoute.KIND_GOLF_GUIDE:
+        guide = _golf_guide_claimant(language, slug)
+        if guide is not None:
+            register_destination_guide(guide)
+        return
+    city_guide = (
+        CityGuide.objects.select_related('destination')
+        .filter(language_code=language, slug=slug, is_published=True)
+        .order_by('destination_id').first()
+    )
+    if city_guide is not None:
+        register_city_guide(city_guide)
+
+
+def route_removed(route):
+    """A route was deleted: once that commits, hand its slug to the next destination producing it"""
+    if getattr(_local, 'rebuilding', False):
+        return
+    kind, language, slug = route.kind, route.language_code, route.slug
+    transaction.on_commit(lambda: _register_claimant(kind, language, slug))
+
+
+def resolve_golf_guide(language, slug):
+    """
+    Return (destination, guide) for a golf guide URL, or (None, None).
+    Non-English URLs without a guide in that language fall back to the
+    English guide, matching the behaviour of the original slug scan.
+    """
+    route = (
+        PageRoute.objects.select_related('destination', 'destination_guide')
+        .filter(kind=PageRoute.KIND_GOLF_GUIDE, language_code=language, slug=slug)
+        .first()
+    )
+    if route:
+        return route.destination, route.destination_guide
+
+    prefix = f'{language}-'
+    if language != 'en' and slug.startswith(prefix):
+        route = (
+            PageRoute.objects.select_related('destination', 'destination_guide')
+            .filter(kind=PageRoute.KIND_GOLF_GUIDE, language_code='en', slug=slug[len(prefix):])
+            .first()
+        )
+        if route:
+            return route.destination, route.destination_guide
+
+    return None, None
+
+
+def resolve_city_guide(language, slug):
+    """Return the published CityGuide for a city guide URL, or None"""
+    route = (
+        PageRoute.objects.select_related('city_guide__destination')
+        .filter(kind=PageRoute.KIND_CITY_GUIDE, language_code=language, slug=slug)
+        .first()
+    )
+    return route.city_guide if route else None
+
+
+def find_golf_guide_path(language, slug):
+    """Return the registered path for a golf guide (language, slug) pair, or None"""
+    return (
+        PageRoute.objects.filter(kind=PageRoute.KIND_GOLF_GUIDE, language_code=language, slug=slug)
+        .values_list('path', flat=True)
+        .first()
+    )
+
+
+def _route_validators(kind, language, slug):
+    return (
+        PageRoute.objects.filter(kind=kind, language_code=language, slug=slug)
+        .values(
+            'destination_id', 'destination__country',
+            'destination_guide__updated_at', 'city_guide__updated_at',
+        )
+        .first()
+    )
+
+
+def route_validators(kind, language, slug):
+    """
+    What a detail page's HTTP validators are built from, in one indexed lookup
+    without loading the guide: {'destination_id', 'country', 'updated_at'}
+    (the guide's), or None.
+    Follows the same English fallback as resolve_golf_guide.
+    """
+    row = _route_validators(kind, language, slug)
+    prefix = f'{language}-'
+    if row is None and kind == PageRoute.KIND_GOLF_GUIDE and language != 'en' and slug.startswith(prefix):
+        row = _route_validators(kind, 'en', slug[len(prefix):])
+    if row is None:
+        return None
+    return {
+        'destination_id': row['destination_id'],
+        'country': row['destination__country'],
+        'updated_at': row['destination_guide__updated_at'] or row['city_guide__updated_at'],
+    }
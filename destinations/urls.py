@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .content_api import FetchWorkView, SubmitWorkView, work_status, typeahead_search
+from .content_api import FetchWorkView, SubmitWorkView, work_heartbeat, work_source, work_status, typeahead_search, guide_search
 
 app_name = 'destinations'
 
@@ -11,9 +11,14 @@ urlpatterns = [
 
     # Content Generation API Endpoints (before catch-all patterns)
     path('api/fetch-work/', FetchWorkView.as_view(), name='fetch_work'),
+    path('api/work-heartbeat/', work_heartbeat, name='work_heartbeat'),
+    path('api/work-source/<int:destination_id>/<str:language>/', work_source, name='work_source'),
     path('api/submit-work/', SubmitWorkView.as_view(), name='submit_work'),
     path('api/work-status/', work_status, name='work_status'),
     path('api/typeahead-search/', typeahead_search, name='typeahead_search'),
+    path('api/search/', guide_search, name='guide_search'),
+    path('api/home-catalog/<str:language>/<str:version>.json', views.home_catalog, name='home_catalog'),
+    path('api/realtime/<int:destination_id>/', views.realtime_widget, name='realtime_widget'),
 
     # English (default) routes
     path('', views.home, name='home'),
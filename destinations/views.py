@@ -1,50 +1,16 @@
-from django.http import JsonResponse
 from .models import Destination, DestinationGuide
+from .exports import stream_export
+from . import cache_tags
 
-# API endpoint to export all Destinations as JSON
+# API endpoint to export all Destinations (streamed; see exports.py for options)
 def export_destinations(request):
-    data = list(Destination.objects.all().values())
-    return JsonResponse(data, safe=False)
+    return stream_export(request, Destination.objects.all())
 
-# API endpoint to export all DestinationGuides as JSON
+# API endpoint to export all DestinationGuides (streamed; e.g. ?format=ndjson&omit=content)
 def export_destination_guides(request):
-    data = list(DestinationGuide.objects.all().values())
-    return JsonResponse(data, safe=False)
+    return stream_export(request, DestinationGuide.objects.all())
 from django.http import HttpResponse
 from django.views.decorators.http import require_GET
-# Dynamic sitemap.xml endpoint
-@require_GET
-def dynamic_sitemap_xml(request):
-    """Dynamically generate sitemap.xml for search engines."""
-    from .models import Destination
-    import xml.etree.ElementTree as ET
-    urlset = ET.Element('urlset', xmlns="http://www.sitemaps.org/schemas/sitemap/0.9")
-
-    # Homepage
-    url = ET.SubElement(urlset, 'url')
-    ET.SubElement(url, 'loc').text = 'https://tcgplex.com/'
-    ET.SubElement(url, 'changefreq').text = 'daily'
-    ET.SubElement(url, 'priority').text = '1.0'
-
-    for destination in Destination.objects.all():
-        lang_set = set()
-        if destination.article_content_multilang:
-            lang_set.update(destination.article_content_multilang.keys())
-        if not lang_set:
-            lang_set = {'en'} if destination.article_content else set()
-        for lang in lang_set:
-            slug = destination.generate_slug(language=lang)
-            if lang == 'en':
-                loc = f'https://tcgplex.com/golf-courses/{slug}/'
-            else:
-                loc = f'https://tcgplex.com/{lang}/golf-courses/{slug}/'
-            url = ET.SubElement(urlset, 'url')
-            ET.SubElement(url, 'loc').text = loc
-            ET.SubElement(url, 'changefreq').text = 'weekly'
-            ET.SubElement(url, 'priority').text = '0.8'
-
-    xml_str = ET.tostring(urlset, encoding='utf-8', method='xml')
-    return HttpResponse(xml_str, content_type='application/xml')
 from django.shortcuts import redirect
 import re
 # Redirect old /destination/{lang}-{slug} to new /destination/{lang}/{slug}
@@ -54,213 +20,113 @@ def redirect_old_destination_url(request, lang_slug):
     if match:
         lang = match.group('lang')
         slug = match.group('slug')
-        return redirect(f'/{lang}/golf-courses/{slug}/', permanent=True)
+        # Old URLs dropped the language prefix from the slug; try both forms
+        for candidate in (slug, f'{lang}-{slug}'):
+            path = find_golf_guide_path(lang, candidate)
+            if path:
+                return redirect(path, permanent=True)
+    path = find_golf_guide_path('en', lang_slug)
+    if path:
+        return redirect(path, permanent=True)
     # If not matching, 404
     raise Http404('Invalid destination URL')
 from django.shortcuts import render, get_object_or_404
-from django.db import models
 from django.db.models import Count
-from .models import Destination, DestinationGuide
+from .models import Destination, DestinationGuide, PageRoute
 from django.utils.text import slugify
 from django.http import Http404
 from django.utils.translation import activate, get_language
 from .realtime_service import RealTimeDestinationData
-from django.views.decorators.cache import cache_page
+from .page_cache import full_page_cache, destination_page_tags
+from .http_caching import conditional_page
+from .url_registry import resolve_golf_guide, resolve_city_guide, find_golf_guide_path
+from .recommendations import get_related_destinations
+from .home_snapshot import HOME_LANGUAGES, get_home_snapshot, search_cards
+from .guide_search import search as search_guides, KIND_GOLF_GUIDE
 from django.views.decorators.vary import vary_on_headers
-import markdown as md
 import re
 
-# Helper to improve content formatting while preserving structure
-def improve_content_formatting(text):
-    """
-    Improve content formatting while preserving the existing structure.
-    Handles bold headers, bullet points, and markdown tables properly.
-    """
-    if not text:
-        return ""
-    
-    # Remove template instructions and clean up markers
-    text = re.sub(r'---.*\(Continue with.*\).*---', '', text, flags=re.DOTALL)
-    text = re.sub(r'\n*---.*---\n*', '\n\n', text)
-    text = re.sub(r'\*\*\s*$', '', text)
-    text = re.sub(r'\n\s*\*\*\s*\n', '\n\n', text)
-    
-    # Fix markdown table formatting
-    lines = text.split('\n')
-    result = []
-    table_started = False
-    needs_header = False
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
-        # Skip empty lines and lines with just pipes
-        if not line or line.strip('| ') == '':
-            if not table_started:
-                result.append('')
-            continue
-        
-        # Check for table content
-        if '|' in line:
-            cells = [cell.strip() for cell in line.split('|')]
-            if len(cells) < 3:  # Need at least one real column
-                continue
-                
-            # Clean and standardize the row
-            cleaned_row = '|' + '|'.join(f' {cell.strip()} ' for cell in cells[1:-1]) + '|'
-            
-            # Handle start of table
-            if not table_started:
-                table_started = True
-                if 'Month' in line or 'Month'.upper() in line or any(c.isupper() for c in line):
-                    # This is a header row
-                    result.append(cleaned_row)
-                    # Add separator row
-                    cols = len(cells) - 2  # subtract first/last empty cells
-                    result.append('|' + '|'.join([' --- ' for _ in range(cols)]) + '|')
-                else:
-                    # Missing header - add it based on context
-                    if "Month" in text[:1000]:  # Check if this is a monthly table
-                        result.append('| Month | Avg. High (°C) | Avg. Low (°C) | Rainfall (mm) | Playing Conditions |')
-                        result.append('| --- | --- | --- | --- | --- |')
-                    needs_header = True
-                continue
-            
-            # Skip separator rows if we already added one
-            if '---' in line:
-                continue
-                
-            # Add content row
-            result.append(cleaned_row)
-            continue
-        
-        # Not a table row
-        if table_started:
-            table_started = False
-            result.append('')  # Add space after table
-        
-        # Handle regular content
-        if line.startswith('#'):
-            result.append(line)
-        elif re.match(r'^\*\*(\d+\.\s*.+?)\*\*$', line):
-            header_text = re.match(r'^\*\*(\d+\.\s*.+?)\*\*$', line).group(1).strip()
-            result.append(f"### {header_text}")
-        elif line not in ['**', '***', '____', '---']:
-            result.append(line)
-    
-    # Join and clean up
-    content = '\n'.join(result)
-    content = re.sub(r'\n{3,}', '\n\n', content)  # Remove excessive blank lines
-    
-    # If content appears truncated, append a note
-    if re.search(r'\*\*\s*$', content):
-        content += "\n\n---\n\n**Note:** This guide appears to be incomplete. Please check back later for the full content."
-    
-    return content
-
 # Home view with search
-@cache_page(60 * 15)  # Cache for 15 minutes
+GUIDE_TEXT_RESULTS = 24
+
 @vary_on_headers('Accept-Language')  # Vary cache by language headers
 def home(request, language='en'):
     """Modern home page with geolocation-based recommendations"""
+    if language not in HOME_LANGUAGES:
+        raise Http404('Unsupported language')
+    
     # Activate the requested language
     if language != 'en':
         activate(language)
     
     q = request.GET.get('q', '')
     
-    # Get all destinations with guides for the current language
-    destinations = Destination.objects.all().order_by('name')
+    # Materialized per-language snapshot: no database access on the hot path
+    snapshot = get_home_snapshot(language)
+    destinations = search_cards(snapshot, q) if q else snapshot['cards']
     
     if q:
-        destinations = destinations.filter(
-            models.Q(name__icontains=q) |
-            models.Q(city__icontains=q) |
-            models.Q(region_or_state__icontains=q) |
-            models.Q(country__icontains=q)
-        )
-    
-    # Filter destinations that have content in the requested language
-    if language != 'en':
-        destinations = destinations.filter(guides__language_code=language).distinct()
-    else:
-        # For English, show all destinations with any guides
-        destinations = destinations.filter(guides__isnull=False).distinct()
-    
-    # Attach slug for each destination for SEO URLs
-    for d in destinations:
-        d.slug = d.generate_slug(language)
-    
-    # Prepare a serializable list for the map and geolocation features
-    destinations_json = [
-        {
-            'id': d.id,
-            'name': d.name,
-            'city': d.city,
-            'region_or_state': d.region_or_state,
-            'country': d.country,
-            'slug': d.slug,
-            'latitude': float(d.latitude) if d.latitude else None,
-            'longitude': float(d.longitude) if d.longitude else None,
-            'absolute_url': d.get_absolute_url(language),
-        } for d in destinations if d.latitude and d.longitude
-    ]
-    
-    # Get stats for the hero section
-    total_destinations = destinations.count()
-    total_countries = destinations.values('country').distinct().count()
-    available_languages = list(DestinationGuide.objects.values_list('language_code', flat=True).distinct())
-    
-    # Featured destinations (top 6 for grid display)
-    featured_destinations = destinations[:6]
+        # Then destinations whose guide text matches (full-text index), with a snippet
+        matched = {card['id'] for card in destinations}
+        cards_by_id = {card['id']: card for card in snapshot['cards']}
+        for hit in search_guides(q, language, kind=KIND_GOLF_GUIDE, limit=GUIDE_TEXT_RESULTS):
+            card = cards_by_id.get(hit.destination_id)
+            if card and hit.destination_id not in matched:
+                matched.add(hit.destination_id)
+                destinations.append(dict(card, snippet=hit.snippet))
     
     return render(request, 'destinations/home.html', {
         'destinations': destinations,
-        'destinations_json': destinations_json,
-        'featured_destinations': featured_destinations,
-        'total_destinations': total_destinations,
-        'total_countries': total_countries,
-        'total_languages': len(available_languages),
+        'catalog_hash': snapshot['catalog_hash'],
+        'featured_destinations': snapshot['featured'],
+        'total_destinations': snapshot['total_destinations'],
+        'total_countries': snapshot['total_countries'],
+        'total_languages': len(snapshot['available_languages']),
         'current_language': language,
-        'available_languages': available_languages,
+        'available_languages': snapshot['available_languages'],
     })
 
-# Detail view with SEO-friendly slug
+# Immutable, content-addressed catalog for the home page map and typeahead
+CATALOG_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
+@require_GET
+def home_catalog(request, language, version):
+    """Columnar destination catalog for one language, addressed by content hash"""
+    if language not in HOME_LANGUAGES:
+        raise Http404('Unsupported language')
+    snapshot = get_home_snapshot(language)
+    current = snapshot['catalog_hash']
+    
+    if version != current:
+        # Stale hash (page rendered before a rebuild): point at the current document
+        response = redirect('destinations:home_catalog', language=language, version=current)
+        response['Cache-Control'] = 'no-cache'
+        return response
+    
+    etag = f'"{current}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(snapshot['catalog'], content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = CATALOG_CACHE_CONTROL
+    return response
+
+# Detail view with SEO-friendly slug
+@conditional_page(PageRoute.KIND_GOLF_GUIDE)
+@full_page_cache
 def destination_detail(request, slug, language='en'):
     """Detail view with multi-language support using DestinationGuide model"""
     # Activate the requested language
     if language != 'en':
         activate(language)
     
-    # Find destination by matching slug pattern
+    # Resolve the URL through the registry (single indexed lookup)
     destination = None
     guide = None
     
     try:
-        # Try to find guide by exact slug match first
-        try:
-            guide = DestinationGuide.objects.select_related('destination').get(
-                slug=slug, 
-                language_code=language
-            )
-            destination = guide.destination
-        except DestinationGuide.DoesNotExist:
-            # If no exact match, try to find by destination and language
-            for d in Destination.objects.prefetch_related('guides'):
-                expected_slug = d.generate_slug(language)
-                if slug == expected_slug:
-                    destination = d
-                    try:
-                        guide = d.guides.get(language_code=language)
-                    except DestinationGuide.DoesNotExist:
-                        # Try English as fallback
-                        if language != 'en':
-                            try:
-                                guide = d.guides.get(language_code='en')
-                            except DestinationGuide.DoesNotExist:
-                                pass
-                    break
+        destination, guide = resolve_golf_guide(language, slug)
         
         if not destination:
             raise Http404('Destination not found')
@@ -268,79 +134,26 @@ def destination_detail(request, slug, language='en'):
         if not guide:
             raise Http404('No content available for this destination in the requested language')
         
-        # Process the content
-        content = improve_content_formatting(guide.content)
-        article_html = md.markdown(content, extensions=["tables", "fenced_code", "nl2br"])
-        # Add target="_blank" to all links
-        article_html = re.sub(r'<a (?![^>]*target=)', '<a target="_blank" ', article_html)
-        
-        # Add a warning if content seems truncated
-        if len(guide.content) < 1000 or guide.content.strip().endswith('**'):
-            article_html += '<div class="alert alert-warning mt-4" role="alert"><strong>Note:</strong> This guide appears to be incomplete. Please check back later for the full content.</div>'
+        # Pre-rendered at write time; only re-rendered here if stale
+        article_html = guide.get_article_html()
         
         # Get available languages for this destination
         available_languages = list(
             destination.guides.values_list('language_code', flat=True).distinct()
         )
         
-        # Get related destinations for recommendations
-        all_destinations = list(
-            Destination.objects.filter(guides__language_code=language)
-            .exclude(id=destination.id)
-            .distinct()
-        )
-        
-        # Get destinations from same region/state (up to 3)
-        nearby_destinations = [dest for dest in all_destinations 
-                             if dest.region_or_state == destination.region_or_state 
-                             and dest.country == destination.country][:3]
-        
-        # Get destinations from same country (up to 3, excluding nearby ones)
-        same_country = [dest for dest in all_destinations 
-                      if dest.country == destination.country 
-                      and dest not in nearby_destinations][:3]
-        
-        # Get popular destinations (weighted random selection favoring different countries, up to 6)
-        import random
-        
-        # Group by country for diverse selection
-        destinations_by_country = {}
-        for dest in all_destinations:
-            country = dest.country
-            if country not in destinations_by_country:
-                destinations_by_country[country] = []
-            destinations_by_country[country].append(dest)
-        
-        # Select diverse popular destinations
-        popular_destinations = []
-        countries = list(destinations_by_country.keys())
-        random.shuffle(countries)
-        
-        # Try to get at least one from each country, up to 6 total
-        for country in countries[:6]:
-            if len(popular_destinations) < 6 and destinations_by_country[country]:
-                popular_destinations.append(random.choice(destinations_by_country[country]))
-        
-        # Fill remaining slots if we have less than 6
-        remaining_dests = [d for d in all_destinations if d not in popular_destinations]
-        while len(popular_destinations) < 6 and remaining_dests:
-            popular_destinations.append(remaining_dests.pop(random.randint(0, len(remaining_dests)-1)))
+        # Get related destinations from the precomputed index
+        related = get_related_destinations(destination, language)
+        nearby_destinations = related['nearby']
+        same_country = related['same_country']
+        popular_destinations = related['popular']
         
         # Add slugs to related destinations
         for dest in nearby_destinations + same_country + popular_destinations:
             dest.slug = dest.generate_slug(language)
         
-        # Get real-time data for this destination with error handling
-        realtime_data = {}
-        try:
-            realtime_service = RealTimeDestinationData()
-            realtime_data = realtime_service.get_all_destination_data(destination.city, destination.country)
-        except Exception as e:
-            # Log the error but continue without the realtime data
-            import logging
-            logging.error(f"Error fetching realtime data: {e}")
-        
-        return render(request, 'destinations/destination_detail.html', {
+        # Real-time data is loaded by the page from realtime_widget
+        response = render(request, 'destinations/destination_detail.html', {
             'destination': destination,
             'guide': guide,
             'article_html': article_html,
@@ -349,8 +162,9 @@ def destination_detail(request, slug, language='en'):
             'popular_destinations': popular_destinations,
             'current_language': language,
             'available_languages': available_languages,
-            'realtime_data': realtime_data,
         })
+        response.cache_tags = destination_page_tags(destination)
+        return response
     except Exception as e:
         # Log any unexpected errors but handle them gracefully
         import logging
@@ -370,15 +184,19 @@ def city_guide_home(request):
 
 def city_guide_home_lang(request, language='en'):
     """City guide listing page for specific language"""
-    city_guides = CityGuide.objects.filter(
-        language_code=language,
-        is_published=True
-    ).select_related('destination').order_by('-is_featured', '-updated_at')
+    city_guides = cache_tags.get_or_set(
+        f'city_guide_list_{language}',
+        [cache_tags.language_tag(language), cache_tags.CATALOG],
+        lambda: list(CityGuide.objects.filter(
+            language_code=language,
+            is_published=True
+        ).select_related('destination').order_by('-is_featured', '-updated_at'))
+    )
     
     context = {
         'city_guides': city_guides,
         'current_language': language,
-        'total_guides': city_guides.count(),
+        'total_guides': len(city_guides),
     }
     
     return render(request, 'destinations/city_guide_home.html', context)
@@ -387,16 +205,15 @@ def city_guide_detail(request, slug):
     """City guide detail page (English)"""
     return city_guide_detail_lang(request, slug, 'en')
 
+@conditional_page(PageRoute.KIND_CITY_GUIDE)
+@full_page_cache
 def city_guide_detail_lang(request, slug, language='en'):
     """City guide detail page for specific language"""
     try:
-        # Get the city guide
-        city_guide = get_object_or_404(
-            CityGuide.objects.select_related('destination'),
-            slug=slug,
-            language_code=language,
-            is_published=True
-        )
+        # Get the city guide through the URL registry
+        city_guide = resolve_city_guide(language, slug)
+        if not city_guide:
+            raise Http404('City guide not found')
         
         # Get available languages for this destination's city guides
         available_languages = list(
@@ -417,24 +234,17 @@ def city_guide_detail_lang(request, slug, language='en'):
             pass
         
         # Get nearby city guides (same country, different cities)
-        nearby_guides = CityGuide.objects.filter(
-            destination__country=city_guide.destination.country,
-            language_code=language,
-            is_published=True
-        ).exclude(id=city_guide.id).select_related('destination')[:6]
-        
-        # Get real-time data for this city with error handling
-        realtime_data = {}
-        try:
-            realtime_service = RealTimeDestinationData()
-            realtime_data = realtime_service.get_all_destination_data(
-                city_guide.destination.city, 
-                city_guide.destination.country
-            )
-        except Exception as e:
-            # Log the error but continue without the realtime data
-            import logging
-            logging.error(f"Error fetching realtime data for city guide: {e}")
+        country = city_guide.destination.country
+        country_guides = cache_tags.get_or_set(
+            f'country_city_guides_{slugify(country)}_{language}',
+            [cache_tags.country_tag(country), cache_tags.language_tag(language)],
+            lambda: list(CityGuide.objects.filter(
+                destination__country=country,
+                language_code=language,
+                is_published=True
+            ).select_related('destination')[:7])
+        )
+        nearby_guides = [guide for guide in country_guides if guide.id != city_guide.id][:6]
         
         context = {
             'city_guide': city_guide,
@@ -445,12 +255,48 @@ def city_guide_detail_lang(request, slug, language='en'):
             'nearby_guides': nearby_guides,
             'sections_summary': city_guide.get_sections_summary(),
             'reading_time': city_guide.get_reading_time(),
-            'realtime_data': realtime_data,
         }
         
-        return render(request, 'destinations/city_guide_detail.html', context)
+        # Real-time data is loaded by the page from realtime_widget
+        response = render(request, 'destinations/city_guide_detail.html', context)
+        response.cache_tags = destination_page_tags(city_guide.destination)
+        return response
         
     except Exception as e:
         import logging
         logging.error(f"Error in city_guide_detail view: {e}")
         raise Http404('City guide not found')
+
+
+# ============================================
+# REAL-TIME WIDGET
+# ============================================
+
+REALTIME_WIDGET_CACHE_CONTROL = 'public, max-age=60'
+
+@require_GET
+def realtime_widget(request, destination_id):
+    """Current conditions fragment for a detail page sidebar"""
+    destination = get_object_or_404(Destination, pk=destination_id)
+    
+    realtime_data = {}
+    try:
+        realtime_service = RealTimeDestinationData()
+        realtime_data = realtime_service.get_all_destination_data(
+            destination.city, destination.country, destination.timezone
+        )
+    except Exception as e:
+        # Log the error but serve an empty widget
+        import logging
+        logging.error(f"Error fetching realtime data: {e}")
+    
+    response = render(request, 'destinations/partials/realtime_widget.html', {
+        'realtime_data': realtime_data,
+        'show_footer': request.GET.get('footer') == '1',
+    })
+    # Weather/exchange values still being fetched in the background: don't let them stick
+    if realtime_data.get('weather') and realtime_data.get('exchange'):
+        response['Cache-Control'] = REALTIME_WIDGET_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,335 @@
+"""
+Leased work queue for the content generation workers
+
+Every piece of generation work is a WorkUnit row: one destination's guide
+in one language. A destination gets its English unit when it is created
+and its translation units once the English guide exists (translations are
+made from it); saving a guide marks its unit done, deleting it reopens it.
+Migration 0020 fills the table from the existing guides on upgrade;
+rebuild_work_queue recreates it from scratch.
+
+FetchWorkView claims units with a single UPDATE ... RETURNING on an indexed
+subquery, so two workers can never receive the same unit and a claim costs
+the same at any catalog size. The claim is a lease: if the worker never
+submits, the unit is handed out again once the lease expires. Expired
+leases are reclaimed before pending units, pending units go in priority
+order (English first, since translations wait for it).
+
+Leases are short; a worker keeps its lease by calling the heartbeat endpoint
+while it generates, so a live generation is never handed to a second
+worker, while a crashed worker's unit comes back within a few minutes.
+A submission has to carry the token of the lease it was made under. One
+whose lease was lost (the unit was re-leased after expiring, or finished by
+another worker) is rejected, and its generation time, as the worker reports
+it, is counted as duplicated work in cache counters shown by work_status.
+
+work_status itself reads WorkCounter rows (destinations, destinations with
+guides, guides per language) that receivers adjust in the same transaction
+as each create or delete, so it costs one small query however large the
+catalog; rebuild_counters() recounts them from scratch.
+"""
+
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Destination, DestinationGuide, WorkCounter, WorkUnit
+
+# Target languages for content generation
+TARGET_LANGUAGES = {
+    'es': 'Spanish',      # Huge international golf markets
+    'fr': 'French',       # Europe + parts of Africa
+    'de': 'German',       # Big traveling golfer market
+    'it': 'Italian',      # Domestic golf, inbound travelers
+    'pt': 'Portuguese',   # Portugal, Brazil
+    'nl': 'Dutch',        # Niche but high-value travelers
+    'ja': 'Japanese',     # Premium golf tourists
+    'ko': 'Korean',       # Very active international golfers
+    'zh': 'Chinese',      # Both mainland + Taiwan markets
+    'ar': 'Arabic',       # Middle East golf destinations
+}
+
+PRIORITY_ENGLISH = 0
+PRIORITY_TRANSLATION = 10
+BATCH_SIZE = 2000
+METRICS_FIELDS = ('submissions', 'generation_seconds', 'duplicate_submissions', 'duplicate_seconds')
+_METRICS_PREFIX = 'work_queue'
+
+COUNTER_DESTINATIONS = 'destinations'
+COUNTER_WITH_GUIDES = 'destinations_with_guides'
+COUNTER_GUIDES = 'guides'
+
+# Most units one fetch may lease
+MAX_CLAIM = 50
+
+Lease = namedtuple('Lease', 'unit_id destination_id language_code kind token expires_at')
+
+
+def lease_seconds():
+    return getattr(settings, 'WORK_LEASE_SECONDS', 300)
+
+
+def heartbeat_seconds():
+    """How often workers should renew their lease"""
+    return max(5, lease_seconds() // 5)
+
+
+def _unit(destination_id, language_code, status=WorkUnit.STATUS_PENDING):
+    return WorkUnit(
+        destination_id=destination_id,
+        language_code=language_code,
+        kind=WorkUnit.KIND_GOLF_GUIDE,
+        status=status,
+        priority=PRIORITY_ENGLISH if language_code == 'en' else PRIORITY_TRANSLATION,
+    )
+
+
+def _claim_sql(condition, order_by):
+    table = connection.ops.quote_name(WorkUnit._meta.db_table)
+    return (
+        f"UPDATE {table} SET status = %s, lease_token = %s, leased_by = %s, lease_expires_at = %s, "
+        f"attempts = attempts + 1, updated_at = %s "
+        f"WHERE id IN (SELECT id FROM {table} WHERE {condition} ORDER BY {order_by} LIMIT %s) "
+        f"RETURNING id, destination_id, language_code, kind, priority"
+    )
+
+
+def claim_many(worker='', count=1):
+    """Lease up to count units to a worker under one token, in the order they should be done"""
+    count = max(1, min(count, MAX_CLAIM))
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease_seconds())
+    token = uuid.uuid4().hex
+    adapt = connection.ops.adapt_datetimefield_value
+    assignment = [WorkUnit.STATUS_LEASED, token, worker[:100], adapt(expires_at), adapt(now)]
+    candidates = [
+        # Abandoned leases first, oldest expiry first
+        ("status = %s AND lease_expires_at < %s", 'lease_expires_at', [WorkUnit.STATUS_LEASED, adapt(now)]),
+        ("status = %s", 'priority, id', [WorkUnit.STATUS_PENDING]),
+    ]
+    leases = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for condition, order_by, params in candidates:
+            remaining = count - len(leases)
+            if not remaining:
+                break
+            cursor.execute(_claim_sql(condition, order_by), assignment + params + [remaining])
+            # RETURNING order is unspecified
+            rows = sorted(cursor.fetchall(), key=lambda row: (row[4], row[0]))
+            leases += [
+                Lease(unit_id, destination_id, language_code, kind, token, expires_at)
+                for unit_id, destination_id, language_code, kind, _ in rows
+            ]
+    return leases
+
+
+def claim(worker=''):
+    """Lease the next unit of work to a worker; None when there is none"""
+    leases = claim_many(worker, 1)
+    return leases[0] if leases else None
+
+
+def renew(unit_ids, token):
+    """
+    Extend the leases on units still held with this token; returns (new
+    expiry, ids renewed). Units missing from the result were lost.
+    """
+    if not token:
+        return None, []
+    held = WorkUnit.objects.filter(pk__in=unit_ids, status=WorkUnit.STATUS_LEASED, lease_token=token)
+    renewed = list(held.values_list('pk', flat=True))
+    expires_at = timezone.now() + timedelta(seconds=lease_seconds())
+    if renewed:
+        held.filter(pk__in=renewed).update(lease_expires_at=expires_at, updated_at=timezone.now())
+    return expires_at, renewed
+
+
+def holds_lease(destination_id, language_code, token):
+    """
+    Whether a submission's token still holds its unit. An expired lease
+    still counts until the unit is handed to another worker; finishing a
+    unit releases it, so repeating finished work never does.
+    """
+    return bool(token) and WorkUnit.objects.filter(
+        destination_id=destination_id, language_code=language_code, kind=WorkUnit.KIND_GOLF_GUIDE,
+        status=WorkUnit.STATUS_LEASED, lease_token=token,
+    ).exists()
+
+
+def _metrics_key(field):
+    return f'{_METRICS_PREFIX}:{field}'
+
+
+def record_submission(generation_seconds, duplicate):
+    """Add one submission to the generation counters"""
+    try:
+        seconds = max(0, int(float(generation_seconds or 0)))
+    except (TypeError, ValueError):
+        seconds = 0
+    amounts = {'submissions': 1, 'generation_seconds': seconds}
+    if duplicate:
+        amounts.update(duplicate_submissions=1, duplicate_seconds=seconds)
+    for field, amount in amounts.items():
+        key = _metrics_key(field)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add() and incr(); the next submission starts it again
+            pass
+
+
+def metrics():
+    """Submission counters, with GPU time in minutes"""
+    keys = {_metrics_key(field): field for field in METRICS_FIELDS}
+    found = cache.get_many(list(keys))
+    totals = {field: found.get(key, 0) for key, field in keys.items()}
+    return {
+        'submissions': totals['submissions'],
+        'gpu_minutes': round(totals['generation_seconds'] / 60, 1),
+        'duplicate_submissions': totals['duplicate_submissions'],
+        'duplicated_gpu_minutes': round(totals['duplicate_seconds'] / 60, 1),
+        'active_leases': WorkUnit.objects.filter(
+            status=WorkUnit.STATUS_LEASED, lease_expires_at__gte=timezone.now()
+        ).count(),
+    }
+
+
+def add_destination(destination_id):
+    """Queue the English guide of a new destination"""
+    WorkUnit.objects.bulk_create([_unit(destination_id, 'en')], ignore_conflicts=True)
+
+
+def complete(destination_id, language_code):
+    """A guide was saved: its unit is done, and an English guide opens the translations"""
+    WorkUnit.objects.filter(
+        destination_id=destination_id, language_code=language_code, kind=WorkUnit.KIND_GOLF_GUIDE
+    ).update(status=WorkUnit.STATUS_DONE, lease_token='', lease_expires_at=None, updated_at=timezone.now())
+    if language_code == 'en':
+        existing = set(
+            DestinationGuide.objects.filter(destination_id=destination_id).values_list('language_code', flat=True)
+        )
+        WorkUnit.objects.bulk_create(
+            [_unit(destination_id, language) for language in TARGET_LANGUAGES if language not in existing],
+            ignore_conflicts=True,
+        )
+
+
+def reopen(destination_id, language_code):
+    """A guide was deleted: its unit is pending again"""
+    WorkUnit.objects.filter(
+        destination_id=destination_id, language_code=language_code, kind=WorkUnit.KIND_GOLF_GUIDE
+    ).update(status=WorkUnit.STATUS_PENDING, lease_token='', lease_expires_at=None, updated_at=timezone.now())
+
+
+def rebuild_queue():
+    """Recreate every unit (and the counters) from the existing guides; returns the number of units"""
+    total = 0
+    last_id = 0
+    with transaction.atomic():
+        WorkUnit.objects.all().delete()
+        while True:
+            chunk = list(
+                Destination.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1]
+            existing = {}
+            for destination_id, language in DestinationGuide.objects.filter(
+                destination_id__in=chunk
+            ).values_list('destination_id', 'language_code'):
+                existing.setdefault(destination_id, set()).add(language)
+            units = []
+            for destination_id in chunk:
+                languages = existing.get(destination_id, set())
+                wanted = ['en'] + list(TARGET_LANGUAGES) if 'en' in languages else ['en']
+                for language in wanted:
+                    status = WorkUnit.STATUS_DONE if language in languages else WorkUnit.STATUS_PENDING
+                    units.append(_unit(destination_id, language, status))
+            WorkUnit.objects.bulk_create(units, batch_size=500)
+            total += len(units)
+        rebuild_counters()
+    return total
+
+
+# Counters behind work_status
+
+def language_counter(language_code):
+    return f'{COUNTER_GUIDES}:{language_code}'
+
+
+def adjust_counters(names, delta):
+    """Add delta to counters, in the current transaction"""
+    WorkCounter.objects.filter(name__in=names).update(value=F('value') + delta)
+
+
+def destination_added():
+    adjust_counters([COUNTER_DESTINATIONS], 1)
+
+
+def destination_removed():
+    """Its cascaded guides count themselves out, see guide_removed()"""
+    adjust_counters([COUNTER_DESTINATIONS], -1)
+
+
+def guide_added(guide):
+    # A language seen for the first time starts from zero
+    WorkCounter.objects.bulk_create([WorkCounter(name=language_counter(guide.language_code))], ignore_conflicts=True)
+    names = [COUNTER_GUIDES, language_counter(guide.language_code)]
+    if not DestinationGuide.objects.filter(destination_id=guide.destination_id).exclude(pk=guide.pk).exists():
+        names.append(COUNTER_WITH_GUIDES)
+    adjust_counters(names, 1)
+
+
+def guide_removing(guide):
+    """Before a delete, note the destination's guides as they were"""
+    guide._sibling_pks = list(
+        DestinationGuide.objects.filter(destination_id=guide.destination_id).values_list('pk', flat=True)
+    )
+
+
+def guide_removed(guide):
+    """
+    A delete sends every post_delete after removing all its rows, so when a
+    bulk or cascaded delete takes several guides of one destination each of
+    them finds none left; only the lowest pk among them counts the
+    destination out of destinations_with_guides.
+    """
+    names = [COUNTER_GUIDES, language_counter(guide.language_code)]
+    if not DestinationGuide.objects.filter(destination_id=guide.destination_id).exists():
+        if guide.pk == min(getattr(guide, '_sibling_pks', None) or [guide.pk]):
+            names.append(COUNTER_WITH_GUIDES)
+    adjust_counters(names, -1)
+
+
+def rebuild_counters():
+    """Recount every counter with one GROUP BY; returns {name: value}"""
+    languages = dict(
+        DestinationGuide.objects.order_by().values_list('language_code').annotate(count=Count('id'))
+    )
+    values = {
+        COUNTER_DESTINATIONS: Destination.objects.count(),
+        COUNTER_WITH_GUIDES: DestinationGuide.objects.order_by().values('destination_id').distinct().count(),
+        COUNTER_GUIDES: sum(languages.values()),
+    }
+    for language in ['en', *TARGET_LANGUAGES, *languages]:
+        values[language_counter(language)] = languages.get(language, 0)
+    with transaction.atomic():
+        WorkCounter.objects.all().delete()
+        WorkCounter.objects.bulk_create([WorkCounter(name=name, value=value) for name, value in values.items()])
+    return values
+
+
+def counters():
+    """{name: value} for every counter, recounted if they were never built"""
+    values = dict(WorkCounter.objects.values_list('name', 'value'))
+    if COUNTER_DESTINATIONS not in values:
+        values = rebuild_counters()
+    return values
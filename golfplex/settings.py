@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -127,29 +128,39 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Caching Configuration
 # https://docs.djangoproject.com/en/5.2/topics/cache/
 
+# Two tiers (destinations/cache_backends.py): a small per-process LRU in front
+# of a store shared by every worker, so invalidations and realtime data are
+# seen by all processes. The shared tier is a local SQLite file unless
+# CACHE_REDIS_URL is set.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'golfplex-cache',
-        'TIMEOUT': 300,  # 5 minutes default
+        'BACKEND': 'destinations.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+        # Entries are invalidated by tag (destinations/cache_tags.py), not by expiry
+        'TIMEOUT': 6 * 3600,
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'L1_MAX_ENTRIES': 500,
+            'L1_TIMEOUT': 30,  # Upper bound on how long a process keeps its own copy
+            'SYNC_INTERVAL': 1.0,  # Max staleness after another process writes a key
+        }
+    },
+    'shared': {
+        'BACKEND': 'destinations.cache_backends.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'TIMEOUT': 6 * 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
             'CULL_FREQUENCY': 3,
         }
-    }
+    },
 }
 
-# For production, consider using Redis or Memcached:
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#         'TIMEOUT': 300,
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#         }
-#     }
-# }
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+        'TIMEOUT': 6 * 3600,
+    }
 
 # Cache key prefix to avoid conflicts
 CACHE_MIDDLEWARE_KEY_PREFIX = 'golfplex'
@@ -161,3 +172,20 @@ APPEND_SLASH = True  # Django will redirect /path to /path/ by default
 # Define exception patterns where slash should not be appended
 PREPEND_WWW = False
 DISALLOW_SLASH_APPEND_EXTENSIONS = ['.xml', '.txt', '.json']  # File extensions that should not get a trailing slash
+
+# Public origin used in sitemaps (python manage.py generate_sitemap)
+SITE_URL = 'https://tcgplex.com'
+
+# Static site export (python manage.py export_static_site). nginx serves this
+# tree directly and falls back to Django for anything that isn't on disk.
+STATIC_SITE_ROOT = BASE_DIR / 'static_site'
+STATIC_SITE_HOST = 'tcgplex.com'
+STATIC_SITE_WORKERS = 4
+
+# Real-time destination data (weather / exchange rates; local time is computed offline)
+# Values are served stale-while-revalidate and refreshed on a background pool.
+REALTIME_REFRESH_WORKERS = 4
+# Set True to refresh inline (tests, one-off scripts)
+REALTIME_REFRESH_SYNC = False
+# Override upstream base URLs, e.g. {'weather': 'http://127.0.0.1:8765'} for a local stand-in
+REALTIME_API_URLS = {}
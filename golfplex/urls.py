@@ -16,13 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, Http404
 from django.conf import settings
 import os
-import os
 
 def static_sitemap_xml(request):
-    sitemap_path = os.path.join(settings.BASE_DIR, 'sitemap.xml')
+    """Sitemap index written by the generate_sitemap command"""
+    from destinations.sitemaps import sitemap_root, INDEX_NAME
+    sitemap_path = os.path.join(sitemap_root(), INDEX_NAME)
     try:
         with open(sitemap_path, 'r') as f:
             content = f.read()
@@ -30,6 +31,14 @@ def static_sitemap_xml(request):
     except Exception:
         return HttpResponse('', content_type='application/xml', status=404)
 
+def sitemap_shard(request, name):
+    """Gzipped sitemap shard written by the generate_sitemap command"""
+    from destinations.sitemaps import sitemap_root, SHARD_DIR
+    shard_path = os.path.join(sitemap_root(), SHARD_DIR, name)
+    if not os.path.exists(shard_path):
+        raise Http404('Sitemap not found')
+    return FileResponse(open(shard_path, 'rb'), content_type='application/gzip')
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     # Keep ads.txt static serving
@@ -37,5 +46,6 @@ urlpatterns = [
     # Serve static sitemap.xml
     re_path(r'^sitemap\.xml/?$', static_sitemap_xml, name='sitemap_xml'),
     path('sitemap.xml/', static_sitemap_xml),
+    re_path(r'^sitemaps/(?P<name>[\w-]+\.xml\.gz)$', sitemap_shard, name='sitemap_shard'),
     path('', include('destinations.urls')),
 ]
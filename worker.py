@@ -9,37 +9,69 @@ This script runs locally and:
 4. Submits completed work back to the API immediately
 5. Fetches next work unit and repeats
 
-Each work unit is one destination + one language, preventing race conditions
-between multiple workers and enabling immediate submission.
+Each work unit is one destination + one language, leased to this worker by
+the API. For as long as it holds leases (waiting for the model's first
+token, generating, submitting) a background thread renews them with
+heartbeats; if a lease is lost (the unit was handed to another worker) the
+worker stops and moves on instead of generating a duplicate. Submissions carry the lease token;
+the API rejects work whose lease was lost.
+
+Translation units reference their English source by content hash; sources
+are cached under <output-dir>/sources/ and only downloaded when the hash
+is new. Submissions are sent gzip-compressed.
 
 Usage:
     python worker.py --api-url http://localhost:8000 --model gemma3n:e4b
 
     python worker.py --api-url https://tcgplex.com --model gemma3n:e4b 
+
+    # Fast models: lease and submit 10 items per round trip
+    python worker.py --api-url https://tcgplex.com --model gemma3n:e4b --batch-size 10
 """
 
 import requests
 import json
 import argparse
+import gzip
+import hashlib
 import time
 import os
+import socket
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional
 
 class GolfContentWorker:
+    # A batch is submitted in parts while it is generated, once this much
+    # content is waiting or this long has passed since the last submission
+    BATCH_FLUSH_CHARS = 200_000
+    BATCH_FLUSH_SECONDS = 120
+    
     def __init__(self, api_url: str, ollama_url: str = "http://localhost:11434", output_dir: str = "generated_content", model_name: str = "llama3.1"):
         self.api_url = api_url.rstrip('/')
         self.ollama_url = ollama_url.rstrip('/')
         self.model_name = model_name
         self.output_dir = output_dir
         self.session = requests.Session()
+        # Sessions aren't thread-safe; the heartbeat thread has its own
+        self.heartbeat_session = requests.Session()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        
+        # Leases on the work units being processed (see send_heartbeat)
+        self.current_lease = None
+        self.current_unit_id = None
+        self.lost_units = set()
+        self.heartbeat_stop = None
+        self.heartbeat_thread = None
         
         # Timing tracking
         self.worker_start_time = None
         self.destination_timings = []
         
-        # Create output directory
+        # Create output directory (and the translation source cache)
         os.makedirs(output_dir, exist_ok=True)
+        self.source_dir = os.path.join(output_dir, 'sources')
+        os.makedirs(self.source_dir, exist_ok=True)
         
         # Test Ollama connection
         self.test_ollama_connection()
@@ -116,6 +148,10 @@ class GolfContentWorker:
             
             # Process streaming response
             for line in response.iter_lines():
+                if self.current_unit_id in self.lost_units:
+                    print("\n⛔ Lease lost - another worker has this unit, abandoning generation")
+                    response.close()
+                    return ""
                 if line:
                     try:
                         chunk = json.loads(line.decode('utf-8'))
@@ -148,8 +184,8 @@ class GolfContentWorker:
             print(f"❌ Unexpected error calling Ollama: {e}")
             return ""
 
-    def fetch_work(self) -> Optional[Dict]:
-        """Fetch next (destination, language) work item from the API with retry logic."""
+    def fetch_work(self, count: int = None) -> Optional[Dict]:
+        """Fetch next (destination, language) work item - or, with count, a batch of up to count items - from the API with retry logic."""
         retry_intervals = [1, 2, 3, 5, 7, 11, 13, 17, 19, 23]  # Prime number intervals
         retry_intervals += [31]  # Infinite retries at 31-second intervals
 
@@ -157,7 +193,10 @@ class GolfContentWorker:
         while True:
             try:
                 print(f"📥 Attempt {attempt + 1}: Fetching work from {self.api_url}/api/fetch-work/")
-                response = self.session.get(f"{self.api_url}/api/fetch-work/", timeout=60)  # 1 minute timeout for fetching work
+                params = {'worker': self.worker_id}
+                if count:
+                    params['count'] = count
+                response = self.session.get(f"{self.api_url}/api/fetch-work/", params=params, timeout=60)  # 1 minute timeout for fetching work
                 response.raise_for_status()
                 data = response.json()
 
@@ -167,6 +206,10 @@ class GolfContentWorker:
                 if data['status'] == 'no_work':
                     print("🎉 No more work available - all content is complete!")
                     return None
+                elif data['status'] == 'work_available' and 'units' in data:
+                    for unit in data['units']:
+                        print(f"✅ Work fetched: {unit['destination'].get('city', '')}, {unit['destination'].get('country', '')} [{unit['target_language']}]")
+                    return data
                 elif data['status'] == 'work_available':
                     # Handle different API response formats
                     language = (data.get('target_language') or 
@@ -193,6 +236,102 @@ class GolfContentWorker:
             time.sleep(wait_time)
             attempt += 1
     
+    def hold_leases(self, units: List[Dict]):
+        """Start renewing the leases of fetched work units on a background thread"""
+        self.release_leases()
+        leases = [unit['lease'] for unit in units if unit.get('lease')]
+        self.lost_units = set()
+        if not leases:
+            return
+        self.current_lease = {
+            'unit_ids': [lease['unit_id'] for lease in leases],
+            'token': leases[0]['token'],
+            'heartbeat_seconds': leases[0].get('heartbeat_seconds', 60),
+        }
+        self.heartbeat_stop = threading.Event()
+        self.heartbeat_thread = threading.Thread(
+            target=self.heartbeat_loop, args=(self.current_lease, self.heartbeat_stop), daemon=True
+        )
+        self.heartbeat_thread.start()
+    
+    def release_leases(self):
+        """Stop renewing leases (the units were submitted or abandoned)"""
+        if self.heartbeat_stop:
+            self.heartbeat_stop.set()
+            self.heartbeat_thread.join()
+        self.heartbeat_stop = None
+        self.heartbeat_thread = None
+        self.current_lease = None
+        self.current_unit_id = None
+    
+    def heartbeat_loop(self, lease: Dict, stop: threading.Event):
+        """Renew a lease every heartbeat interval until stopped"""
+        while not stop.wait(lease['heartbeat_seconds']):
+            self.send_heartbeat(lease)
+    
+    def send_heartbeat(self, lease: Dict):
+        """Renew the leases; units the API reports lost are added to lost_units"""
+        try:
+            response = self.heartbeat_session.post(
+                f"{self.api_url}/api/work-heartbeat/",
+                json={'unit_ids': lease['unit_ids'], 'token': lease['token']},
+                timeout=10
+            )
+            if response.status_code == 409:
+                self.lost_units.update(lease['unit_ids'])
+            elif response.status_code == 200:
+                self.lost_units.update(response.json().get('lost', []))
+            else:
+                print(f"\n⚠️ Heartbeat failed with status {response.status_code}")
+        except requests.RequestException as e:
+            # Keep generating; the lease survives a few missed heartbeats
+            print(f"\n⚠️ Heartbeat error: {e}")
+    
+    def post_json(self, url: str, payload: Dict, timeout: int) -> requests.Response:
+        """POST a JSON payload gzip-compressed"""
+        return self.session.post(
+            url,
+            data=gzip.compress(json.dumps(payload).encode('utf-8')),
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+            timeout=timeout
+        )
+    
+    def load_source(self, work_data: Dict) -> str:
+        """English content a translation is made from: the local copy for its hash, else downloaded"""
+        # Servers that still embed every guide
+        if 'existing_guides' in work_data:
+            return work_data['existing_guides'].get('en', {}).get('content', '')
+        
+        source = work_data.get('source')
+        if not source:
+            return ""
+        content_hash = source.get('content_hash') or ''
+        path = os.path.join(self.source_dir, f"{content_hash}.md") if content_hash else None
+        if path and os.path.exists(path):
+            print(f"📄 Using cached source {content_hash[:12]}")
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        
+        for attempt in range(3):
+            try:
+                response = self.session.get(f"{self.api_url}{source['url']}", timeout=60)
+                response.raise_for_status()
+                content = response.content.decode('utf-8')
+                break
+            except requests.RequestException as e:
+                print(f"❌ Error downloading source (attempt {attempt + 1}): {e}")
+                time.sleep(2 ** attempt)
+        else:
+            return ""
+        
+        # Cache only what matches the advertised hash (the guide may have changed since)
+        if path and hashlib.sha256(content.encode('utf-8')).hexdigest() == content_hash:
+            temp = f"{path}.tmp"
+            with open(temp, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp, path)
+        return content
+    
     def load_prompt_template(self) -> str:
         """Load the professional prompt template from file"""
         try:
@@ -270,18 +409,17 @@ Provide the complete translated guide in {language_name}:
         
         return self.call_ollama(prompt, system_prompt)
     
-    def process_work_item(self, work_data: Dict) -> bool:
-        """Process a single (destination, language) work item"""
-        process_start_time = time.time()
-        destination = work_data['destination']
-        
+    def work_language(self, work_data: Dict) -> str:
         # Handle multiple possible API formats for language
-        language = (work_data.get('target_language') or 
-                   work_data.get('language') or 
-                   (work_data.get('missing_languages', ['en'])[0] if work_data.get('missing_languages') else 'en'))
-        
-        content = ""
-        generation_time = 0
+        return (work_data.get('target_language') or 
+                work_data.get('language') or 
+                (work_data.get('missing_languages', ['en'])[0] if work_data.get('missing_languages') else 'en'))
+    
+    def generate_work_item(self, work_data: Dict):
+        """Generate the content for one work item; returns (content, generation time), content empty on failure"""
+        destination = work_data['destination']
+        language = self.work_language(work_data)
+        self.current_unit_id = work_data.get('lease', {}).get('unit_id')
         
         print(f"\n🏌️ Processing: {destination['city']}, {destination['country']} [{language}]")
         
@@ -296,46 +434,62 @@ Provide the complete translated guide in {language_name}:
                 print(f"✅ Generated English guide for {destination['city']}, {destination['country']} ({len(content)} characters in {generation_time:.1f}s)")
             else:
                 print(f"❌ Failed to generate English guide for {destination['city']}, {destination['country']}")
-                return False
-        else:
-            # Translation: need English content
-            existing_guides = work_data.get('existing_guides', {})
-            english_content = existing_guides.get('en', {}).get('content', '')
-            
-            if not english_content:
-                print(f"❌ No English content available for translation for {destination['city']}, {destination['country']}")
-                return False
-                
-            print(f"🌐 Translating to {self.language_names.get(language, language)}...")
-            translation_start = time.time()
-            content = self.translate_guide(english_content, language, destination)
-            generation_time = time.time() - translation_start
+            return content, generation_time
+        
+        # Translation: need English content
+        english_content = self.load_source(work_data)
+        
+        if not english_content:
+            print(f"❌ No English content available for translation for {destination['city']}, {destination['country']}")
+            return "", 0
             
-            if content:
-                print(f"✅ Translated to {language} for {destination['city']}, {destination['country']} ({len(content)} characters in {generation_time:.1f}s)")
-            else:
-                print(f"❌ Failed to translate to {language} for {destination['city']}, {destination['country']}")
-                return False
+        print(f"🌐 Translating to {self.language_names.get(language, language)}...")
+        translation_start = time.time()
+        content = self.translate_guide(english_content, language, destination)
+        generation_time = time.time() - translation_start
+        
+        if content:
+            print(f"✅ Translated to {language} for {destination['city']}, {destination['country']} ({len(content)} characters in {generation_time:.1f}s)")
+        else:
+            print(f"❌ Failed to translate to {language} for {destination['city']}, {destination['country']}")
+        return content, generation_time
+    
+    def record_timing(self, work_data: Dict, total_time: float, generation_time: float, success: bool):
+        destination = work_data['destination']
+        self.destination_timings.append({
+            'destination': f"{destination['city']}, {destination['country']}",
+            'destination_id': destination['id'],
+            'language': self.work_language(work_data),
+            'total_time': total_time,
+            'generation_time': generation_time,
+            'success': success,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    def process_work_item(self, work_data: Dict) -> bool:
+        """Process a single (destination, language) work item"""
+        process_start_time = time.time()
+        destination = work_data['destination']
+        language = self.work_language(work_data)
+        
+        self.hold_leases([work_data])
+        content, generation_time = self.generate_work_item(work_data)
+        if not content:
+            self.release_leases()
+            return False
         
         # Save to JSON for safety
         guides = {language: {'content': content}}
         self.save_work_json(destination, guides)
         
         # Submit to API (updated format)
-        submit_success = self.submit_work_single(destination['id'], language, content)
+        token = (work_data.get('lease') or {}).get('token')
+        submit_success = self.submit_work_single(destination['id'], language, content, generation_time, token)
+        self.release_leases()
         
         # Timing summary
         total_time = time.time() - process_start_time
-        destination_timing = {
-            'destination': f"{destination['city']}, {destination['country']}",
-            'destination_id': destination['id'],
-            'language': language,
-            'total_time': total_time,
-            'generation_time': generation_time,
-            'success': submit_success,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.destination_timings.append(destination_timing)
+        self.record_timing(work_data, total_time, generation_time, submit_success)
         
         print(f"⏱️  Work unit processing time: {total_time:.1f} seconds")
         self.print_timing_summary()
@@ -349,6 +503,66 @@ Provide the complete translated guide in {language_name}:
         
         return submit_success
     
+    def process_batch(self, units: List[Dict]) -> int:
+        """Generate a batch of leased work items, submitting finished ones in batch requests as they pile up; returns the number accepted"""
+        batch_start_time = time.time()
+        self.hold_leases(units)
+        pending = []
+        pending_chars = 0
+        last_flush = time.time()
+        accepted = 0
+        for work_data in units:
+            unit_id = work_data.get('lease', {}).get('unit_id')
+            if unit_id in self.lost_units:
+                print(f"⛔ Lease on unit {unit_id} lost - skipping")
+                continue
+            item_start_time = time.time()
+            content, generation_time = self.generate_work_item(work_data)
+            if not content:
+                self.record_timing(work_data, time.time() - item_start_time, generation_time, False)
+                continue
+            destination = work_data['destination']
+            language = self.work_language(work_data)
+            self.save_work_json(destination, {language: {'content': content}})
+            item = {
+                'destination_id': destination['id'],
+                'language_code': language,
+                'content': content,
+                'generation_seconds': round(generation_time, 1),
+                'token': work_data.get('lease', {}).get('token')
+            }
+            pending.append((item, work_data, time.time() - item_start_time, generation_time))
+            pending_chars += len(content)
+            if pending_chars >= self.BATCH_FLUSH_CHARS or time.time() - last_flush >= self.BATCH_FLUSH_SECONDS:
+                accepted += self.flush_batch(pending)
+                pending, pending_chars, last_flush = [], 0, time.time()
+        
+        accepted += self.flush_batch(pending)
+        self.release_leases()
+        
+        print(f"⏱️  Batch of {len(units)} processed in {time.time() - batch_start_time:.1f} seconds ({accepted} accepted)")
+        self.print_timing_summary()
+        if accepted:
+            print("\n" + "="*50)
+            print("📊 UPDATED WORK STATUS AFTER BATCH:")
+            self.get_work_status()
+            print("="*50)
+        return accepted
+    
+    def flush_batch(self, pending: List) -> int:
+        """Submit generated (item, work_data, total_time, generation_time) entries in one request; returns the number accepted"""
+        if not pending:
+            return 0
+        results = self.submit_work_batch([item for item, _, _, _ in pending])
+        accepted = 0
+        for (_, work_data, total_time, generation_time), result in zip(pending, results or [None] * len(pending)):
+            success = bool(result) and result.get('status') in ('created', 'updated')
+            if result and not success:
+                print(f"❌ {result.get('destination_id')} [{result.get('language_code')}]: {result.get('message')}")
+            accepted += success
+            self.record_timing(work_data, total_time, generation_time, success)
+        return accepted
+    
     def print_timing_summary(self):
         """Print current timing statistics"""
         if not self.destination_timings:
@@ -400,7 +614,8 @@ Provide the complete translated guide in {language_name}:
         
         print(f"💾 Saved work to: {filepath}")
     
-    def submit_work_single(self, destination_id: int, language_code: str, content: str) -> bool:
+    def submit_work_single(self, destination_id: int, language_code: str, content: str, generation_time: float = 0,
+                           token: Optional[str] = None) -> bool:
         """Submit completed work for a single (destination, language) pair to the API with retry logic."""
         max_retries = 10  # Maximum number of retries
         retry_intervals = [1, 2, 3, 5, 7, 11, 13, 17, 19, 23]  # Prime number intervals
@@ -414,22 +629,24 @@ Provide the complete translated guide in {language_name}:
                     'destination_id': destination_id,
                     'language_code': language_code,
                     'content': content,
+                    'token': token,
                     'worker_info': {
                         'worker_version': '1.0',
-                        'generated_at': datetime.now().isoformat()
+                        'worker_id': self.worker_id,
+                        'generated_at': datetime.now().isoformat(),
+                        'generation_seconds': round(generation_time, 1)
                     }
                 }
 
-                response = self.session.post(
-                    f"{self.api_url}/api/submit-work/",
-                    json=atomic_payload,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=300
-                )
+                response = self.post_json(f"{self.api_url}/api/submit-work/", atomic_payload, timeout=300)
 
                 if response.status_code == 200:
                     print(f"✅ Work submitted successfully (atomic format)")
                     return True
+                elif response.status_code == 409:
+                    # Another worker holds (or finished) the unit; retrying can't help
+                    print(f"⛔ Lease lost for destination {destination_id} ({language_code}) - discarding")
+                    return False
                 elif response.status_code == 400:
                     print(f"❌ Bad Request (400): {response.text[:500]}...")
                 else:
@@ -447,25 +664,63 @@ Provide the complete translated guide in {language_name}:
         print(f"❌ All {max_retries} attempts failed for destination {destination_id} ({language_code}).")
         return False
 
-    def submit_work(self, destination_id: int, guides: Dict) -> bool:
+    def submit_work_batch(self, items: List[Dict]) -> List[Dict]:
+        """Submit many (destination, language) items in one request with retry logic; returns the per-item results."""
+        max_retries = 10
+        retry_intervals = [1, 2, 3, 5, 7, 11, 13, 17, 19, 23]  # Prime number intervals
+
+        for attempt in range(max_retries):
+            try:
+                print(f"📤 Attempt {attempt + 1}/{max_retries}: Submitting batch of {len(items)} items...")
+                response = self.post_json(
+                    f"{self.api_url}/api/submit-work/",
+                    {
+                        'items': items,
+                        'worker_info': {
+                            'worker_version': '1.0',
+                            'worker_id': self.worker_id,
+                            'generated_at': datetime.now().isoformat()
+                        }
+                    },
+                    timeout=300
+                )
+
+                if response.status_code == 200:
+                    result = response.json()
+                    print(f"✅ Batch submitted: {result['summary']}")
+                    return result['results']
+                elif response.status_code == 400:
+                    print(f"❌ Bad Request (400): {response.text[:500]}...")
+                    return []
+                else:
+                    print(f"⚠️ Batch submission failed with status {response.status_code}: {response.text[:500]}...")
+
+            except requests.RequestException as e:
+                print(f"❌ Network error on attempt {attempt + 1}: {e}")
+
+            if attempt < max_retries - 1:
+                wait_time = retry_intervals[attempt]
+                print(f"⏳ Waiting {wait_time} seconds before retrying...")
+                time.sleep(wait_time)
+
+        print(f"❌ All {max_retries} attempts failed for the batch of {len(items)} items.")
+        return []
+
+    def submit_work(self, destination_id: int, guides: Dict, token: str) -> bool:
         """Submit completed work to the API"""
         try:
             print(f"📤 Submitting work for destination {destination_id}...")
             payload = {
                 'destination_id': destination_id,
                 'guides': guides,
+                'token': token,
                 'worker_info': {
                     'worker_version': '1.0',
                     'generated_at': datetime.now().isoformat()
                 }
             }
             
-            response = self.session.post(
-                f"{self.api_url}/api/submit-work/",
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=60
-            )
+            response = self.post_json(f"{self.api_url}/api/submit-work/", payload, timeout=60)
             response.raise_for_status()
             
             result = response.json()
@@ -502,6 +757,11 @@ Provide the complete translated guide in {language_name}:
             print(f"Total guides: {overview['total_guides']}")
             print(f"Overall completion: {overview['completion_percentage']}%")
             
+            queue = status.get('work_queue')
+            if queue:
+                print(f"Active leases: {queue['active_leases']}")
+                print(f"GPU minutes: {queue['gpu_minutes']} (duplicated: {queue['duplicated_gpu_minutes']})")
+            
             print("\n🌐 Language Progress:")
             for lang, stats in status['language_stats'].items():
                 print(f"  {stats['name']}: {stats['count']} guides ({stats['percentage']}%)")
@@ -509,7 +769,7 @@ Provide the complete translated guide in {language_name}:
         except requests.RequestException as e:
             print(f"❌ Error getting work status: {e}")
     
-    def run(self, max_items: int = None):
+    def run(self, max_items: int = None, batch_size: int = 1):
         """Main worker loop: fetch and process one (destination, language) at a time"""
         self.worker_start_time = time.time()
         print("🚀 Starting GolfPlex Content Generation Worker (Ollama)")
@@ -523,6 +783,14 @@ Provide the complete translated guide in {language_name}:
         while max_items is None or processed < max_items:
             uptime = self.get_worker_uptime()
             print(f"\n🔄 Fetching work item {processed + 1}... (Uptime: {uptime})")
+            if batch_size > 1:
+                count = batch_size if max_items is None else min(batch_size, max_items - processed)
+                work_data = self.fetch_work(count=count)
+                if not work_data:
+                    break
+                processed += self.process_batch(work_data['units'])
+                time.sleep(2)
+                continue
             work_data = self.fetch_work()
             if not work_data:
                 break
@@ -556,6 +824,7 @@ def main():
     parser.add_argument('--model', default='llama3.1', help='Ollama model name (default: llama3.1)')
     parser.add_argument('--output-dir', default='generated_content', help='Output directory for JSON files')
     parser.add_argument('--max-items', type=int, help='Maximum items to process (default: unlimited)')
+    parser.add_argument('--batch-size', type=int, default=1, help='Work items to lease and submit per request (default: 1)')
     parser.add_argument('--english-only', action='store_true', help='Generate only English guides (skip translations)')
     
     args = parser.parse_args()
@@ -566,6 +835,7 @@ def main():
     print(f"   Model: {args.model}")
     print(f"   Output dir: {args.output_dir}")
     print(f"   Max items: {args.max_items or 'unlimited'}")
+    print(f"   Batch size: {args.batch_size}")
     print(f"   English only: {args.english_only}")
     
     worker = GolfContentWorker(
@@ -575,7 +845,7 @@ def main():
         model_name=args.model
     )
     try:
-        worker.run(max_items=args.max_items)
+        worker.run(max_items=args.max_items, batch_size=args.batch_size)
     except KeyboardInterrupt:
         print("\n⏹️  Worker stopped by user")
     except Exception as e: